@@ -4,8 +4,19 @@ import os
 from datetime import timedelta
 
 from flask import Flask
-
 from flask_session import Session
+
+from tbj_statsapp import (
+    api,
+    assets,
+    cache,
+    compress,
+    directory,
+    metrics,
+    refresh,
+    render,
+    store,
+)
 from tbj_statsapp.config import (
     DevelopmentConfig,
     ProductionConfig,
@@ -40,21 +51,45 @@ else:
     raise ConfigException("Improper environment configured")
 
 
-def create_app():
+def create_app(test_config=None):
     """Create and initialize app according to the config"""
     app = Flask(__name__)
     app.config.from_object(config_settings)
 
     # Cookie settings - same across all settings
     app.config["SESSION_TYPE"] = "filesystem"
-    app.config["SESSION_PERMANENT"] = True
+    # Pages are shared by every user, so sessions are only created (and
+    # cookies set) if something is stored in them
+    app.config["SESSION_PERMANENT"] = False
     app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(hours=6)
 
+    # Override config (e.g. for testing)
+    if test_config:
+        app.config.update(test_config)
+
     Session(app)
+    # First, so request timings include the other plugins
+    metrics.init_app(app)
+    cache.init_app(app)
+    store.init_app(app)
+    render.init_app(app)
+    assets.init_app(app)
+    compress.init_app(app)
+    api.MAX_WORKERS = app.config["UPSTREAM_MAX_WORKERS"]
+    api.reset_executor()
+    api.NEWS_RSS = app.config["NEWS_RSS_URL"]
 
     # Route views without Flask blueprints
     with app.app_context():
-        from tbj_statsapp import views  # noqa: F401
+        from tbj_statsapp import json_views, views  # noqa: F401
+
+    # Load team directory
+    directory.init_app(app, views.stats_client)
+
+    # Keep hot datasets fresh in the background
+    with app.app_context():
+        views.register_snapshots()
+    refresh.init_app(app)
 
     # Setup session
 
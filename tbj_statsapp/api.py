@@ -1,112 +1,325 @@
-import xmltodict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+import requests
+
+from tbj_statsapp import metrics
+from tbj_statsapp.cache import STATIC, VOLATILE, cached
 
 NEWS_RSS = "https://www.mlb.com/feeds/news/rss.xml"
-STATSAPI_URL = "https://statsapi.mlb.com/"
+LEAGUE_IDS = [103, 104]
+
+# Threads of the fan out pool shared by every request of the process
+MAX_WORKERS = 8
+
+# Feed (url, limit) -> validators and entries from the last full response
+news_feeds = {}
+
+# Pool running every fan out (created on first use)
+_executor = None
+_executor_lock = threading.Lock()
+# Marks pool threads, so nested fan outs run inline
+_pool_thread = threading.local()
+
+
+def _mark_pool_thread():
+    _pool_thread.active = True
+
+
+def get_executor():
+    """Shared fan out pool of MAX_WORKERS threads"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS,
+                thread_name_prefix="fan_out",
+                initializer=_mark_pool_thread,
+            )
+
+        return _executor
+
+
+def reset_executor():
+    """Drop the shared pool (e.g. after forking, or resizing MAX_WORKERS)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def fan_out(func, calls):
+    """Concurrently call func once for each set of keyword arguments in calls
+
+    Calls run on the shared pool, so at most MAX_WORKERS fanned out calls
+    are in flight across every request (single calls, and fan outs nested
+    in a call, run inline in the calling thread rather than waiting on the
+    pool).
 
+    Results are returned in the same order as calls. If any call fails, the
+    first error (in call order) is raised and pending calls are cancelled.
+    """
+    calls = list(calls)
+    if (
+        len(calls) <= 1
+        or MAX_WORKERS <= 1
+        or getattr(_pool_thread, "active", False)
+    ):
+        return [func(**kwargs) for kwargs in calls]
+
+    executor = get_executor()
+    # Calls count towards the current request's metrics
+    futures = [
+        executor.submit(metrics.in_context(func), **kwargs) for kwargs in calls
+    ]
+    try:
+        return [future.result() for future in futures]
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def parse_news(chunks, limit=None):
+    """Incrementally parse RSS items from chunks of XML
+
+    Parsing (and reading chunks) stops once limit items have been parsed.
+    """
+    parser = ElementTree.XMLPullParser(events=("end",))
+    entries = []
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            if element.tag != "item":
+                continue
+
+            entry = {}
+            for child in element:
+                # Strip namespace (e.g. dc:creator)
+                tag = child.tag.rsplit("}", 1)[-1]
+                if tag == "image":
+                    entry["image"] = child.get("href")
+                elif tag == "creator":
+                    entry["author"] = child.text
+                elif tag in ["title", "link", "pubDate"]:
+                    entry[tag] = child.text
+            entries.append(entry)
+            element.clear()
+
+            if limit and len(entries) >= limit:
+                return entries
+
+    return entries
 
-def get_news(session, team=None, rss=NEWS_RSS):
-    """Grab news for league / team"""
 
+@cached(VOLATILE)
+def get_news(client, team=None, rss=None, limit=None):
+    """Grab news for league / team
+
+    Previously grabbed feeds are revalidated with ETag / Last-Modified, and
+    only the first limit entries are downloaded and parsed.
+    """
+    rss = rss or NEWS_RSS
     if team:
         rss = rss.replace("feeds", f"{team}/feeds")
 
-    feed = session.get(rss, allow_redirects=False)
-    entries = xmltodict.parse(feed.content)["rss"]["channel"]["item"]
+    headers = {}
+    previous = news_feeds.get((rss, limit))
+    if previous:
+        if previous["etag"]:
+            headers["If-None-Match"] = previous["etag"]
+        if previous["last_modified"]:
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    feed = client.get(rss, headers=headers, allow_redirects=False, stream=True)
+    try:
+        # Not modified (304), or failed / redirected, so keep the last feed
+        if feed.status_code != 200:
+            if previous:
+                return previous["entries"]
+            feed.raise_for_status()
+            raise requests.HTTPError(
+                f"Unexpected news feed status {feed.status_code}: {rss}",
+                response=feed,
+            )
+
+        entries = parse_news(feed.iter_content(chunk_size=8192), limit)
+    finally:
+        feed.close()
+
+    news_feeds[(rss, limit)] = {
+        "etag": feed.headers.get("ETag"),
+        "last_modified": feed.headers.get("Last-Modified"),
+        "entries": entries,
+    }
 
     return entries
 
 
-def get_player(player_id, session, stats_api=STATSAPI_URL):
+@cached(STATIC)
+def get_player(player_id, client):
     """Get player information from statsapi"""
-    player_api = session.get(f"{stats_api}/api/v1/people/{player_id}").json()
+    player_api = client.get(f"api/v1/people/{player_id}").json()
+
+    if not player_api.get("people"):
+        raise ValueError("Could not find player")
 
     return player_api.get("people")[0]
 
 
-def get_rosters(team_id, session, stats_api=STATSAPI_URL):
-    roster = session.get(f"{stats_api}/api/v1/teams/{team_id}/roster").json()
+@cached(STATIC)
+def get_people(person_ids, client):
+    """Get information for multiple players in a single request"""
+    person_ids = ",".join(str(person_id) for person_id in person_ids)
+    people = client.get(f"api/v1/people?personIds={person_ids}").json()
+
+    return people.get("people")
+
+
+@cached(VOLATILE)
+def get_rosters(team_id, client):
+    roster = client.get(f"api/v1/teams/{team_id}/roster").json()
 
     return roster.get("roster")
 
 
-def get_player_stats(
-    player_id, category, session, season=None, stats_api=STATSAPI_URL
-):
+@cached(VOLATILE)
+def get_roster_players(team_id, client):
+    """Get roster players with bio and year by year stats from statsapi
+
+    Hydrates every roster entry in a single request rather than fetching
+    each player separately.
+    """
+    roster = client.get(
+        f"api/v1/teams/{team_id}/roster?hydrate=person(stats"
+        + "(group=[hitting,pitching],type=[yearByYear]))"
+    ).json()
+
+    return [player.get("person") for player in roster.get("roster")]
+
+
+def get_season_stats(stats, category, season):
+    """Get stats of a category for a given season from hydrated stats
+
+    Returns the season total (if multiple teams) and the season played. If
+    the season was not played, the last season played is returned instead.
+    """
+    splits = []
+    for stat_group in stats or []:
+        if stat_group["group"].get("displayName") == category:
+            splits = stat_group.get("splits")
+            break
+
+    # If player has never played in MLB
+    if not splits:
+        return {}, None
+
+    # If didn't play requested season, get last season played
+    if season not in [split.get("season") for split in splits]:
+        season = splits[-1].get("season")
+
+    season_splits = [split for split in splits if split["season"] == season]
+    for split in season_splits:
+        # Get total season stats (if multiple teams)
+        if "team" not in split.keys():
+            return split.get("stat"), season
+
+    return season_splits[-1].get("stat"), season
+
+
+@cached(VOLATILE)
+def get_player_stats(player_id, category, client, season=None):
     """Get stats for a given player for a given category from statsapi"""
     stats = (
-        session.get(
-            f"{stats_api}/api/v1/people/{player_id}?hydrate=stats"
+        client.get(
+            f"api/v1/people/{player_id}?hydrate=stats"
             + f"(group=[{category}],type=[yearByYear])"
         )
         .json()["people"][0]
         .get("stats")
     )
 
+    if season:
+        return get_season_stats(stats, category, season)
+
     # If player has never played in MLB
     if not stats:
         return {}, None
-    stats = stats[0].get("splits")
 
-    if season:
-        for i in range(len(stats)):
-            # Get total season stats (if multiple teams)
-            if stats[i]["season"] == season and "team" not in stats[i].keys():
-                return stats[i].get("stat"), None
-            # If didn't pitch previous season, get last season pitched
-            else:
-                return stats[-1].get("stat"), stats[-1].get("season")
+    return stats[0].get("splits")
 
-    return stats
 
+def get_players(client):
+    """Grab info for every MLB player from statsapi"""
+    players = client.get("api/v1/sports/1/players").json()
 
-def search_players(player_id, session, stats_api=STATSAPI_URL):
-    """Function to search player list
+    return players.get("people")
 
-    NOTE: This is only used if player has not already been cached
-    """
 
-    players = (
-        session.get(f"{stats_api}/api/v1/sports/1/players")
-        .json()
-        .get("people")
-    )
+@cached(VOLATILE)
+def get_standings(league_id, client):
+    """Grab and return league specific standings by division from statsapi"""
+    standings = client.get(f"api/v1/standings?leagueId={league_id}").json()
 
-    for player in players:
-        if player_id == player.get("id"):
-            return player.get("currentTeam").get("id")
+    return standings.get("records")
 
-    raise ValueError("Could not find player")
 
+@cached(VOLATILE)
+def get_all_standings(league_ids, client):
+    """Grab standings for multiple leagues from statsapi
 
-def get_standings(league_id, session, stats_api=STATSAPI_URL):
-    """Grab and return league specific standings by division from statsapi"""
-    standings = session.get(
-        f"{stats_api}/api/v1/standings?leagueId={league_id}"
+    Team and division info is hydrated so standings can be displayed without
+    further requests.
+    """
+    league_ids = ",".join(str(league_id) for league_id in league_ids)
+    standings = client.get(
+        f"api/v1/standings?leagueId={league_ids}" + "&hydrate=team,division"
     ).json()
 
     return standings.get("records")
 
 
-def get_division(division_id, session, stats_api=STATSAPI_URL):
+@cached(STATIC)
+def get_division(division_id, client):
     """Grab division info from statsapi"""
-    division = session.get(
-        f"{stats_api}/api/v1/divisions/{division_id}"
-    ).json()
+    division = client.get(f"api/v1/divisions/{division_id}").json()
 
     return division["divisions"][0]
 
 
-def get_team(team_id, session, stats_api=STATSAPI_URL):
+def get_teams(client):
+    """Grab info for every MLB team (with division info) from statsapi"""
+    teams = client.get("api/v1/teams?sportId=1&hydrate=division").json()
+
+    return teams.get("teams")
+
+
+@cached(STATIC)
+def get_team(team_id, client):
     """Grab team info from statsapi"""
-    team_api = session.get(f"{stats_api}/api/v1/teams/{team_id}").json()
+    team_api = client.get(f"api/v1/teams/{team_id}").json()
 
     return team_api["teams"][0]
 
 
-def get_category(category, session, stats_api=STATSAPI_URL):
+@cached(VOLATILE)
+def get_category(category, client):
     """Get leaders for input category from statsapi"""
-    category_leaders = session.get(
-        f"{stats_api}/api/v1/stats/leaders?leaderCategories={category}"
+    category_leaders = client.get(
+        f"api/v1/stats/leaders?leaderCategories={category}"
+    ).json()
+
+    return category_leaders["leagueLeaders"]
+
+
+@cached(VOLATILE)
+def get_categories(categories, client):
+    """Get leaders for multiple categories in a single request"""
+    category_leaders = client.get(
+        "api/v1/stats/leaders?leaderCategories=" + ",".join(categories)
     ).json()
 
     return category_leaders["leagueLeaders"]
@@ -0,0 +1,53 @@
+"""Content hashed static asset URLs
+
+url_for("static", ...) adds a hash of the file (e.g. css/statsapp.css?v=1a2b),
+so versioned URLs change whenever the file does and can be cached by
+browsers forever.
+"""
+import hashlib
+import os
+
+from flask import request
+
+# (hash, mtime) by static file path
+_hashes = {}
+
+
+def file_hash(path):
+    """Short content hash of a file, recomputed only if it was modified"""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _hashes.get(path)
+    if cached is not None and cached[1] == mtime:
+        return cached[0]
+
+    with open(path, "rb") as file:
+        digest = hashlib.sha1(file.read()).hexdigest()[:12]
+    _hashes[path] = (digest, mtime)
+
+    return digest
+
+
+def init_app(app):
+    """Version static URLs of app and cache versioned assets forever"""
+
+    @app.url_defaults
+    def add_static_version(endpoint, values):
+        if endpoint != "static" or "v" in values:
+            return
+        path = os.path.join(app.static_folder, values.get("filename", ""))
+        if os.path.isfile(path):
+            values["v"] = file_hash(path)
+
+    @app.after_request
+    def cache_versioned_assets(response):
+        if (
+            request.endpoint == "static"
+            and request.args.get("v")
+            and response.status_code in (200, 304)
+        ):
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config["STATIC_MAX_AGE"]
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+
+        return response
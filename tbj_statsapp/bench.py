@@ -0,0 +1,367 @@
+"""Benchmarks catching performance regressions
+
+Startup (import time and baseline memory of a fresh worker):
+
+    python -m tbj_statsapp.bench startup [--max-seconds S] [--max-rss-mb MB]
+
+Load (throughput and latency of the production server against a local
+stand-in for statsapi and the news feeds):
+
+    python -m tbj_statsapp.bench load [--workers N] [--threads T]
+                                      [--clients C] [--seconds S]
+                                      [--upstream-latency S]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Modules only the player page needs, which must not be imported on startup
+HEAVY_MODULES = ("pandas", "numpy", "plotly.graph_objects")
+
+# Startup without upstream requests or background threads
+STARTUP_CONFIG = {
+    "PRELOAD_DIRECTORIES": False,
+    "BACKGROUND_REFRESH": False,
+    "DISK_CACHE": False,
+}
+
+# Run in a fresh interpreter, so nothing is already imported
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+
+start = time.perf_counter()
+from tbj_statsapp import create_app
+
+create_app(json.loads(sys.argv[1]))
+seconds = time.perf_counter() - start
+
+# Peak RSS is in KiB on Linux, bytes on macOS
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform != "darwin":
+    max_rss *= 1024
+
+print(json.dumps({
+    "seconds": seconds,
+    "max_rss_mb": max_rss / 2**20,
+    "heavy_modules": [
+        module for module in json.loads(sys.argv[2]) if module in sys.modules
+    ],
+}))
+"""
+
+
+# Pages requested (in turn) by each load client
+LOAD_PATHS = (
+    "/teams",
+    "/leaderboards",
+    "/teams/bluejays",
+    "/teams/yankees",
+    "/api/standings",
+)
+
+
+def package_env():
+    """Environment of a subprocess importing this checkout of the app"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [root, env.get("PYTHONPATH")])
+    )
+
+    return env
+
+
+def startup():
+    """Time app creation in a fresh interpreter
+
+    Returns seconds to import and create the app, peak RSS (MB) and which
+    heavy modules were imported.
+    """
+    env = package_env()
+
+    with tempfile.TemporaryDirectory() as session_dir:
+        config = dict(STARTUP_CONFIG, SESSION_FILE_DIR=session_dir)
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                STARTUP_SCRIPT,
+                json.dumps(config),
+                json.dumps(HEAVY_MODULES),
+            ],
+            env=env,
+            cwd=session_dir,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+
+    return json.loads(output)
+
+
+def check_startup(result, max_seconds=None, max_rss_mb=None):
+    """Return list of regressions in a startup result"""
+    regressions = [
+        f"{module} imported on startup" for module in result["heavy_modules"]
+    ]
+    if max_seconds is not None and result["seconds"] > max_seconds:
+        regressions.append(
+            f"startup took {result['seconds']:.2f}s (max {max_seconds}s)"
+        )
+    if max_rss_mb is not None and result["max_rss_mb"] > max_rss_mb:
+        regressions.append(
+            f"startup used {result['max_rss_mb']:.0f}MB (max {max_rss_mb}MB)"
+        )
+
+    return regressions
+
+
+def free_port(host):
+    """Port nothing is listening on"""
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout):
+    """Poll url until the server answers, raising if it exits or times out"""
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            requests.get(url, timeout=5)
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+
+    raise RuntimeError(f"server not ready after {timeout}s")
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of sorted values"""
+    if not values:
+        return None
+
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_clients(base_url, paths, clients, seconds):
+    """Request paths in turn from concurrent clients for seconds
+
+    Returns latencies (seconds, sorted) of successful requests and the
+    number of failed ones.
+    """
+    import requests
+
+    deadline = time.monotonic() + seconds
+
+    def client(offset):
+        latencies, errors = [], 0
+        with requests.Session() as session:
+            session.headers["Accept-Encoding"] = "gzip"
+            index = offset
+            while time.monotonic() < deadline:
+                path = paths[index % len(paths)]
+                index += 1
+                start = time.perf_counter()
+                try:
+                    response = session.get(base_url + path, timeout=30)
+                    ok = response.status_code == 200
+                except requests.RequestException:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        return latencies, errors
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(client, range(clients)))
+
+    latencies = sorted(
+        latency
+        for client_latencies, _ in results
+        for latency in client_latencies
+    )
+
+    return latencies, sum(errors for _, errors in results)
+
+
+def load(
+    workers=2,
+    threads=8,
+    clients=16,
+    seconds=10,
+    upstream_latency=0.05,
+    paths=LOAD_PATHS,
+    ready_timeout=60,
+):
+    """Load test the production server against a stand-in upstream
+
+    Starts python -m tbj_statsapp.serve with statsapi and the news feeds
+    served by the offline stand-in (delayed by upstream_latency seconds),
+    requests paths from concurrent clients and stops the server with
+    SIGTERM. Returns requests per second, latency percentiles (ms), failed
+    requests and the server's exit code.
+    """
+    from tbj_statsapp.tests.fake_statsapi import serve_upstream
+
+    host = "127.0.0.1"
+    upstream = serve_upstream(host, latency=upstream_latency)
+    upstream_url = f"http://{host}:{upstream.server_port}/"
+    port = free_port(host)
+
+    env = package_env()
+    for name in ("FLASK_DEBUG", "FLASK_TESTING"):
+        env.pop(name, None)
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            env.update(
+                STATSAPI_URL=upstream_url,
+                NEWS_RSS_URL=f"{upstream_url}feeds/news/rss.xml",
+                DISK_CACHE_PATH=os.path.join(workdir, "statsapi-cache.db"),
+            )
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "tbj_statsapp.serve",
+                    "--host",
+                    host,
+                    "--port",
+                    str(port),
+                    "--workers",
+                    str(workers),
+                    "--threads",
+                    str(threads),
+                ],
+                env=env,
+                cwd=workdir,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                base_url = f"http://{host}:{port}"
+                wait_until_ready(base_url + paths[0], process, ready_timeout)
+                latencies, errors = run_clients(
+                    base_url, paths, clients, seconds
+                )
+            finally:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    exit_code = process.wait(timeout=ready_timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    exit_code = process.wait()
+    finally:
+        upstream.shutdown()
+        upstream.server_close()
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 1)
+
+    return {
+        "workers": workers,
+        "threads": threads,
+        "clients": clients,
+        "requests": len(latencies) + errors,
+        "requests_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": ms(percentile(latencies, 0.5)),
+        "p90_ms": ms(percentile(latencies, 0.9)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "errors": errors,
+        "exit_code": exit_code,
+    }
+
+
+def check_load(result, min_rps=None, max_p99_ms=None):
+    """Return list of regressions in a load result"""
+    regressions = []
+    if result["errors"]:
+        regressions.append(f"{result['errors']} requests failed")
+    if result["exit_code"] != 0:
+        regressions.append(
+            f"server exited with {result['exit_code']} on SIGTERM"
+        )
+    if min_rps is not None and result["requests_per_second"] < min_rps:
+        regressions.append(
+            f"served {result['requests_per_second']} req/s (min {min_rps})"
+        )
+    if (
+        max_p99_ms is not None
+        and result["p99_ms"] is not None
+        and result["p99_ms"] > max_p99_ms
+    ):
+        regressions.append(
+            f"p99 latency {result['p99_ms']}ms (max {max_p99_ms}ms)"
+        )
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tbj_statsapp.bench")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    startup_parser = commands.add_parser(
+        "startup", help="import time and baseline memory of a worker"
+    )
+    startup_parser.add_argument(
+        "--repeat", type=int, default=3, help="runs (best is reported)"
+    )
+    startup_parser.add_argument("--max-seconds", type=float)
+    startup_parser.add_argument("--max-rss-mb", type=float)
+
+    load_parser = commands.add_parser(
+        "load", help="throughput and latency of the production server"
+    )
+    load_parser.add_argument("--workers", type=int, default=2)
+    load_parser.add_argument("--threads", type=int, default=8)
+    load_parser.add_argument("--clients", type=int, default=16)
+    load_parser.add_argument("--seconds", type=float, default=10)
+    load_parser.add_argument(
+        "--upstream-latency",
+        type=float,
+        default=0.05,
+        help="seconds the stand-in upstream delays each response",
+    )
+    load_parser.add_argument("--min-rps", type=float)
+    load_parser.add_argument("--max-p99-ms", type=float)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "load":
+        result = load(
+            args.workers,
+            args.threads,
+            args.clients,
+            args.seconds,
+            args.upstream_latency,
+        )
+        regressions = check_load(result, args.min_rps, args.max_p99_ms)
+    else:
+        results = [startup() for _ in range(args.repeat)]
+        result = min(results, key=lambda result: result["seconds"])
+        regressions = check_startup(result, args.max_seconds, args.max_rss_mb)
+    print(json.dumps(result, indent=2))
+
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
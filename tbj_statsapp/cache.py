@@ -0,0 +1,162 @@
+"""Process-wide cache shared by all requests"""
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from tbj_statsapp import metrics
+
+# TTL groups - fairly static data (teams, divisions, bios) and volatile data
+# (standings, stats, news)
+STATIC = "static"
+VOLATILE = "volatile"
+
+TTLS = {STATIC: 24 * 60 * 60, VOLATILE: 5 * 60}
+
+
+class TTLCache(object):
+    """Bounded, thread-safe LRU cache with a time-to-live per entry
+
+    Attributes:
+        maxsize -- maximum number of entries before least recently used
+                   entries are evicted
+        timer -- monotonic clock used to expire entries
+        name -- name hits / misses of get_or_set are recorded under in the
+                request metrics (or None)
+    """
+
+    def __init__(self, maxsize=1024, timer=time.monotonic, name=None):
+        self.maxsize = maxsize
+        self.timer = timer
+        self.name = name
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        """Return cached value for key, or default if missing / expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= self.timer():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        """Store value for ttl seconds, evicting the oldest entries if full"""
+        with self._lock:
+            self._entries[key] = (self.timer() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key, compute, ttl):
+        """Return cached value for key, otherwise compute and store it
+
+        Concurrent misses on the same key wait for a single computation
+        rather than each computing the value.
+        """
+        value = self.get(key, _MISSING)
+        if self.name is not None:
+            metrics.record_cache(self.name, value is not _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                value = self.get(key, _MISSING)
+                if value is _MISSING:
+                    value = compute()
+                    self.set(key, value, ttl)
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+        return value
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+
+_MISSING = object()
+
+response_cache = TTLCache(name="response")
+
+# Per thread flag set while refreshing (see refreshing())
+_local = threading.local()
+
+
+@contextmanager
+def refreshing():
+    """Recompute volatile cached values in this thread rather than reading
+    them, storing the fresh results for other requests"""
+    previous = getattr(_local, "refreshing", False)
+    _local.refreshing = True
+    try:
+        yield
+    finally:
+        _local.refreshing = previous
+
+
+def is_refreshing():
+    """Check if cached values are being refreshed in this thread"""
+    return getattr(_local, "refreshing", False)
+
+
+def cached(ttl_group, ignore=("client",)):
+    """Cache function results in the shared response cache
+
+    Results are keyed by function name and arguments (excluding those in
+    ignore, e.g. the statsapi client) and expire after the TTL configured
+    for ttl_group. Cached values are shared, so callers must not mutate them.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__name__,) + tuple(
+                (name, tuple(value) if isinstance(value, list) else value)
+                for name, value in bound.arguments.items()
+                if name not in ignore
+            )
+
+            if ttl_group == VOLATILE and is_refreshing():
+                value = func(*args, **kwargs)
+                response_cache.set(key, value, TTLS[ttl_group])
+                return value
+
+            return response_cache.get_or_set(
+                key, lambda: func(*args, **kwargs), TTLS[ttl_group]
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def init_app(app):
+    """Configure the shared cache from the app config"""
+    response_cache.maxsize = app.config["CACHE_MAXSIZE"]
+    TTLS[STATIC] = app.config["CACHE_STATIC_TTL"]
+    TTLS[VOLATILE] = app.config["CACHE_VOLATILE_TTL"]
@@ -0,0 +1,267 @@
+"""Pooled HTTP client for statsapi and the mlb.com news feeds"""
+import logging
+import random
+import re
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+from tbj_statsapp import cache, metrics
+
+logger = logging.getLogger(__name__)
+
+STATSAPI_URL = "https://statsapi.mlb.com/"
+
+# Responses worth retrying (rate limited / upstream temporarily unavailable)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LatencyStats(object):
+    """Running latency totals (in seconds) for a single endpoint"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency, error=False):
+        self.count += 1
+        self.errors += int(error)
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+def endpoint_name(url):
+    """Group urls by endpoint, replacing ids (e.g. api/v1/teams/{id}/roster)"""
+    path = urlsplit(url).path.strip("/")
+
+    return re.sub(r"(?<=/)\d+(?=/|$)", "{id}", path)
+
+
+def stored_response(url, stored):
+    """Build a response from a disk cached response"""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers["Content-Type"] = stored["content_type"]
+    response._content = stored["body"]
+    response._content_consumed = True
+
+    return response
+
+
+class StatsApiClient(object):
+    """requests session with pooling, timeouts, retries and latency stats
+
+    Relative paths (e.g. api/v1/teams/141) are requested from base_url,
+    absolute urls (e.g. news feeds) as is. Connection errors, timeouts and
+    retryable statuses are retried with exponential backoff and full jitter.
+
+    With a disk cache, statsapi responses younger than max_age are served
+    from disk, older ones are revalidated (ETag / Last-Modified) and, if
+    statsapi fails, served stale for up to stale_if_error seconds.
+
+    Attributes:
+        base_url -- statsapi url relative paths are joined to
+        session -- underlying requests session
+        timeout -- (connect, read) timeout in seconds
+        retries -- retries after the first attempt
+        backoff_factor -- seconds before the first retry (doubled each retry)
+        backoff_max -- maximum seconds between retries
+        disk_cache -- persistent response cache (or None)
+        max_age -- seconds disk cached responses are served without a request
+        stale_if_error -- seconds disk cached responses are served if
+                          statsapi fails
+    """
+
+    def __init__(
+        self,
+        base_url=STATSAPI_URL,
+        session=None,
+        pool_connections=10,
+        pool_maxsize=10,
+        connect_timeout=3.05,
+        read_timeout=10,
+        retries=3,
+        backoff_factor=0.5,
+        backoff_max=10,
+        disk_cache=None,
+        max_age=5 * 60,
+        stale_if_error=24 * 60 * 60,
+        sleep=time.sleep,
+        timer=time.perf_counter,
+    ):
+        self.base_url = base_url
+        if session is None:
+            session = requests.session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=pool_connections, pool_maxsize=pool_maxsize
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.disk_cache = disk_cache
+        self.max_age = max_age
+        self.stale_if_error = stale_if_error
+        self.sleep = sleep
+        self.timer = timer
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Create client from app config"""
+        return cls(
+            base_url=config["STATSAPI_URL"],
+            pool_connections=config["STATSAPI_POOL_CONNECTIONS"],
+            pool_maxsize=config["STATSAPI_POOL_MAXSIZE"],
+            connect_timeout=config["STATSAPI_CONNECT_TIMEOUT"],
+            read_timeout=config["STATSAPI_READ_TIMEOUT"],
+            retries=config["STATSAPI_RETRIES"],
+            backoff_factor=config["STATSAPI_BACKOFF_FACTOR"],
+            backoff_max=config["STATSAPI_BACKOFF_MAX"],
+            max_age=config["DISK_CACHE_MAX_AGE"],
+            stale_if_error=config["DISK_CACHE_STALE_IF_ERROR"],
+            **kwargs,
+        )
+
+    def url(self, path):
+        """Absolute url of a statsapi path"""
+        return urljoin(self.base_url, path)
+
+    def backoff(self, attempt):
+        """Seconds to wait before a retry (full jitter)"""
+        cap = min(self.backoff_max, self.backoff_factor * 2**attempt)
+
+        return random.uniform(0, cap)
+
+    def record(self, url, latency, error=False, nbytes=0):
+        """Add request latency to the stats of its endpoint (and the
+        current request's metrics)"""
+        endpoint = endpoint_name(url)
+        with self._stats_lock:
+            self._stats.setdefault(endpoint, LatencyStats()).add(
+                latency, error
+            )
+        metrics.record_upstream(endpoint, latency, nbytes, error)
+
+    def latency_stats(self):
+        """Latency stats (count, errors, mean, max) by endpoint"""
+        with self._stats_lock:
+            return {
+                endpoint: stats.as_dict()
+                for endpoint, stats in self._stats.items()
+            }
+
+    def get(self, path, **kwargs):
+        """GET a statsapi path (or absolute url), retrying failures
+
+        Plain statsapi requests go through the disk cache (if any).
+        """
+        url = self.url(path)
+        if (
+            self.disk_cache is None
+            or not url.startswith(self.base_url)
+            or kwargs.get("stream")
+            or kwargs.get("headers")
+        ):
+            return self._get(url, **kwargs)
+
+        return self._get_cached(url, **kwargs)
+
+    def _get(self, url, **kwargs):
+        """GET url, retrying failures"""
+        kwargs.setdefault("timeout", self.timeout)
+
+        for attempt in range(self.retries + 1):
+            start = self.timer()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                self.record(url, self.timer() - start, error=True)
+                if attempt == self.retries:
+                    raise
+                logger.info("Retrying %s: %s", url, err)
+            else:
+                retry = response.status_code in RETRY_STATUSES
+                # Streamed bodies (news feeds) are not read yet
+                nbytes = (
+                    int(response.headers.get("Content-Length") or 0)
+                    if kwargs.get("stream")
+                    else len(response.content)
+                )
+                self.record(
+                    url, self.timer() - start, error=retry, nbytes=nbytes
+                )
+                if not retry or attempt == self.retries:
+                    return response
+                logger.info("Retrying %s: %s", url, response.status_code)
+                response.close()
+            self.sleep(self.backoff(attempt))
+
+    def _get_cached(self, url, **kwargs):
+        """GET url through the disk cache"""
+        stored = self.disk_cache.get(url)
+        if stored is None:
+            age, headers = None, {}
+        else:
+            age = self.disk_cache.timer() - stored["fetched_at"]
+            # Refreshes always revalidate
+            if age < self.max_age and not cache.is_refreshing():
+                metrics.record_cache("disk", True)
+                return stored_response(url, stored)
+            headers = {}
+            if stored["etag"]:
+                headers["If-None-Match"] = stored["etag"]
+            if stored["last_modified"]:
+                headers["If-Modified-Since"] = stored["last_modified"]
+        metrics.record_cache("disk", False)
+
+        try:
+            response = self._get(url, headers=headers, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as err:
+            if age is None or age >= self.stale_if_error:
+                raise
+            logger.warning("Serving stale %s: %s", url, err)
+            return stored_response(url, stored)
+
+        if response.status_code == 304 and stored is not None:
+            self.disk_cache.touch(url)
+            return stored_response(url, stored)
+        if response.status_code == 200:
+            self.disk_cache.set(
+                url,
+                response.content,
+                content_type=response.headers.get("Content-Type"),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        elif (
+            response.status_code in RETRY_STATUSES
+            and age is not None
+            and age < self.stale_if_error
+        ):
+            logger.warning("Serving stale %s: %s", url, response.status_code)
+            return stored_response(url, stored)
+
+        return response
+
+    def close(self):
+        self.session.close()
+        if self.disk_cache is not None:
+            self.disk_cache.close()
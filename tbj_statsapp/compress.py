@@ -0,0 +1,122 @@
+"""gzip / brotli compression of responses
+
+Text responses over COMPRESS_MIN_SIZE bytes are compressed with the best
+encoding the client accepts (brotli requires the optional brotli package).
+Compressed bodies of responses with an ETag are cached, so unchanged pages
+are only compressed once. ETags get an encoding suffix (e.g. "abc-gzip"),
+which is stripped from If-None-Match before views compare them.
+"""
+import gzip
+import re
+
+from flask import request
+
+from tbj_statsapp.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # Optional, gzip only
+    brotli = None
+
+COMPRESSED_TTL = 60 * 60
+
+# Compressed bodies by (ETag, encoding)
+compressed_cache = TTLCache(maxsize=256, name="compress")
+
+ETAG_SUFFIX = re.compile(r'-(?:br|gzip)(?=")')
+ORIGINAL_IF_NONE_MATCH = "tbj_statsapp.if_none_match"
+
+
+def encode(data, encoding, config):
+    """Compress data with encoding (br or gzip)"""
+    if encoding == "br":
+        return brotli.compress(data, quality=config["COMPRESS_BROTLI_QUALITY"])
+
+    return gzip.compress(data, compresslevel=config["COMPRESS_LEVEL"], mtime=0)
+
+
+def choose_encoding(accept_encodings):
+    """Best encoding accepted by the client, or None"""
+    encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+    qualities = {
+        encoding: accept_encodings[encoding]
+        for encoding in encodings
+        if accept_encodings[encoding]
+    }
+    if not qualities:
+        return None
+
+    return max(encodings, key=lambda encoding: qualities.get(encoding, 0))
+
+
+def strip_etag_suffixes():
+    """Let views compare If-None-Match against uncompressed ETags"""
+    if_none_match = request.environ.get("HTTP_IF_NONE_MATCH")
+    if if_none_match:
+        request.environ[ORIGINAL_IF_NONE_MATCH] = if_none_match
+        request.environ["HTTP_IF_NONE_MATCH"] = ETAG_SUFFIX.sub(
+            "", if_none_match
+        )
+
+
+def restore_etag_suffix(response):
+    """Answer 304s with the (encoding suffixed) ETag the client sent"""
+    etag, weak = response.get_etag()
+    if_none_match = request.environ.get(ORIGINAL_IF_NONE_MATCH, "")
+    for encoding in ("br", "gzip"):
+        if etag is not None and f'{etag}-{encoding}"' in if_none_match:
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+            break
+
+    return response
+
+
+def compress_response(response, config):
+    """Compress response body if compressible and accepted"""
+    if response.status_code == 304:
+        return restore_etag_suffix(response)
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206)
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in config["COMPRESS_MIMETYPES"]
+        or "no-transform" in response.headers.get("Cache-Control", "")
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < config["COMPRESS_MIN_SIZE"]:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag is not None:
+        data = compressed_cache.get_or_set(
+            (etag, encoding),
+            lambda: encode(data, encoding, config),
+            COMPRESSED_TTL,
+        )
+        # Representations of each encoding need their own ETag
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    else:
+        data = encode(data, encoding, config)
+
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+
+    return response
+
+
+def init_app(app):
+    """Compress responses of app"""
+    if not app.config["COMPRESS"]:
+        return
+
+    app.before_request(strip_etag_suffixes)
+    app.after_request(lambda response: compress_response(response, app.config))
@@ -14,6 +14,116 @@ class Config(object):
     variable rather than explicitly stated here.
     """
 
+    # Shared statsapi response cache (TTLs in seconds)
+    CACHE_MAXSIZE = 2048
+    CACHE_STATIC_TTL = 24 * 60 * 60
+    CACHE_VOLATILE_TTL = 5 * 60
+
+    # Page data shared by every user (e.g. sqlite:///data.db or
+    # redis://localhost:6379/0, fronted by an in-process store), TTLs in
+    # seconds
+    DATA_STORE_URL = os.environ.get("DATA_STORE_URL", "memory://")
+    DATA_STORE_TTL = 30 * 60
+    DATA_STORE_LOCAL_TTL = 60
+    DATA_STORE_LOCAL_MAXSIZE = 1024
+
+    # Threads of the fan out pool shared by every request of a process (e.g.
+    # the team and player page lookups). Only fanned out calls are capped,
+    # other upstream calls run in the request / refresh threads
+    UPSTREAM_MAX_WORKERS = int(os.environ.get("UPSTREAM_MAX_WORKERS", 8))
+
+    # statsapi client - connection pool, timeouts and retry backoff (seconds)
+    STATSAPI_URL = os.environ.get("STATSAPI_URL", "https://statsapi.mlb.com/")
+    STATSAPI_POOL_CONNECTIONS = 10
+    STATSAPI_POOL_MAXSIZE = 32
+    STATSAPI_CONNECT_TIMEOUT = 3.05
+    STATSAPI_READ_TIMEOUT = 10
+    STATSAPI_RETRIES = 3
+    STATSAPI_BACKOFF_FACTOR = 0.5
+    STATSAPI_BACKOFF_MAX = 10
+
+    # Upstream (statsapi / news feed) responses - live, record (store every
+    # response in the cassette directory, defaults to the instance folder)
+    # or replay (serve them offline, delayed by their "recorded" latency or
+    # a fixed number of seconds, times the scale, and failing at a rate)
+    UPSTREAM_MODE = os.environ.get("UPSTREAM_MODE", "live")
+    UPSTREAM_CASSETTE = os.environ.get("UPSTREAM_CASSETTE")
+    UPSTREAM_REPLAY_LATENCY = os.environ.get("UPSTREAM_REPLAY_LATENCY")
+    UPSTREAM_REPLAY_LATENCY_SCALE = float(
+        os.environ.get("UPSTREAM_REPLAY_LATENCY_SCALE", 1)
+    )
+    UPSTREAM_REPLAY_FAILURE_RATE = float(
+        os.environ.get("UPSTREAM_REPLAY_FAILURE_RATE", 0)
+    )
+
+    # Persistent statsapi response cache, so restarts start warm (defaults to
+    # the instance folder). Change DISK_CACHE_VERSION to drop stored responses
+    DISK_CACHE = True
+    DISK_CACHE_PATH = os.environ.get("DISK_CACHE_PATH")
+    DISK_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    DISK_CACHE_VERSION = "1"
+    DISK_CACHE_MAX_AGE = 5 * 60
+    DISK_CACHE_STALE_IF_ERROR = 24 * 60 * 60
+
+    # Response compression (brotli requires the optional brotli package)
+    COMPRESS = True
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+    COMPRESS_MIMETYPES = {
+        "text/html",
+        "text/css",
+        "text/plain",
+        "text/javascript",
+        "application/javascript",
+        "application/json",
+        "image/svg+xml",
+    }
+
+    # Per-request instrumentation - Server-Timing headers and Prometheus
+    # metrics served at METRICS_PATH. Workers of the production server write
+    # their metrics to METRICS_DIR (a temporary directory by default) every
+    # METRICS_WRITE_INTERVAL seconds, and serve the sum over every worker
+    METRICS = True
+    METRICS_SERVER_TIMING = True
+    METRICS_PATH = "/metrics"
+    METRICS_DIR = os.environ.get("METRICS_DIR")
+    METRICS_WRITE_INTERVAL = 5
+
+    # Browser cache lifetime of content hashed static URLs (seconds)
+    STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+    # In-memory team / player directories, loaded at startup and refreshed
+    PRELOAD_DIRECTORIES = True
+    TEAM_DIRECTORY_MAX_AGE = 24 * 60 * 60
+    PLAYER_DIRECTORY_MAX_AGE = 6 * 60 * 60
+
+    # mlb.com league news feed (team feeds are derived from it)
+    NEWS_RSS_URL = os.environ.get(
+        "NEWS_RSS_URL", "https://www.mlb.com/feeds/news/rss.xml"
+    )
+
+    # Background refresh of standings, leaders, news and the team directory,
+    # served from the last good snapshot (intervals in seconds). Only the
+    # REFRESH_PRELOAD snapshots are loaded before serving
+    BACKGROUND_REFRESH = True
+    REFRESH_PRELOAD = ["leagues", "leaders", "news"]
+    REFRESH_POLL_INTERVAL = 1
+    STANDINGS_REFRESH_INTERVAL = 5 * 60
+    LEADERS_REFRESH_INTERVAL = 5 * 60
+    NEWS_REFRESH_INTERVAL = 5 * 60
+    TEAM_DIRECTORY_REFRESH_INTERVAL = 12 * 60 * 60
+
+    # Production server (python -m tbj_statsapp.serve) - worker processes,
+    # request threads per worker, seconds workers get to finish requests on
+    # shutdown and pages rendered before forking
+    SERVE_HOST = os.environ.get("SERVE_HOST", "127.0.0.1")
+    SERVE_PORT = int(os.environ.get("SERVE_PORT", 5000))
+    SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", os.cpu_count() or 1))
+    SERVE_THREADS = int(os.environ.get("SERVE_THREADS", 8))
+    SERVE_GRACEFUL_TIMEOUT = 30
+    SERVE_WARM_URLS = ["/teams", "/leaderboards"]
+
 
 class ProductionConfig(Config):
     """Config used in production app"""
@@ -35,3 +145,6 @@ class TestingConfig(Config):
 
     TESTING = True
     SECRET_KEY = "test"
+    PRELOAD_DIRECTORIES = False
+    BACKGROUND_REFRESH = False
+    DISK_CACHE = False
@@ -0,0 +1,173 @@
+"""In-memory directories of slowly changing statsapi data"""
+import logging
+import threading
+import time
+
+import requests
+
+from tbj_statsapp import api, utils
+
+logger = logging.getLogger(__name__)
+
+
+class Directory(object):
+    """Base class for periodically reloaded in-memory indexes
+
+    Directories are loaded once (e.g. at startup) and reloaded on first use
+    after max_age seconds. If a reload fails, the previous indexes are kept.
+    Subclasses implement build() to grab data and return its indexes.
+
+    Attributes:
+        max_age -- seconds before indexes are reloaded
+        timer -- monotonic clock used to age indexes
+    """
+
+    name = "directory"
+
+    def __init__(self, max_age=24 * 60 * 60, timer=time.monotonic):
+        self.max_age = max_age
+        self.timer = timer
+        self.loaded_at = None
+        self.indexes = {}
+        self._load_lock = threading.Lock()
+
+    def build(self, client):
+        """Grab data and return indexes by name"""
+        raise NotImplementedError
+
+    def load(self, client):
+        """Grab data and replace indexes"""
+        self.indexes = self.build(client)
+        self.loaded_at = self.timer()
+
+    def is_stale(self):
+        """Check if never loaded or older than max_age"""
+        loaded_at = self.loaded_at
+
+        return loaded_at is None or self.timer() - loaded_at >= self.max_age
+
+    def refresh(self, client, force=False):
+        """Reload indexes if never loaded, stale or forced"""
+        if not force and not self.is_stale():
+            return
+
+        # Only a single thread reloads at a time
+        with self._load_lock:
+            if not force and not self.is_stale():
+                return
+            try:
+                self.load(client)
+            except (requests.RequestException, KeyError, ValueError) as err:
+                # Keep serving previous indexes if any were loaded
+                if self.loaded_at is None:
+                    raise
+                logger.warning("Could not reload %s: %s", self.name, err)
+
+    def lookup(self, index, key, client):
+        """Look up key in an index, or None if not found"""
+        self.refresh(client)
+
+        return self.indexes[index].get(key)
+
+
+class TeamDirectory(Directory):
+    """Team and division info indexed by id, abbreviation and URL slug"""
+
+    name = "teams"
+
+    def build(self, client):
+        """Grab all teams (with divisions) and index them"""
+        by_id, by_abbreviation, by_slug, divisions = {}, {}, {}, {}
+        for team in api.get_teams(client=client):
+            by_id[team["id"]] = team
+            by_abbreviation[team.get("abbreviation")] = team
+            # Teams can be found by both team and club name
+            by_slug[utils.team_slug(team.get("teamName"))] = team
+            by_slug[utils.team_slug(team.get("clubName"))] = team
+            divisions[team["division"]["id"]] = team["division"]
+
+        return {
+            "by_id": by_id,
+            "by_abbreviation": by_abbreviation,
+            "by_slug": by_slug,
+            "divisions": divisions,
+        }
+
+    def get(self, team_id, client):
+        """Get team by id, grabbing from statsapi if not an MLB team"""
+        team = self.lookup("by_id", int(team_id), client)
+        if team is None:
+            team = api.get_team(team_id=team_id, client=client)
+
+        return team
+
+    def by_abbreviation(self, abbreviation, client):
+        """Get team by abbreviation (e.g. TOR), or None if not found"""
+        return self.lookup("by_abbreviation", abbreviation.upper(), client)
+
+    def by_slug(self, slug, client):
+        """Get team by URL slug (e.g. bluejays), or None if not found"""
+        return self.lookup("by_slug", slug.lower(), client)
+
+    def division(self, division_id, client):
+        """Get division info by id"""
+        division = self.lookup("divisions", division_id, client)
+        if division is None:
+            division = api.get_division(division_id=division_id, client=client)
+
+        return division
+
+
+class PlayerDirectory(Directory):
+    """MLB player bios and current teams indexed by player id"""
+
+    name = "players"
+
+    def build(self, client):
+        """Grab all MLB players and index them"""
+        bios, team_ids = {}, {}
+        for player in api.get_players(client=client):
+            bios[player["id"]] = player
+            if player.get("currentTeam"):
+                team_ids[player["id"]] = player["currentTeam"].get("id")
+
+        return {"bios": bios, "team_ids": team_ids}
+
+    def bio(self, player_id, client):
+        """Get player bio by id, grabbing from statsapi if not found"""
+        player = self.lookup("bios", int(player_id), client)
+        if player is None:
+            player = api.get_player(player_id=player_id, client=client)
+
+        return player
+
+    def team_id(self, player_id, client):
+        """Get current team id of player, or None if not on a team (or not
+        found)"""
+        team_id = self.lookup("team_ids", int(player_id), client)
+        if team_id is None:
+            try:
+                player = api.get_player(player_id=player_id, client=client)
+            except ValueError:
+                return None
+            team_id = (player.get("currentTeam") or {}).get("id")
+
+        return team_id
+
+
+teams = TeamDirectory()
+players = PlayerDirectory()
+
+
+def init_app(app, client):
+    """Configure directories and load them if enabled"""
+    teams.max_age = app.config["TEAM_DIRECTORY_MAX_AGE"]
+    players.max_age = app.config["PLAYER_DIRECTORY_MAX_AGE"]
+
+    if app.config["PRELOAD_DIRECTORIES"]:
+        for directory in [teams, players]:
+            try:
+                directory.refresh(client)
+            except (requests.RequestException, KeyError, ValueError) as err:
+                # Directory will be loaded on first use instead
+                logger.warning("Could not preload %s: %s", directory.name, err)
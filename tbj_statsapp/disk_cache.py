@@ -0,0 +1,192 @@
+"""Persistent statsapi response cache, so restarted processes start warm"""
+import os
+import sqlite3
+import threading
+import time
+
+# Bump when the table layout changes
+SCHEMA_VERSION = 1
+
+
+class DiskCache(object):
+    """Size capped SQLite cache of raw statsapi responses
+
+    Responses are stored with their fetch time and validators (ETag /
+    Last-Modified). When full, least recently used responses are evicted.
+    Entries written under a different version are dropped on open.
+
+    Attributes:
+        path -- SQLite database file
+        max_bytes -- maximum total size of stored response bodies
+        version -- cache version, changed to invalidate stored responses
+        timer -- wall clock used for fetch / access times
+    """
+
+    def __init__(
+        self, path, max_bytes=64 * 1024 * 1024, version="1", timer=time.time
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = f"{SCHEMA_VERSION}:{version}"
+        self.timer = timer
+        self._lock = threading.Lock()
+        self._connect()
+        self._setup()
+
+    def _connect(self):
+        self._connection = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=10,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+
+    def reconnect(self):
+        """Open a new connection (e.g. in a forked worker process)"""
+        with self._lock:
+            self._connect()
+
+    def _setup(self):
+        """Create tables, dropping responses stored under another version"""
+        with self._lock:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)"
+            )
+            row = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'version'"
+            ).fetchone()
+            if row is None or row[0] != self.version:
+                self._connection.execute("DROP TABLE IF EXISTS responses")
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                    (self.version,),
+                )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                + "url TEXT PRIMARY KEY, body BLOB, content_type TEXT, "
+                + "etag TEXT, last_modified TEXT, fetched_at REAL, "
+                + "accessed_at REAL, size INTEGER)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed "
+                + "ON responses (accessed_at)"
+            )
+
+    def get(self, url):
+        """Return stored response for url as a dict, or None if missing"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, content_type, etag, last_modified, fetched_at "
+                + "FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?",
+                (self.timer(), url),
+            )
+
+        body, content_type, etag, last_modified, fetched_at = row
+        return {
+            "body": body,
+            "content_type": content_type,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+        }
+
+    def set(self, url, body, content_type=None, etag=None, last_modified=None):
+        """Store a freshly fetched response, evicting old ones if full"""
+        now = self.timer()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES "
+                + "(?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    body,
+                    content_type,
+                    etag,
+                    last_modified,
+                    now,
+                    now,
+                    len(body),
+                ),
+            )
+            self._evict()
+
+    def touch(self, url):
+        """Mark a stored response as fetched now (e.g. after a 304)"""
+        with self._lock:
+            now = self.timer()
+            self._connection.execute(
+                "UPDATE responses SET fetched_at = ?, accessed_at = ? "
+                + "WHERE url = ?",
+                (now, now, url),
+            )
+
+    def _evict(self):
+        """Delete least recently used responses until under max_bytes
+
+        Must be called while holding the lock.
+        """
+        total = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._connection.execute(
+            "SELECT url, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        evicted = []
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((url,))
+            total -= size
+        self._connection.executemany(
+            "DELETE FROM responses WHERE url = ?", evicted
+        )
+
+    def size(self):
+        """Total size of stored response bodies"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self):
+        self._connection.close()
+
+
+def from_app(app):
+    """Open the disk cache configured for app, or None if disabled
+
+    Defaults to a database in the app instance folder.
+    """
+    if not app.config["DISK_CACHE"]:
+        return None
+
+    path = app.config["DISK_CACHE_PATH"]
+    if path is None:
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = os.path.join(app.instance_path, "statsapi_cache.db")
+
+    return DiskCache(
+        path,
+        max_bytes=app.config["DISK_CACHE_MAX_BYTES"],
+        version=app.config["DISK_CACHE_VERSION"],
+    )
@@ -1,94 +1,146 @@
 from collections import defaultdict
-from datetime import datetime
-
-import pandas as pd
-
-from tbj_statsapp import api, utils
-
-
-def get_recent_news(session, team=None):
+from functools import partial
+
+from tbj_statsapp import api, directory, records, utils
+
+# Career table (column, statsapi stat) pairs by stat category
+CAREER_STATS = {
+    "pitching": [
+        ("games", "gamesPlayed"),
+        ("ip", "inningsPitched"),
+        ("wins", "wins"),
+        ("losses", "losses"),
+        ("saves", "saves"),
+        ("era", "era"),
+        ("whip", "whip"),
+        ("hits", "hits"),
+        ("runs", "runs"),
+        ("strikeouts", "strikeOuts"),
+        ("bb", "baseOnBalls"),
+        ("hr_per_9", "homeRunsPer9"),
+        ("ops", "ops"),
+    ],
+    "hitting": [
+        ("games", "gamesPlayed"),
+        ("plate_appearances", "plateAppearances"),
+        ("at_bats", "atBats"),
+        ("avg", "avg"),
+        ("runs", "runs"),
+        ("hits", "hits"),
+        ("doubles", "doubles"),
+        ("triples", "triples"),
+        ("hrs", "homeRuns"),
+        ("rbi", "rbi"),
+        ("stolen_bases", "stolenBases"),
+        ("bb", "baseOnBalls"),
+        ("strikeouts", "strikeOuts"),
+        ("obp", "obp"),
+        ("slg", "slg"),
+        ("ops", "ops"),
+    ],
+}
+
+
+def get_recent_news(client, team=None):
     """Grab recent league / team news"""
-    news_entries = api.get_news(session=session, team=team)
-
     # Grab most recent 4 news stories
+    news_entries = api.get_news(client=client, team=team, limit=4)
+
     news = defaultdict(list)
-    for entry in news_entries[:4]:
+    for entry in news_entries:
         news["title"].extend([entry.get("title")])
         news["link"].extend([entry.get("link")])
-        news["author"].extend([entry.get("dc:creator")])
-        news["image"].extend([entry["image"].get("@href")])
-
+        news["author"].extend([entry.get("author")])
+        news["image"].extend([entry.get("image")])
         # Convert date to desired format
-        date = datetime.strptime(
-            entry.get("pubDate"),
-            "%a, %d %b %Y %H:%M:%S %Z",
-        )
-        news["date"] += [date.strftime("%b %d %Y")]
+        news["date"] += [utils.format_news_date(entry.get("pubDate"))]
 
     return news
 
 
-def get_divisions(standing, division_idx, session):
+def get_divisions(standing, division_idx, client):
     """Grab and return necessary data for a specific division"""
-    division_standings = defaultdict(list)
-
-    for i, team_record in enumerate(standing[division_idx]["teamRecords"]):
-        team_id = team_record["team"].get("id")
-        # Grab division info if first team processed
-        if i == 0:
-            division_name = api.get_division(
-                division_id=standing[division_idx]["division"].get("id"),
-                session=session,
-            )
-            division_standings["name"] = division_name.get("nameShort")
-
-        # Team-related information
-        division_standings["team_ids"].append(team_id)
-        team_api = api.get_team(team_id=team_id, session=session)
-        division_standings["abbreviations"].extend(
-            [team_api.get("abbreviation")]
-        )
-        team_name = "".join(
-            name.strip().lower() for name in team_api.get("teamName")
-        )
-        division_standings["team_names"].extend([team_name])
-        division_standings["logos"].extend(
-            [
-                "https://www.mlbstatic.com/team-logos/"
-                + f"{division_standings['team_ids'][-1]}.svg"
-            ]
+    team_records = standing[division_idx]["teamRecords"]
+
+    # Grab division and team info (if not already hydrated)
+    division_name = standing[division_idx]["division"]
+    if "nameShort" not in division_name:
+        division_name = directory.teams.division(
+            division_id=division_name.get("id"),
+            client=client,
         )
-
-        # Team stats
-        division_standings["wins"].append(team_record.get("wins"))
-        division_standings["losses"].append(team_record.get("losses"))
-        division_standings["pct"].append(team_record.get("winningPercentage"))
-        division_standings["gb"].extend([team_record.get("wildCardGamesBack")])
-        division_standings["diff"].append(
-            team_record.get("runsScored") - team_record.get("runsAllowed")
+    team_apis = [
+        team_record["team"]
+        if "teamName" in team_record["team"]
+        else directory.teams.get(
+            team_id=team_record["team"].get("id"), client=client
         )
+        for team_record in team_records
+    ]
 
+    teams = []
+    for team_record, team_api in zip(team_records, team_apis):
+        last_ten = None
         for split_record in team_record["records"]["splitRecords"]:
             if split_record["type"] == "lastTen":
-                division_standings["l10"].extend(
-                    [
-                        f"{split_record.get('wins')}-"
-                        + f"{split_record.get('losses')}"
-                    ]
+                last_ten = (
+                    f"{split_record.get('wins')}-"
+                    + f"{split_record.get('losses')}"
                 )
 
-    return division_standings
+        teams.append(
+            records.StandingRow(
+                team_id=team_record["team"].get("id"),
+                abbreviation=team_api.get("abbreviation"),
+                team_name=utils.team_slug(team_api.get("teamName")),
+                wins=team_record.get("wins"),
+                losses=team_record.get("losses"),
+                pct=team_record.get("winningPercentage"),
+                gb=team_record.get("wildCardGamesBack"),
+                l10=last_ten,
+                diff=team_record.get("runsScored")
+                - team_record.get("runsAllowed"),
+            )
+        )
+
+    return records.Division(name=division_name.get("nameShort"), teams=teams)
+
+
+def get_league_divisions(league_ids, client):
+    """Grab division standings for each league from a single request"""
+    standings = api.get_all_standings(league_ids=league_ids, client=client)
+
+    leagues = []
+    for league_id in league_ids:
+        league_standings = [
+            standing
+            for standing in standings
+            if standing["league"].get("id") == league_id
+        ]
+        leagues.append(
+            [
+                get_divisions(
+                    standing=league_standings,
+                    division_idx=idx,
+                    client=client,
+                )
+                for idx in range(len(league_standings))
+            ]
+        )
+
+    return leagues
 
 
-def get_team_info(team_id, session):
+def get_team_info(team_id, client):
     """Get team related info"""
-    team_api = api.get_team(team_id=team_id, session=session)
-    league_standings = api.get_standings(
-        team_api["league"]["id"], session=session
+    team_api = directory.teams.get(team_id=team_id, client=client)
+    league_standings = api.get_all_standings(
+        league_ids=api.LEAGUE_IDS, client=client
     )
 
     for standings in league_standings:
         if standings["division"]["id"] == team_api["division"].get("id"):
+            division_name = standings["division"].get("nameShort")
             standings = standings["teamRecords"]
             break
 
@@ -99,10 +151,7 @@ def get_team_info(team_id, session):
     team_info["name"] = team_api.get("name")
     team_info["club_name"] = team_api.get("clubName").replace(" ", "").lower()
     team_info["abbreviation"] = team_api.get("abbreviation")
-    team_info["division"] = api.get_division(
-        division_id=team_api["division"].get("id"),
-        session=session,
-    ).get("nameShort")
+    team_info["division"] = division_name
     team_info["venue"] = team_api["venue"].get("name")
     team_info["venue_img"] = (
         "https://prod-gameday.mlbstatic.com/"
@@ -128,183 +177,93 @@ def get_team_info(team_id, session):
     return team_info
 
 
-def get_team_roster(team_id, season, session):
+def get_team_roster(team_id, season, client):
     """Get team rosters, grouped by hitters and pitchers"""
-    roster = api.get_rosters(team_id=team_id, session=session)
+    roster = api.get_roster_players(team_id=team_id, client=client)
 
-    # Default value for empty stats
-    null = "-"
-
-    team_rosters = defaultdict(defaultdict(list).copy)
+    team_rosters = {"hitters": [], "pitchers": []}
     for player in roster:
-        player_api = api.get_player(
-            player_id=player["person"].get("id"),
-            session=session,
-        )
         # Pitchers
-        if player_api["primaryPosition"].get("code") == "1":
-            pitching_stats, last_played_season = api.get_player_stats(
-                player_id=player_api.get("id"),
+        if player["primaryPosition"].get("code") == "1":
+            pitching_stats, last_played_season = api.get_season_stats(
+                stats=player.get("stats"),
                 category="pitching",
                 season=season,
-                session=session,
-            )
-
-            # Player info
-            team_rosters["pitchers"]["player_id"].append(player_api.get("id"))
-            team_rosters["pitchers"]["position"].extend(
-                [player_api["primaryPosition"].get("abbreviation", null)]
-            )
-            team_rosters["pitchers"]["jersey_number"].extend(
-                [player_api.get("primaryNumber", null)]
-            )
-            team_rosters["pitchers"]["photo"].extend(
-                [
-                    "https://content.mlb.com/images/headshots/current/60x60/"
-                    + f"{player_api.get('id')}.png"
-                ]
-            )
-            team_rosters["pitchers"]["first_name"].extend(
-                [player_api.get("firstName")]
-            )
-            team_rosters["pitchers"]["last_name"].extend(
-                [player_api.get("lastName")]
-            )
-            team_rosters["pitchers"]["age"].extend(
-                [player_api.get("currentAge")]
-            )
-            team_rosters["pitchers"]["throw_hand"].extend(
-                [player_api["pitchHand"].get("code")]
-            )
-            team_rosters["pitchers"]["last_played"].extend(
-                [last_played_season]
-            )
-
-            # Player stats
-            team_rosters["pitchers"]["ip"].extend(
-                [pitching_stats.get("inningsPitched", null)]
             )
-            team_rosters["pitchers"]["era"].extend(
-                [pitching_stats.get("era", null)]
-            )
-            team_rosters["pitchers"]["hr_per_9"].extend(
-                [pitching_stats.get("homeRunsPer9", null)]
-            )
-            team_rosters["pitchers"]["ops"].extend(
-                [pitching_stats.get("ops", null)]
-            )
-            strikeouts = pitching_stats.get("strikeOuts", null)
-            base_on_balls = pitching_stats.get("baseOnBalls", null)
-            batters_faced = pitching_stats.get("battersFaced", null)
-            team_rosters["pitchers"]["strikeouts"].extend([strikeouts])
-            team_rosters["pitchers"]["base_on_balls"].extend([base_on_balls])
-            team_rosters["pitchers"]["strikeout_pct"].extend(
-                [
-                    f"{round(strikeouts / batters_faced * 100)}%"
-                    if not isinstance(batters_faced, str)
-                    else null
-                ]
-            )
-            team_rosters["pitchers"]["bb_pct"].extend(
-                [
-                    f"{round(base_on_balls / batters_faced * 100)}%"
-                    if not isinstance(batters_faced, str)
-                    else null
-                ]
+            batters_faced = pitching_stats.get("battersFaced")
+            team_rosters["pitchers"].append(
+                records.PitcherRow(
+                    # Player info
+                    player_id=player.get("id"),
+                    position=player["primaryPosition"].get("abbreviation"),
+                    jersey_number=player.get("primaryNumber"),
+                    first_name=player.get("firstName"),
+                    last_name=player.get("lastName"),
+                    age=player.get("currentAge"),
+                    throw_hand=player["pitchHand"].get("code"),
+                    last_played=last_played_season,
+                    # Player stats
+                    ip=pitching_stats.get("inningsPitched"),
+                    era=pitching_stats.get("era"),
+                    hr_per_9=pitching_stats.get("homeRunsPer9"),
+                    ops=pitching_stats.get("ops"),
+                    strikeouts=pitching_stats.get("strikeOuts"),
+                    base_on_balls=pitching_stats.get("baseOnBalls"),
+                    strikeout_pct=records.rate(
+                        pitching_stats.get("strikeOuts"), batters_faced
+                    ),
+                    bb_pct=records.rate(
+                        pitching_stats.get("baseOnBalls"), batters_faced
+                    ),
+                )
             )
 
         # Hitters
         else:
-            hitting_stats, last_played_season = api.get_player_stats(
-                player_id=player_api.get("id"),
+            hitting_stats, last_played_season = api.get_season_stats(
+                stats=player.get("stats"),
                 category="hitting",
                 season=season,
-                session=session,
-            )
-            # Player info
-            team_rosters["hitters"]["player_id"].append(player_api.get("id"))
-            team_rosters["hitters"]["position"].extend(
-                [player_api["primaryPosition"].get("abbreviation", null)]
-            )
-            team_rosters["hitters"]["jersey_number"].extend(
-                [player_api.get("primaryNumber", null)]
-            )
-            team_rosters["hitters"]["photo"].extend(
-                [
-                    "https://content.mlb.com/images/headshots/current/60x60/"
-                    + f"{player_api.get('id')}.png"
-                ]
-            )
-            team_rosters["hitters"]["first_name"].extend(
-                [player_api.get("firstName")]
-            )
-            team_rosters["hitters"]["last_name"].extend(
-                [player_api.get("lastName")]
-            )
-            team_rosters["hitters"]["age"].extend(
-                [player_api.get("currentAge")]
-            )
-            team_rosters["hitters"]["bat_side"].extend(
-                [player_api["batSide"].get("code")]
             )
-            team_rosters["hitters"]["throw_hand"].extend(
-                [player_api["pitchHand"].get("code")]
-            )
-            team_rosters["hitters"]["last_played"].extend([last_played_season])
-
-            # Player stats
-            team_rosters["hitters"]["plate_appearances"].extend(
-                [hitting_stats.get("plateAppearances", null)]
-            )
-            team_rosters["hitters"]["hits"].extend(
-                [hitting_stats.get("hits", null)]
-            )
-            team_rosters["hitters"]["doubles"].extend(
-                [hitting_stats.get("doubles", null)]
-            )
-            team_rosters["hitters"]["triples"].extend(
-                [hitting_stats.get("triples", null)]
-            )
-            team_rosters["hitters"]["hrs"].extend(
-                [hitting_stats.get("homeRuns", null)]
-            )
-            team_rosters["hitters"]["stolen_bases"].extend(
-                [hitting_stats.get("stolenBases", null)]
-            )
-            team_rosters["hitters"]["avg"].extend(
-                [hitting_stats.get("avg", null)]
-            )
-            team_rosters["hitters"]["obp"].extend(
-                [hitting_stats.get("obp", null)]
-            )
-            team_rosters["hitters"]["ops"].extend(
-                [hitting_stats.get("ops", null)]
-            )
-            strikeouts = hitting_stats.get("strikeOuts", null)
-            base_on_balls = hitting_stats.get("baseOnBalls", null)
-            at_bats = hitting_stats.get("atBats", null)
-            team_rosters["hitters"]["base_on_balls"].extend([base_on_balls])
-            team_rosters["hitters"]["strikeout_pct"].extend(
-                [
-                    f"{round(strikeouts / at_bats * 100)}%"
-                    if not isinstance(at_bats, str)
-                    else null
-                ]
-            )
-            team_rosters["hitters"]["bb_pct"].extend(
-                [
-                    f"{round(base_on_balls / at_bats * 100)}%"
-                    if not isinstance(at_bats, str)
-                    else null
-                ]
+            at_bats = hitting_stats.get("atBats")
+            team_rosters["hitters"].append(
+                records.HitterRow(
+                    # Player info
+                    player_id=player.get("id"),
+                    position=player["primaryPosition"].get("abbreviation"),
+                    jersey_number=player.get("primaryNumber"),
+                    first_name=player.get("firstName"),
+                    last_name=player.get("lastName"),
+                    age=player.get("currentAge"),
+                    bat_side=player["batSide"].get("code"),
+                    throw_hand=player["pitchHand"].get("code"),
+                    last_played=last_played_season,
+                    # Player stats
+                    plate_appearances=hitting_stats.get("plateAppearances"),
+                    hits=hitting_stats.get("hits"),
+                    doubles=hitting_stats.get("doubles"),
+                    triples=hitting_stats.get("triples"),
+                    hrs=hitting_stats.get("homeRuns"),
+                    stolen_bases=hitting_stats.get("stolenBases"),
+                    avg=hitting_stats.get("avg"),
+                    obp=hitting_stats.get("obp"),
+                    ops=hitting_stats.get("ops"),
+                    base_on_balls=hitting_stats.get("baseOnBalls"),
+                    strikeout_pct=records.rate(
+                        hitting_stats.get("strikeOuts"), at_bats
+                    ),
+                    bb_pct=records.rate(
+                        hitting_stats.get("baseOnBalls"), at_bats
+                    ),
+                )
             )
 
     return team_rosters
 
 
-def get_player(player_id, session):
+def get_player(player_id, client):
     """Get play profile information"""
-    player_api = api.get_player(player_id, session)
+    player_api = directory.players.bio(player_id=player_id, client=client)
 
     player = defaultdict()
     player["id"] = player_api.get("id")
@@ -327,134 +286,221 @@ def get_player(player_id, session):
     return player
 
 
-def get_career_stats(player_id, category, session):
-    """Function to grab career stats"""
+def get_career_stats(player_id, category, client):
+    """Function to grab career stats
+
+    Returns None if the player has never played in MLB.
+    """
+    # Deferred, only the player page needs pandas
+    import pandas as pd
+
+    if category not in CAREER_STATS:
+        raise ValueError("Invalid category selected")
+
     player_career = api.get_player_stats(
         player_id=player_id,
         category=category,
-        session=session,
+        client=client,
+    )
+    # If player has never played in MLB
+    if not isinstance(player_career, list) or not player_career:
+        return None
+
+    splits = pd.json_normalize(player_career)
+    if "team.id" not in splits:
+        splits["team.id"] = None
+    if "numTeams" not in splits:
+        splits["numTeams"] = None
+    has_team = splits["team.id"].notna()
+    team_ids = splits["team.id"].fillna(0).astype(int)
+
+    # Get team abbreviations of every team played for
+    abbreviations = pd.Series(
+        {
+            team_id: directory.teams.get(team_id=team_id, client=client).get(
+                "abbreviation"
+            )
+            for team_id in team_ids[has_team].unique()
+        },
+        dtype=object,
     )
 
-    career = defaultdict(list)
-    for season in player_career:
-        # Index for sorting teams if in same year
-        career["season"].extend([season.get("season")])
-        if season_team := season.get("team"):
-            # Team index for multiple teams in a single season
-            if (
-                len(career["season"]) > 1
-                and career["season"][-2] == career["season"][-1]
-            ):
-                career["team_idx"].append(career["team_idx"][-1] + 1)
-            else:
-                career["team_idx"].append(1)
-
-            career["team"].extend([team_id := season_team.get("id")])
-            career["team_logo"].extend(
-                ["https://www.mlbstatic.com/team-logos/" + f"{team_id}.svg"]
-            )
-            career["num_teams"].append(1)
-            # Get team abbreviation
-            team_info = api.get_team(team_id=team_id, session=session)
-            career["team_name"].extend([team_info.get("abbreviation")])
+    career_df = pd.DataFrame({"season": splits["season"]})
+    # Index for sorting teams if multiple teams in a single season (season
+    # totals first)
+    career_df["team_idx"] = 0
+    career_df.loc[has_team, "team_idx"] = (
+        splits[has_team].groupby("season").cumcount() + 1
+    )
+    career_df["team"] = team_ids
+    career_df["team_logo"] = (
+        "https://www.mlbstatic.com/team-logos/" + team_ids.astype(str) + ".svg"
+    ).where(has_team, "null")
+    career_df["num_teams"] = (
+        splits["numTeams"].where(~has_team, 1).fillna(1).astype(int)
+    )
+    career_df["team_name"] = team_ids.map(abbreviations).where(
+        has_team, career_df["num_teams"].astype(str) + " teams"
+    )
 
-        else:
-            career["team_idx"].append(0)
-            career["team"].append(0)
-            career["team_logo"].extend(["null"])
-            career["num_teams"].extend([season.get("numTeams")])
-            career["team_name"].extend([f"{season.get('numTeams')} teams"])
-
-        # Stats
-        career["games"].extend([season.get("stat").get("gamesPlayed")])
-        # Pitcher specific
-        if category == "pitching":
-            career["ip"].extend([season.get("stat").get("inningsPitched")])
-            career["wins"].extend([season.get("stat").get("wins")])
-            career["losses"].extend([season.get("stat").get("losses")])
-            career["saves"].extend([season.get("stat").get("saves")])
-            career["era"].extend([season.get("stat").get("era")])
-            career["whip"].extend([season.get("stat").get("whip")])
-            career["hits"].extend([season.get("stat").get("hits")])
-            career["runs"].extend([season.get("stat").get("runs")])
-            career["strikeouts"].extend([season.get("stat").get("strikeOuts")])
-            career["bb"].extend([season.get("stat").get("baseOnBalls")])
-            career["hr_per_9"].extend([season.get("stat").get("homeRunsPer9")])
-            career["ops"].extend([season.get("stat").get("ops")])
-        elif category == "hitting":
-            career["plate_appearances"].extend(
-                [season.get("stat").get("plateAppearances")]
-            )
-            career["at_bats"].extend([season.get("stat").get("atBats")])
-            career["avg"].extend([season.get("stat").get("avg")])
-            career["runs"].extend([season.get("stat").get("runs")])
-            career["hits"].extend([season.get("stat").get("hits")])
-            career["doubles"].extend([season.get("stat").get("doubles")])
-            career["triples"].extend([season.get("stat").get("triples")])
-            career["hrs"].extend([season.get("stat").get("homeRuns")])
-            career["rbi"].extend([season.get("stat").get("rbi")])
-            career["stolen_bases"].extend(
-                [season.get("stat").get("stolenBases")]
-            )
-            career["bb"].extend([season.get("stat").get("baseOnBalls")])
-            career["strikeouts"].extend([season.get("stat").get("strikeOuts")])
-            career["obp"].extend([season.get("stat").get("obp")])
-            career["slg"].extend([season.get("stat").get("slg")])
-            career["ops"].extend([season.get("stat").get("ops")])
-        else:
-            raise ValueError("Invalid category selected")
+    # Stats
+    stat_columns = {
+        f"stat.{stat}": column for column, stat in CAREER_STATS[category]
+    }
+    career_df = career_df.join(
+        splits.reindex(columns=list(stat_columns)).rename(columns=stat_columns)
+    )
 
-    # Convert data to dataframe for easier manipulation
-    career_df = pd.DataFrame(career)
     career_df.sort_values(["season", "team_idx"], inplace=True)
 
     # Update num_teams column if multiple teams in single season
-    seasons = career_df["season"].unique()
-    for season in seasons:
-        max_teams = career_df[career_df["season"] == season]["num_teams"].max()
-        if max_teams > 1:
-            career_df.loc[
-                career_df["season"] == season, "num_teams"
-            ] = max_teams
+    career_df["num_teams"] = career_df.groupby("season")[
+        "num_teams"
+    ].transform("max")
 
     return career_df
 
 
-def get_leaders(category, player_type, session):
+def get_leaders(category, player_type, client):
     """Grab leaders for input category"""
-    category_leaders = api.get_category(
-        category=category,
-        session=session,
+    return get_all_leaders([(category, player_type)], client=client)[0]
+
+
+def get_all_leaders(categories, client):
+    """Grab leaders for multiple (category, player type) pairs
+
+    All categories are grabbed in a single request, with player info for
+    every leader grabbed in one more request.
+    """
+    league_leaders = api.get_categories(
+        categories=sorted({category for category, _ in categories}),
+        client=client,
     )
 
-    # Grab correct player type
-    for i in range(len(category_leaders)):
-        if category_leaders[i].get("statGroup") == player_type:
-            category_leaders = category_leaders[i]["leaders"]
-            break
+    # Grab correct player type for each category
+    category_leaders = []
+    for category, player_type in categories:
+        for league_leader in league_leaders:
+            if (
+                league_leader.get("leaderCategory") == category
+                and league_leader.get("statGroup") == player_type
+            ):
+                category_leaders.append(league_leader.get("leaders", []))
+                break
+        else:
+            category_leaders.append([])
+
+    # Get player info
+    player_ids = sorted(
+        {
+            player["person"].get("id")
+            for players in category_leaders
+            for player in players
+        }
+    )
+    player_apis = (
+        api.get_people(person_ids=player_ids, client=client)
+        if player_ids
+        else []
+    )
+    player_apis = {player_api["id"]: player_api for player_api in player_apis}
+
+    all_leaders = []
+    for players in category_leaders:
+        leaders = []
+        for player in players:
+            person = player.get("person", {})
+            player_api = player_apis.get(person.get("id"))
+            if player_api is None:
+                # Not returned by people, fall back to the embedded person
+                first_name, _, last_name = person.get(
+                    "fullName", ""
+                ).partition(" ")
+                player_api = {
+                    "id": person.get("id"),
+                    "firstName": first_name,
+                    "lastName": last_name,
+                }
+            leaders.append(
+                records.LeaderRow(
+                    rank=player.get("rank"),
+                    value=player.get("value"),
+                    player_id=player_api.get("id"),
+                    position=player_api.get("primaryPosition", {}).get(
+                        "abbreviation"
+                    ),
+                    first_name=player_api.get("firstName"),
+                    last_name=player_api.get("lastName"),
+                )
+            )
+        all_leaders.append(leaders)
+
+    return all_leaders
+
+
+# Page builders overlap their upstream lookups with api.fan_out rather than
+# asyncio. The app is served by WSGI workers (serve.py), where Flask async
+# views still hold a request thread each, running in a new event loop (and
+# need asgiref), and an asyncio HTTP client would add aiohttp / httpx
+# beside the pooled requests client, its disk cache and replay sessions.
+
+
+def get_team_page(team, client, store):
+    """Get info and roster for a team page, grabbed concurrently
+
+    Team info and roster are stored in store by team and season.
+    """
+    team_id, season = team["id"], team.get("season")
+
+    return api.fan_out(
+        utils.get_or_set,
+        [
+            {
+                "store": store,
+                "key": f"team:{team_id}:{season}:info",
+                "compute": partial(get_team_info, team_id, client),
+            },
+            {
+                "store": store,
+                "key": f"team:{team_id}:{season}:roster",
+                "compute": partial(
+                    get_team_roster, int(team_id), str(season), client
+                ),
+            },
+        ],
+    )
 
-    leaders = defaultdict(list)
-    for player in category_leaders:
-        # Get stat info
-        leaders["rank"].append(player.get("rank"))
-        leaders["value"].extend([player.get("value")])
 
-        # Get player info
-        player_api = api.get_player(
-            player_id=player["person"].get("id"),
-            session=session,
-        )
-        leaders["position"].extend(
-            [player_api["primaryPosition"].get("abbreviation")]
-        )
-        leaders["first_name"].extend([player_api.get("firstName")])
-        leaders["last_name"].extend([player_api.get("lastName")])
-        leaders["player_id"].append(player_api.get("id"))
-        leaders["player_photo"].extend(
-            [
-                "https://content.mlb.com/images/headshots/current/60x60/"
-                + f"{player_api.get('id')}.png"
-            ]
-        )
+def get_player_page(player_id, team_id, client, store):
+    """Get player info, team info and career stats for a player page
+
+    Player info comes from the player directory, then team info and career
+    stats are grabbed concurrently. Results are stored in store by player /
+    team (and season). Career stats are None if the player has never played
+    in MLB.
+    """
+    season = directory.teams.get(team_id=team_id, client=client).get("season")
+    player_info = utils.get_or_set(
+        store, f"player:{player_id}:info", get_player, player_id, client
+    )
+    category = "pitching" if player_info.get("position") == "P" else "hitting"
+
+    team_info, career_df = api.fan_out(
+        utils.get_or_set,
+        [
+            {
+                "store": store,
+                "key": f"team:{team_id}:{season}:info",
+                "compute": partial(get_team_info, team_id, client),
+            },
+            {
+                "store": store,
+                "key": f"player:{player_id}:{season}:career",
+                "compute": partial(
+                    get_career_stats, player_id, category, client
+                ),
+            },
+        ],
+    )
 
-    return leaders
+    return player_info, team_info, career_df
@@ -0,0 +1,226 @@
+"""Route JSON API requests with Flask
+
+Endpoints serve the same assembled data (and caches) as the HTML pages,
+with strong ETags so polling clients are answered 304 until data changes.
+"""
+import hashlib
+import json
+
+from flask import abort
+from flask import current_app as app
+from flask import request
+
+from tbj_statsapp import (
+    cache,
+    directory,
+    info,
+    metrics,
+    refresh,
+    store,
+    utils,
+    views,
+    viz,
+)
+
+# Serialized bodies by endpoint, reused while the data is unchanged
+serialized = cache.TTLCache(maxsize=256)
+SERIALIZED_TTL = 60 * 60
+
+
+def to_json_data(value):
+    """Convert row records (and containers of them) to JSON types"""
+    if hasattr(value, "_asdict"):
+        return {
+            field: to_json_data(item)
+            for field, item in value._asdict().items()
+        }
+    if isinstance(value, dict):
+        return {key: to_json_data(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_data(item) for item in value]
+
+    return value
+
+
+def json_default(value):
+    """Serialize numpy scalars (e.g. from career DataFrames)"""
+    if hasattr(value, "item"):
+        return value.item()
+
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def serialize(key, data, convert=to_json_data):
+    """Serialize data to a JSON body and strong ETag
+
+    The body is reused while key maps to the same (shared, unmutated) data
+    object, so repeated polls skip serializing and hashing.
+    """
+    cached = serialized.get(key)
+    hit = cached is not None and cached[0] is data
+    metrics.record_cache("json", hit)
+    if hit:
+        return cached[1], cached[2]
+
+    body = json.dumps(
+        convert(data), separators=(",", ":"), default=json_default
+    )
+    etag = hashlib.sha1(body.encode()).hexdigest()
+    serialized.set(key, (data, body, etag), SERIALIZED_TTL)
+
+    return body, etag
+
+
+def json_response(key, data, convert=to_json_data):
+    """Conditional JSON response (304 if the client's ETag matches)"""
+    body, etag = serialize(key, data, convert)
+
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+
+    return response.make_conditional(request)
+
+
+def career_records(career_df):
+    """Career table rows, with missing stats as null"""
+    if career_df is None:
+        return []
+
+    return (
+        career_df.astype(object)
+        .where(career_df.notna(), None)
+        .to_dict(orient="records")
+    )
+
+
+def get_team(team_id):
+    """Get MLB team from the directory, or 404"""
+    team = directory.teams.lookup("by_id", team_id, client=views.stats_client)
+    if team is None:
+        abort(404)
+
+    return team
+
+
+@app.route("/api/standings")
+def standings_json():
+    """Division standings of both leagues"""
+    # Keyed on the snapshot itself, so polls reuse its serialized body
+    leagues = refresh.refresher.get("leagues")
+
+    return json_response(
+        "standings",
+        leagues,
+        convert=lambda leagues: {"leagues": to_json_data(leagues)},
+    )
+
+
+def leaders_data(leaders):
+    """Leaders snapshot keyed by player type and category"""
+    hitter_leaders, pitcher_leaders = leaders
+
+    return to_json_data(
+        {
+            "hitting": dict(zip(views.HITTER_CATEGORIES, hitter_leaders)),
+            "pitching": dict(zip(views.PITCHER_CATEGORIES, pitcher_leaders)),
+        }
+    )
+
+
+@app.route("/api/leaders")
+def leaders_json():
+    """Hitting and pitching leaders by leaderboard category"""
+    leaders = refresh.refresher.get("leaders")
+
+    return json_response("leaders", leaders, convert=leaders_data)
+
+
+@app.route("/api/teams/<int:team_id>")
+def team_json(team_id):
+    """Team info and division standing"""
+    team = get_team(team_id)
+    team_info = utils.get_or_set(
+        store.data_store,
+        f"team:{team_id}:{team.get('season')}:info",
+        info.get_team_info,
+        team_id,
+        views.stats_client,
+    )
+
+    return json_response(f"team:{team_id}", team_info)
+
+
+@app.route("/api/teams/<int:team_id>/roster")
+def roster_json(team_id):
+    """Team roster (hitters and pitchers) with season stats"""
+    team = get_team(team_id)
+    season = team.get("season")
+    team_roster = utils.get_or_set(
+        store.data_store,
+        f"team:{team_id}:{season}:roster",
+        info.get_team_roster,
+        team_id,
+        str(season),
+        views.stats_client,
+    )
+
+    return json_response(f"roster:{team_id}", team_roster)
+
+
+@app.route("/api/players/<int:player_id>/career")
+def career_json(player_id):
+    """Season by season career stats of a player
+
+    Seasons are empty if the player has never played in MLB.
+    """
+    team_id = directory.players.team_id(
+        player_id=player_id, client=views.stats_client
+    )
+    if team_id is None:
+        abort(404)
+
+    player_info, _, career_df = info.get_player_page(
+        player_id, team_id, views.stats_client, store.data_store
+    )
+
+    return json_response(
+        f"career:{player_id}",
+        career_df,
+        convert=lambda career_df: {
+            "player_id": player_id,
+            "category": (
+                "pitching" if player_info.get("position") == "P" else "hitting"
+            ),
+            "seasons": career_records(career_df),
+        },
+    )
+
+
+@app.route("/api/players/<int:player_id>/career-chart.json")
+def career_chart(player_id):
+    """Career visualization figure spec of a player, rendered client side"""
+    team_id = directory.players.team_id(
+        player_id=player_id, client=views.stats_client
+    )
+    if team_id is None:
+        abort(404)
+
+    player_info, _, career_df = info.get_player_page(
+        player_id, team_id, views.stats_client, store.data_store
+    )
+    # Player has never played in MLB
+    if career_df is None:
+        abort(404)
+
+    spec, etag = viz.career_chart(
+        player_id, career_df, pitcher=player_info.get("position") == "P"
+    )
+
+    response = app.response_class(spec, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config["CACHE_VOLATILE_TTL"]
+
+    return response.make_conditional(request)
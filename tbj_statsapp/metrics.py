@@ -0,0 +1,459 @@
+"""Per-request instrumentation, Server-Timing headers and /metrics
+
+Upstream calls (count, latency and bytes by endpoint), cache hits / misses
+and render / viz time are recorded for the current request, which is kept
+in a context variable and so followed into fan outs. Each response gets a
+Server-Timing header summarizing its request, and everything is aggregated
+into Prometheus histograms / counters served as text from METRICS_PATH.
+
+Metrics are kept per process. Workers of a preforked server also write
+theirs to a shared directory (a JSON file per process), and every worker
+serves the sum over those files, so scrapes see the whole server whichever
+worker answers. Files of exited workers are kept, so counters never go
+backwards when workers are replaced.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import partial
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Prometheus default latency buckets (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Every metric, in the order they are exposed
+registry = []
+
+
+class Counter(object):
+    """Counter with a value per set of label values
+
+    Attributes:
+        name -- metric name
+        help -- description of the metric
+        labels -- label names
+    """
+
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = (
+                self._values.get(label_values, 0) + amount
+            )
+
+    def get(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self):
+        """Copy of the value of every series, by label values"""
+        with self._lock:
+            return dict(self._values)
+
+    def combine(self, value, other):
+        """Sum of the values of a series from two processes"""
+        return value + other
+
+    def samples(self, values=None):
+        """(name, labels, value) of every series (of values if given)"""
+        if values is None:
+            values = self.snapshot()
+
+        return [
+            (self.name, dict(zip(self.labels, label_values)), value)
+            for label_values, value in sorted(values.items())
+        ]
+
+
+class Histogram(Counter):
+    """Histogram with a series per set of label values
+
+    Attributes:
+        buckets -- upper bounds of the buckets (seconds)
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        Counter.__init__(self, name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            # Count per bucket (and +Inf), then the sum
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0] * (
+                    len(self.buckets) + 1
+                ) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def get(self, *label_values):
+        """Number of observations"""
+        with self._lock:
+            series = self._values.get(label_values)
+            return sum(series[:-1]) if series else 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                label_values: list(series)
+                for label_values, series in self._values.items()
+            }
+
+    def combine(self, value, other):
+        return [a + b for a, b in zip(value, other)]
+
+    def samples(self, values=None):
+        if values is None:
+            values = self.snapshot()
+
+        samples = []
+        for label_values, series in sorted(values.items()):
+            labels = dict(zip(self.labels, label_values))
+            count = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), series):
+                count += bucket_count
+                samples.append(
+                    (f"{self.name}_bucket", dict(labels, le=bound), count)
+                )
+            samples.append((f"{self.name}_sum", labels, series[-1]))
+            samples.append((f"{self.name}_count", labels, count))
+
+        return samples
+
+
+REQUEST_DURATION = Histogram(
+    "tbj_request_duration_seconds",
+    "Time to handle requests by route",
+    ("route", "method"),
+)
+REQUESTS = Counter(
+    "tbj_requests_total",
+    "Requests handled by route and status",
+    ("route", "method", "status"),
+)
+UPSTREAM_DURATION = Histogram(
+    "tbj_upstream_request_duration_seconds",
+    "Latency of upstream (statsapi / news feed) requests by endpoint",
+    ("endpoint",),
+)
+UPSTREAM_BYTES = Counter(
+    "tbj_upstream_response_bytes_total",
+    "Bytes received from upstream by endpoint",
+    ("endpoint",),
+)
+UPSTREAM_ERRORS = Counter(
+    "tbj_upstream_errors_total",
+    "Failed (or retried) upstream requests by endpoint",
+    ("endpoint",),
+)
+CACHE_REQUESTS = Counter(
+    "tbj_cache_requests_total",
+    "Cache lookups by cache and result (hit / miss)",
+    ("cache", "result"),
+)
+STAGE_DURATION = Histogram(
+    "tbj_stage_duration_seconds",
+    "Time spent rendering templates and generating visualizations",
+    ("stage",),
+)
+
+
+class RequestMetrics(object):
+    """Upstream calls, cache lookups and stage timings of a single request
+
+    Attributes:
+        upstream -- [calls, seconds, bytes] by upstream endpoint
+        caches -- [hits, misses] by cache
+        stages -- seconds by stage (e.g. render, viz)
+    """
+
+    def __init__(self):
+        self.upstream = {}
+        self.caches = {}
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add_upstream(self, endpoint, seconds, nbytes):
+        with self._lock:
+            totals = self.upstream.setdefault(endpoint, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += nbytes
+
+    def add_cache(self, name, hit):
+        with self._lock:
+            self.caches.setdefault(name, [0, 0])[0 if hit else 1] += 1
+
+    def add_stage(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total):
+        """Server-Timing header value (durations in milliseconds)
+
+        Upstream durations are summed over calls, so concurrent calls can
+        add up to more than the total.
+        """
+        entries = []
+        with self._lock:
+            if self.upstream:
+                calls, seconds, nbytes = (
+                    sum(column) for column in zip(*self.upstream.values())
+                )
+                entries.append(
+                    timing("upstream", seconds, f"{calls} calls, {nbytes} B")
+                )
+            for index, (endpoint, (calls, seconds, nbytes)) in enumerate(
+                sorted(self.upstream.items()), 1
+            ):
+                entries.append(
+                    timing(
+                        f"upstream-{index}",
+                        seconds,
+                        f"{endpoint} x{calls}, {nbytes} B",
+                    )
+                )
+            for name, (hits, misses) in sorted(self.caches.items()):
+                entries.append(
+                    f'cache-{name};desc="{hits} hits, {misses} misses"'
+                )
+            for stage, seconds in sorted(self.stages.items()):
+                entries.append(timing(stage, seconds))
+        entries.append(timing("total", total))
+
+        return ", ".join(entries)
+
+
+def timing(name, seconds, desc=None):
+    """Single Server-Timing metric"""
+    entry = f"{name};dur={seconds * 1000:.1f}"
+    if desc:
+        entry += f';desc="{desc}"'
+
+    return entry
+
+
+# Metrics of the request being handled (None outside requests)
+current = contextvars.ContextVar("request_metrics", default=None)
+# Stages being timed, so nested renders (e.g. fragments) count once
+_active_stages = contextvars.ContextVar("active_stages", default=frozenset())
+
+
+def record_upstream(endpoint, seconds, nbytes=0, error=False):
+    """Record an upstream request"""
+    UPSTREAM_DURATION.observe(seconds, endpoint)
+    UPSTREAM_BYTES.inc(endpoint, amount=nbytes)
+    if error:
+        UPSTREAM_ERRORS.inc(endpoint)
+
+    metrics = current.get()
+    if metrics is not None:
+        metrics.add_upstream(endpoint, seconds, nbytes)
+
+
+def record_cache(name, hit):
+    """Record a cache lookup"""
+    CACHE_REQUESTS.inc(name, "hit" if hit else "miss")
+
+    metrics = current.get()
+    if metrics is not None:
+        metrics.add_cache(name, hit)
+
+
+@contextmanager
+def timed(stage):
+    """Time the block as stage (e.g. render), unless already timing it"""
+    active = _active_stages.get()
+    if stage in active:
+        yield
+        return
+
+    token = _active_stages.set(active | {stage})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _active_stages.reset(token)
+        STAGE_DURATION.observe(seconds, stage)
+        metrics = current.get()
+        if metrics is not None:
+            metrics.add_stage(stage, seconds)
+
+
+def in_context(func):
+    """Wrap func to run in a copy of the current context (e.g. in another
+    thread), so its upstream calls count towards the current request"""
+    return partial(contextvars.copy_context().run, func)
+
+
+def escape(value):
+    """Escape a label value"""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def exposition(values=None):
+    """Every metric (of values by metric name, if given) in the Prometheus
+    text format"""
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        samples = (
+            metric.samples()
+            if values is None
+            else metric.samples(values.get(metric.name, {}))
+        )
+        for name, labels, value in samples:
+            if labels:
+                label_text = ",".join(
+                    f'{label}="{escape(label_value)}"'
+                    for label, label_value in labels.items()
+                )
+                name = f"{name}{{{label_text}}}"
+            lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def clear():
+    """Reset every metric"""
+    for metric in registry:
+        metric.clear()
+
+
+def dump(directory):
+    """Write the metrics of this process to directory/<pid>.json"""
+    values = {
+        metric.name: [
+            [list(label_values), value]
+            for label_values, value in metric.snapshot().items()
+        ]
+        for metric in registry
+    }
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(values, file)
+    os.replace(temp_path, path)
+
+
+def collect(directory):
+    """Metrics summed over every process that wrote to directory, by metric
+    name"""
+    values = {metric.name: {} for metric in registry}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as file:
+            process_values = json.load(file)
+
+        for metric in registry:
+            totals = values[metric.name]
+            for label_values, value in process_values.get(metric.name, []):
+                label_values = tuple(label_values)
+                total = totals.get(label_values)
+                totals[label_values] = (
+                    value if total is None else metric.combine(total, value)
+                )
+
+    return values
+
+
+def reset_directory(directory):
+    """Create directory, removing metrics written by a previous server"""
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            os.remove(os.path.join(directory, name))
+
+
+def start_writer(directory, interval):
+    """Write the metrics of this process to directory every interval
+    seconds, in a daemon thread"""
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                dump(directory)
+            except OSError:
+                logger.exception("Could not write metrics to %s", directory)
+
+    threading.Thread(target=run, name="metrics", daemon=True).start()
+
+
+def init_app(app):
+    """Instrument requests of app and serve metrics at METRICS_PATH"""
+    if not app.config["METRICS"]:
+        return
+
+    @app.before_request
+    def start_request():
+        g.request_metrics = RequestMetrics()
+        g.request_start = time.perf_counter()
+        current.set(g.request_metrics)
+
+    @app.after_request
+    def finish_request(response):
+        if "request_metrics" not in g:
+            return response
+        total = time.perf_counter() - g.request_start
+
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_DURATION.observe(total, route, request.method)
+        REQUESTS.inc(route, request.method, str(response.status_code))
+        if app.config["METRICS_SERVER_TIMING"]:
+            response.headers[
+                "Server-Timing"
+            ] = g.request_metrics.server_timing(total)
+
+        return response
+
+    @app.teardown_request
+    def end_request(exc):
+        current.set(None)
+
+    def metrics_view():
+        # Every worker of the server, this one up to date
+        directory = app.config["METRICS_DIR"]
+        if directory is None:
+            text = exposition()
+        else:
+            dump(directory)
+            text = exposition(collect(directory))
+
+        return app.response_class(
+            text, content_type="text/plain; version=0.0.4"
+        )
+
+    app.add_url_rule(app.config["METRICS_PATH"], "metrics", metrics_view)
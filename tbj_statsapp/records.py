@@ -0,0 +1,113 @@
+"""Row records for rosters, leaderboards and standings
+
+Rows hold raw values (None if unknown) and are formatted at render time by
+the template filters in utils. Named tuples keep rows small to store and
+pickle.
+"""
+from typing import List, NamedTuple, Optional
+
+HEADSHOT_URL = "https://content.mlb.com/images/headshots/current/60x60/"
+TEAM_LOGO_URL = "https://www.mlbstatic.com/team-logos/"
+
+
+class HitterRow(NamedTuple):
+    """Roster row of a hitter and their (last played) season stats"""
+
+    player_id: int
+    position: Optional[str]
+    jersey_number: Optional[str]
+    first_name: str
+    last_name: str
+    age: Optional[int]
+    bat_side: Optional[str]
+    throw_hand: Optional[str]
+    last_played: Optional[str]
+    plate_appearances: Optional[int]
+    hits: Optional[int]
+    doubles: Optional[int]
+    triples: Optional[int]
+    hrs: Optional[int]
+    stolen_bases: Optional[int]
+    avg: Optional[str]
+    obp: Optional[str]
+    ops: Optional[str]
+    base_on_balls: Optional[int]
+    strikeout_pct: Optional[float]
+    bb_pct: Optional[float]
+
+    @property
+    def photo(self):
+        return f"{HEADSHOT_URL}{self.player_id}.png"
+
+
+class PitcherRow(NamedTuple):
+    """Roster row of a pitcher and their (last played) season stats"""
+
+    player_id: int
+    position: Optional[str]
+    jersey_number: Optional[str]
+    first_name: str
+    last_name: str
+    age: Optional[int]
+    throw_hand: Optional[str]
+    last_played: Optional[str]
+    ip: Optional[str]
+    era: Optional[str]
+    hr_per_9: Optional[str]
+    ops: Optional[str]
+    strikeouts: Optional[int]
+    base_on_balls: Optional[int]
+    strikeout_pct: Optional[float]
+    bb_pct: Optional[float]
+
+    @property
+    def photo(self):
+        return f"{HEADSHOT_URL}{self.player_id}.png"
+
+
+class LeaderRow(NamedTuple):
+    """Leaderboard row of a single category"""
+
+    rank: int
+    value: str
+    player_id: int
+    position: Optional[str]
+    first_name: str
+    last_name: str
+
+    @property
+    def player_photo(self):
+        return f"{HEADSHOT_URL}{self.player_id}.png"
+
+
+class StandingRow(NamedTuple):
+    """Division standings row of a team"""
+
+    team_id: int
+    abbreviation: str
+    team_name: str
+    wins: int
+    losses: int
+    pct: str
+    gb: str
+    l10: Optional[str]
+    diff: int
+
+    @property
+    def logo(self):
+        return f"{TEAM_LOGO_URL}{self.team_id}.svg"
+
+
+class Division(NamedTuple):
+    """Division name and standings rows"""
+
+    name: str
+    teams: List[StandingRow]
+
+
+def rate(count, total):
+    """Fraction count / total, or None if either is unknown or total is 0"""
+    if count is None or not total:
+        return None
+
+    return count / total
@@ -0,0 +1,232 @@
+"""Background refresh of hot datasets (stale-while-revalidate snapshots)
+
+Refreshed values are also published to a store. Workers of a preforked
+server share one refreshing worker through a shared data store: the others
+follow, serving its published values rather than refreshing their own.
+"""
+import logging
+import threading
+import time
+from functools import partial
+
+import requests
+
+from tbj_statsapp import cache, store
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot(object):
+    """Last good value of a dataset, recomputed every interval seconds
+
+    Only the first get() waits for the value to be computed. Afterwards the
+    last good value is always returned immediately, and stale values are
+    recomputed in the background. If a recompute fails, the last good value
+    is kept until the next attempt.
+
+    Attributes:
+        name -- dataset name, used in logs
+        compute -- function returning a fresh value
+        interval -- seconds between recomputes
+        timer -- monotonic clock used to age the value
+    """
+
+    def __init__(self, name, compute, interval, timer=time.monotonic):
+        self.name = name
+        self.compute = compute
+        self.interval = interval
+        self.timer = timer
+        self.value = None
+        self.updated_at = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def is_stale(self):
+        """Check if never computed or last attempt older than interval"""
+        checked_at = self.checked_at
+
+        return checked_at is None or self.timer() - checked_at >= self.interval
+
+    def set(self, value):
+        """Store a value computed elsewhere (e.g. preloaded at startup)"""
+        with self._lock:
+            self.value = value
+            self.updated_at = self.checked_at = self.timer()
+
+    def reset(self):
+        """Forget the current value"""
+        with self._lock:
+            self.value = None
+            self.updated_at = None
+            self.checked_at = None
+
+    def _refresh(self):
+        """Recompute value, keeping the last good value on failure
+
+        Must be called while holding the lock.
+        """
+        try:
+            # Bypass (and update) cached upstream responses
+            with cache.refreshing():
+                value = self.compute()
+        except (requests.RequestException, KeyError, ValueError) as err:
+            if self.updated_at is None:
+                raise
+            logger.warning("Could not refresh %s: %s", self.name, err)
+        else:
+            self.value = value
+            self.updated_at = self.timer()
+        finally:
+            self.checked_at = self.timer()
+
+    def refresh(self, force=False, wait=True):
+        """Recompute value if never computed, stale or forced
+
+        If wait is False and another thread is already recomputing, return
+        without recomputing.
+        """
+        if not self._lock.acquire(blocking=wait):
+            return
+        try:
+            if force or self.is_stale():
+                self._refresh()
+        finally:
+            self._lock.release()
+
+    def refresh_in_background(self):
+        """Recompute value in a new thread unless already recomputing"""
+        if not self._lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self._refresh()
+            except Exception:
+                logger.exception("Could not refresh %s", self.name)
+            finally:
+                self._lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get(self):
+        """Return last good value, only waiting if never computed"""
+        if self.updated_at is None:
+            self.refresh()
+        elif self.is_stale():
+            self.refresh_in_background()
+
+        return self.value
+
+
+class Refresher(object):
+    """Registry of snapshots refreshed by a background thread
+
+    Attributes:
+        poll_interval -- seconds between checks for stale snapshots
+        snapshots -- registered snapshots by name
+        store -- where refreshed values are published (None to not publish)
+        follow -- serve values published to store by another process,
+                  falling back to the local snapshot until one is published
+    """
+
+    def __init__(self, poll_interval=1, store=None):
+        self.poll_interval = poll_interval
+        self.snapshots = {}
+        self.store = store
+        self.follow = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name, compute, interval):
+        """Register a dataset, returning its snapshot (existing if already
+        registered)"""
+        with self._lock:
+            if name not in self.snapshots:
+                self.snapshots[name] = Snapshot(
+                    name, partial(self.compute, name, compute), interval
+                )
+
+            return self.snapshots[name]
+
+    def compute(self, name, compute):
+        """Compute a fresh value of a dataset, publishing it to store unless
+        following"""
+        value = compute()
+        if self.store is not None and not self.follow:
+            self.store.set(f"snapshot:{name}", value)
+
+        return value
+
+    def get(self, name):
+        """Return last good value of a registered dataset (published by
+        another process if following)"""
+        if self.follow and self.store is not None:
+            value = self.store.get(f"snapshot:{name}")
+            if value is not None:
+                return value
+
+        return self.snapshots[name].get()
+
+    def reset(self):
+        """Forget the values of every snapshot"""
+        for snapshot in list(self.snapshots.values()):
+            snapshot.reset()
+
+    def refresh_stale(self, names=None):
+        """Refresh every stale snapshot (of names if given), logging
+        failures"""
+        snapshots = [
+            snapshot
+            for name, snapshot in list(self.snapshots.items())
+            if names is None or name in names
+        ]
+        for snapshot in snapshots:
+            try:
+                snapshot.refresh(wait=False)
+            except (requests.RequestException, KeyError, ValueError) as err:
+                # Never computed, will be computed on first use instead
+                logger.warning("Could not refresh %s: %s", snapshot.name, err)
+            except Exception:
+                logger.exception("Could not refresh %s", snapshot.name)
+
+    def run(self):
+        """Refresh stale snapshots until stopped"""
+        while not self._stop.wait(self.poll_interval):
+            self.refresh_stale()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start refreshing in a background (daemon) thread"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="refresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+refresher = Refresher()
+
+
+def init_app(app):
+    """Load registered snapshots and start refreshing them if enabled"""
+    refresher.poll_interval = app.config["REFRESH_POLL_INTERVAL"]
+    refresher.store = store.data_store
+
+    if app.config["BACKGROUND_REFRESH"]:
+        # Other snapshots (e.g. team news) are loaded by the background
+        # thread, or on first use
+        refresher.refresh_stale(app.config["REFRESH_PRELOAD"])
+        refresher.start()
@@ -0,0 +1,124 @@
+"""Render cache for pages and shared fragments, with HTTP validators
+
+Rendered HTML is cached by template and the versions (fingerprints) of the
+data shown, so pages are only re-rendered when their data changes. Pages
+carry an ETag derived from the same versions, so clients revalidating an
+unchanged page get a 304 without any rendering.
+"""
+import os
+import time
+
+from flask import current_app, render_template, request
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+from tbj_statsapp import metrics, utils
+from tbj_statsapp.cache import TTLCache
+
+RENDER_TTL = 60 * 60
+
+# Rendered HTML by template and data versions
+render_cache = TTLCache(maxsize=512, name="render")
+
+# Data versions by object id, and when each version was first seen
+_versions = TTLCache(maxsize=1024)
+_first_seen = TTLCache(maxsize=1024)
+
+# Fingerprint of the templates and static files, so changed templates (or
+# static URLs) are never served from the cache or validated by old ETags
+templates_version = None
+
+
+def version_of(value):
+    """Version of a shared (never mutated) data value
+
+    Versions are memoized by identity, so data served from the data store
+    or a snapshot is only fingerprinted once.
+    """
+    cached = _versions.get(id(value))
+    if cached is not None and cached[0] is value:
+        return cached[1]
+
+    version = utils.fingerprint(value)
+    _versions.set(id(value), (value, version), RENDER_TTL)
+    if version not in _first_seen:
+        _first_seen.set(version, time.time(), RENDER_TTL)
+
+    return version
+
+
+def render_key(template_name, data):
+    """Cache key (and ETag) of a template rendered with data"""
+    versions = sorted(
+        (name, version_of(value)) for name, value in data.items()
+    )
+
+    return utils.fingerprint((template_name, templates_version, versions))
+
+
+def render(template_name, key, data):
+    """Render template with data, cached by key"""
+
+    def compute():
+        with metrics.timed("render"):
+            return render_template(template_name, **data)
+
+    return render_cache.get_or_set(key, compute, RENDER_TTL)
+
+
+def fragment(template_name, **data):
+    """Render a shared fragment (e.g. news), cached by its data versions
+
+    Registered as a template global.
+    """
+    key = render_key(template_name, data)
+
+    return Markup(render(template_name, key, data))
+
+
+def page(template_name, **data):
+    """Conditional response of a page, rendered only if not cached
+
+    Every value in data must be picklable and shared (never mutated).
+    """
+    etag = render_key(template_name, data)
+    modified_at = max(
+        (_first_seen.get(version_of(value), 0) for value in data.values()),
+        default=0,
+    )
+
+    response = current_app.response_class(mimetype="text/html")
+    response.set_etag(etag)
+    if modified_at:
+        response.last_modified = modified_at
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+
+    if not is_resource_modified(
+        request.environ, etag=etag, last_modified=response.last_modified
+    ):
+        response.status_code = 304
+        return response
+
+    response.set_data(render(template_name, etag, data))
+
+    return response
+
+
+def init_app(app):
+    """Register the fragment template global and version the templates"""
+    global templates_version
+
+    files = []
+    for folder in [
+        os.path.join(app.root_path, app.template_folder),
+        app.static_folder,
+    ]:
+        for root, _, names in sorted(os.walk(folder)):
+            for name in sorted(names):
+                with open(os.path.join(root, name), "rb") as file:
+                    files.append(file.read())
+    templates_version = utils.fingerprint(files)
+
+    render_cache.clear()
+    app.add_template_global(fragment, "fragment")
@@ -0,0 +1,285 @@
+"""Record / replay of upstream (statsapi and news feed) responses
+
+In record mode every upstream response is stored in a cassette directory,
+keyed by normalized URL. In replay mode responses are served from the
+cassette without touching the network, optionally delayed (by the recorded
+latency or a fixed time) and failing at a given rate, so the app and the
+tests run offline with realistic upstream timing.
+
+Cassettes are keyed by path and query only, so responses recorded from
+statsapi.mlb.com replay against any STATSAPI_URL.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+# Response headers kept in recordings
+RECORDED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class ReplayMiss(requests.RequestException):
+    """Raised when replaying a request that was never recorded"""
+
+
+def normalize_url(url, params=None):
+    """Cassette key of a request (path and sorted query, without host)"""
+    parts = urlsplit(url)
+    path = re.sub(r"/+", "/", parts.path).strip("/")
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [
+            (name, str(value))
+            for name, value in (
+                params.items() if isinstance(params, dict) else params
+            )
+        ]
+
+    return f"{path}?{urlencode(sorted(query))}" if query else path
+
+
+class Cassette(object):
+    """Directory of recorded responses, one JSON file per normalized URL
+
+    Attributes:
+        path -- cassette directory
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Recordings read so far, by key
+        self._recordings = {}
+
+    def file(self, key):
+        name = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return os.path.join(self.path, f"{name}.json")
+
+    def get(self, key):
+        """Recording of key, or None if never recorded"""
+        recording = self._recordings.get(key)
+        if recording is not None:
+            return recording
+
+        try:
+            with open(self.file(key), encoding="utf-8") as file:
+                recording = json.load(file)
+        except FileNotFoundError:
+            return None
+        self._recordings[key] = recording
+
+        return recording
+
+    def put(self, key, recording):
+        """Store a recording, replacing any previous one of key"""
+        path = self.file(key)
+        recording = dict(recording, key=key)
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(recording, file, indent=1)
+            os.replace(temp_path, path)
+            self._recordings[key] = recording
+
+    def keys(self):
+        """Every recorded key"""
+        if not os.path.isdir(self.path):
+            return []
+
+        keys = []
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith(".json"):
+                with open(
+                    os.path.join(self.path, name), encoding="utf-8"
+                ) as file:
+                    keys.append(json.load(file)["key"])
+
+        return keys
+
+
+def build_response(url, status, headers, body):
+    """Build a (fully read) requests response"""
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response.headers.update(headers)
+    response._content = body.encode()
+    response._content_consumed = True
+
+    return response
+
+
+class RecordingSession(object):
+    """requests session recording every response into a cassette
+
+    Only complete (200) responses are recorded, so revalidations (304) keep
+    the last full body. Streamed responses are read fully.
+
+    Attributes:
+        cassette -- where responses are recorded
+        session -- session making the requests
+    """
+
+    def __init__(self, cassette, session=None):
+        self.cassette = cassette
+        self.session = session or requests.session()
+
+    def get(self, url, params=None, **kwargs):
+        start = time.perf_counter()
+        response = self.session.get(url, params=params, **kwargs)
+        # Reads streamed bodies
+        body = response.text
+        elapsed = time.perf_counter() - start
+
+        if response.status_code == 200:
+            self.cassette.put(
+                normalize_url(url, params),
+                {
+                    "status": response.status_code,
+                    "headers": {
+                        name: response.headers[name]
+                        for name in RECORDED_HEADERS
+                        if name in response.headers
+                    },
+                    "body": body,
+                    "elapsed": elapsed,
+                },
+            )
+
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+class ReplaySession(object):
+    """requests session stand-in serving responses from a cassette
+
+    Conditional requests matching the recorded ETag are answered 304.
+    Unrecorded requests raise ReplayMiss.
+
+    Attributes:
+        cassette -- recorded responses
+        latency -- "recorded" to delay each response by its recorded
+                   latency, seconds to delay every response, or None
+        latency_scale -- multiplier applied to the latency
+        failure_rate -- fraction of requests failing
+        failures -- failures injected in turn (HTTP statuses, "timeout" or
+                    "connection")
+        sleep -- function delaying responses
+    """
+
+    def __init__(
+        self,
+        cassette,
+        latency=None,
+        latency_scale=1.0,
+        failure_rate=0.0,
+        failures=(503,),
+        seed=None,
+        sleep=time.sleep,
+    ):
+        self.cassette = cassette
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.failure_rate = failure_rate
+        self.failures = failures
+        self.sleep = sleep
+        self._random = random.Random(seed)
+        self._failure_index = 0
+        self._lock = threading.Lock()
+
+    def delay(self, recording):
+        """Seconds to delay a response"""
+        if self.latency is None:
+            return 0
+        if self.latency == "recorded":
+            seconds = recording["elapsed"] if recording else 0
+        else:
+            seconds = float(self.latency)
+
+        return seconds * self.latency_scale
+
+    def failure(self):
+        """Next failure to inject, or None"""
+        with self._lock:
+            if not self.failure_rate or (
+                self._random.random() >= self.failure_rate
+            ):
+                return None
+            failure = self.failures[self._failure_index % len(self.failures)]
+            self._failure_index += 1
+
+        return failure
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        key = normalize_url(url, params)
+        recording = self.cassette.get(key)
+        seconds = self.delay(recording)
+        if seconds:
+            self.sleep(seconds)
+
+        failure = self.failure()
+        if failure == "timeout":
+            raise requests.Timeout(f"Injected timeout: {url}")
+        if failure == "connection":
+            raise requests.ConnectionError(f"Injected failure: {url}")
+        if failure is not None:
+            return build_response(url, int(failure), {}, "")
+
+        if recording is None:
+            raise ReplayMiss(f"Not recorded: {key}")
+
+        recorded_headers = recording["headers"]
+        etag = recorded_headers.get("ETag")
+        if etag and (headers or {}).get("If-None-Match") == etag:
+            return build_response(url, 304, recorded_headers, "")
+
+        return build_response(
+            url, recording["status"], recorded_headers, recording["body"]
+        )
+
+    def close(self):
+        pass
+
+
+def from_app(app):
+    """Upstream session for the UPSTREAM_MODE of app, or None if live
+
+    Cassettes default to a directory in the app instance folder.
+    """
+    config = app.config
+    mode = config["UPSTREAM_MODE"]
+    if mode == LIVE:
+        return None
+    if mode not in (RECORD, REPLAY):
+        raise ValueError(f"Unknown UPSTREAM_MODE: {mode}")
+
+    path = config["UPSTREAM_CASSETTE"]
+    if path is None:
+        path = os.path.join(app.instance_path, "upstream_cassette")
+    cassette = Cassette(path)
+    if mode == RECORD:
+        return RecordingSession(cassette)
+
+    latency = config["UPSTREAM_REPLAY_LATENCY"]
+    if latency not in (None, "recorded"):
+        latency = float(latency)
+
+    return ReplaySession(
+        cassette,
+        latency=latency,
+        latency_scale=float(config["UPSTREAM_REPLAY_LATENCY_SCALE"]),
+        failure_rate=float(config["UPSTREAM_REPLAY_FAILURE_RATE"]),
+    )
@@ -0,0 +1,321 @@
+"""Production server with preforked worker processes
+
+The app is created, its directories and snapshots loaded and its hot pages
+rendered once, before forking, so every worker starts warm and shares that
+memory copy-on-write. Each worker serves requests from the shared listening
+socket with a bounded thread pool.
+
+    python -m tbj_statsapp.serve [--host H] [--port P] [--workers N]
+                                 [--threads T]
+
+SIGTERM / SIGINT stop accepting connections, let in-flight requests finish
+(up to --graceful-timeout seconds) and exit.
+
+A single worker refreshes the background snapshots (standings, leaders,
+news). With a shared DATA_STORE_URL (sqlite / redis) the other workers
+serve the values it publishes there. With the default in-process store,
+each worker refreshes its own, multiplying background upstream traffic by
+the number of workers.
+
+Workers write their metrics to METRICS_DIR (a temporary directory unless
+set), so /metrics reports the whole server whichever worker serves it.
+"""
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from tbj_statsapp import api, metrics, refresh, store
+
+logger = logging.getLogger(__name__)
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Closes connections after each response, so idle keep-alive clients
+    never hold a pool thread"""
+
+    protocol_version = "HTTP/1.0"
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server handling requests in a bounded thread pool
+
+    Attributes:
+        pool -- thread pool requests are handled in
+    """
+
+    multithread = True
+
+    pool = None
+
+    def __init__(self, host, port, app, threads=8, fd=None):
+        BaseWSGIServer.__init__(
+            self, host, port, app, handler=RequestHandler, fd=fd
+        )
+        # Every worker wakes up for a new connection on the shared socket,
+        # but only one accepts it, the others must not block in accept()
+        self.socket.setblocking(False)
+        self.pool = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="request"
+        )
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        # Let in-flight requests finish (BaseWSGIServer also closes its own
+        # socket before the pool exists)
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+        BaseWSGIServer.server_close(self)
+
+
+def warm(app):
+    """Render the hot pages once, so workers start with them cached"""
+    client = app.test_client()
+    for url in app.config["SERVE_WARM_URLS"]:
+        try:
+            response = client.get(url)
+            response.close()
+        except Exception:
+            logger.exception("Could not warm %s", url)
+
+
+def before_fork(app):
+    """Stop background threads and drop connections workers must not
+    share"""
+    refresh.refresher.stop()
+    from tbj_statsapp import views
+
+    views.stats_client.session.close()
+    # Warm up requests are not traffic, and would be counted by every worker
+    metrics.clear()
+    # Objects loaded so far are never freed, keep the GC off their pages
+    gc.freeze()
+
+
+def after_fork(app, refresh_leader=True):
+    """Reopen connections and restart background threads in a worker
+
+    Only the refresh leader refreshes snapshots if the data store is shared,
+    the other workers follow the values it publishes there.
+    """
+    from tbj_statsapp import views
+
+    # Executor threads of the parent do not exist in the worker
+    api.reset_executor()
+    if views.stats_client.disk_cache is not None:
+        views.stats_client.disk_cache.reconnect()
+    store.data_store.reconnect()
+
+    if app.config["BACKGROUND_REFRESH"]:
+        if refresh_leader or not store.data_store.shared:
+            refresh.refresher.start()
+        else:
+            refresh.refresher.follow = True
+    if app.config["METRICS"] and app.config["METRICS_DIR"]:
+        metrics.start_writer(
+            app.config["METRICS_DIR"], app.config["METRICS_WRITE_INTERVAL"]
+        )
+
+
+def run_worker(app, listener, threads):
+    """Serve requests until SIGTERM / SIGINT"""
+    server = PooledWSGIServer(
+        *listener.getsockname()[:2], app, threads=threads, fd=listener.fileno()
+    )
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever(), so call it from a thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    server.serve_forever()
+    refresh.refresher.stop()
+    if app.config["METRICS"] and app.config["METRICS_DIR"]:
+        metrics.dump(app.config["METRICS_DIR"])
+
+
+class Arbiter(object):
+    """Forks and supervises worker processes
+
+    Workers that exit unexpectedly are replaced. On SIGTERM / SIGINT workers
+    are asked to stop and killed after graceful_timeout seconds.
+
+    Attributes:
+        app -- warmed app served by every worker
+        listener -- listening socket shared by every worker
+        workers -- number of worker processes
+        threads -- request threads per worker
+        graceful_timeout -- seconds workers are given to finish requests
+    """
+
+    def __init__(self, app, listener, workers, threads, graceful_timeout=30):
+        self.app = app
+        self.listener = listener
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.pids = set()
+        # Worker refreshing the background snapshots
+        self.refresh_leader = None
+        self.stopping = False
+
+    def spawn(self, refresh_leader=False):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                after_fork(self.app, refresh_leader)
+                run_worker(self.app, self.listener, self.threads)
+            except Exception:
+                logger.exception("Worker %s failed", os.getpid())
+                status = 1
+            finally:
+                os._exit(status)
+        self.pids.add(pid)
+        if refresh_leader:
+            self.refresh_leader = pid
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self):
+        """Serve until SIGTERM / SIGINT, returning the exit status"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for index in range(self.workers):
+            self.spawn(refresh_leader=index == 0)
+        logger.info("Serving with %s workers", self.workers)
+
+        while not self.stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid:
+                self.pids.discard(pid)
+                if not self.stopping:
+                    logger.warning("Worker %s exited (%s)", pid, status)
+                    # Avoid a fork loop if workers fail on startup
+                    time.sleep(1)
+                    # Replace the refresh leader with a new leader
+                    self.spawn(refresh_leader=pid == self.refresh_leader)
+            else:
+                time.sleep(0.1)
+
+        return self.shutdown()
+
+    def shutdown(self):
+        """Stop workers gracefully, killing any still running after
+        graceful_timeout"""
+        for pid in self.pids:
+            os.kill(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.graceful_timeout
+        status = 0
+        while self.pids and time.monotonic() < deadline:
+            pid, exit_status = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self.pids.discard(pid)
+                status = status or int(exit_status != 0)
+            else:
+                time.sleep(0.1)
+
+        for pid in self.pids:
+            logger.warning("Killing worker %s", pid)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            status = 1
+        self.listener.close()
+
+        return status
+
+
+def listen(host, port, backlog=2048):
+    """Bind the listening socket shared by every worker"""
+    listener = socket.create_server(
+        (host, port), backlog=backlog, reuse_port=False
+    )
+    listener.set_inheritable(True)
+
+    return listener
+
+
+def main(argv=None):
+    from tbj_statsapp import create_app
+
+    app = create_app()
+    config = app.config
+
+    parser = argparse.ArgumentParser(prog="python -m tbj_statsapp.serve")
+    parser.add_argument("--host", default=config["SERVE_HOST"])
+    parser.add_argument("--port", type=int, default=config["SERVE_PORT"])
+    parser.add_argument("--workers", type=int, default=config["SERVE_WORKERS"])
+    parser.add_argument("--threads", type=int, default=config["SERVE_THREADS"])
+    parser.add_argument(
+        "--graceful-timeout",
+        type=float,
+        default=config["SERVE_GRACEFUL_TIMEOUT"],
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(process)d] %(levelname)s %(message)s",
+    )
+
+    warm(app)
+    listener = listen(args.host, args.port)
+    logger.info("Listening on http://%s:%s", args.host, args.port)
+
+    # Single process (also where fork is unavailable)
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        run_worker(app, listener, args.threads)
+        listener.close()
+        return 0
+
+    # Directory workers write their metrics to, summed by /metrics
+    temp_metrics_dir = None
+    if config["METRICS"]:
+        if config["METRICS_DIR"] is None:
+            temp_metrics_dir = config["METRICS_DIR"] = tempfile.mkdtemp(
+                prefix="tbj_statsapp_metrics_"
+            )
+        metrics.reset_directory(config["METRICS_DIR"])
+
+    before_fork(app)
+    try:
+        return Arbiter(
+            app, listener, args.workers, args.threads, args.graceful_timeout
+        ).run()
+    finally:
+        if temp_metrics_dir is not None:
+            shutil.rmtree(temp_metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
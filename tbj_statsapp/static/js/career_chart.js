@@ -0,0 +1,15 @@
+// Load and render career visualization after the page is shown
+$(function () {
+  var chart = document.getElementById("career-chart");
+  if (!chart) {
+    return;
+  }
+
+  $.getJSON(chart.dataset.src)
+    .done(function (figure) {
+      Plotly.newPlot(chart, figure.data, figure.layout);
+    })
+    .fail(function () {
+      $(chart).html("<p>Visualization could not be loaded.</p>");
+    });
+});
@@ -0,0 +1,252 @@
+"""Server-side data store shared by every user session
+
+Assembled page data (team info, rosters, career stats) is stored once for all
+users rather than in each user's session. Stores are mapping-like, so they
+can be used with utils.get_or_set. Stored values are shared, so callers must
+not mutate them.
+"""
+import pickle
+import sqlite3
+import threading
+import time
+
+from tbj_statsapp.cache import TTLCache
+
+_MISSING = object()
+
+
+class Store(object):
+    """Base class for data stores
+
+    Subclasses implement get(), set() and clear().
+
+    Attributes:
+        ttl -- seconds before stored values expire
+        shared -- whether values are shared with other processes
+    """
+
+    shared = False
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        """Return stored value for key, or default if missing / expired"""
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """Store value for ttl seconds"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove all values"""
+        raise NotImplementedError
+
+    def reconnect(self):
+        """Reopen connections to shared backends (e.g. after a fork)"""
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+
+class MemoryStore(Store):
+    """In-process store, bounded by number of values"""
+
+    def __init__(self, ttl, maxsize=1024, timer=time.monotonic):
+        Store.__init__(self, ttl)
+        self._values = TTLCache(maxsize=maxsize, timer=timer)
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        self._values.set(key, value, self.ttl)
+
+    def clear(self):
+        self._values.clear()
+
+
+class SQLiteStore(Store):
+    """Store in a SQLite database file, shared by every process on a host
+
+    Values are pickled. Expired values are purged every purge_every sets.
+    """
+
+    shared = True
+
+    def __init__(self, path, ttl, timer=time.time, purge_every=100):
+        Store.__init__(self, ttl)
+        self.timer = timer
+        self.purge_every = purge_every
+        self._sets = 0
+        self.path = path
+        self._lock = threading.Lock()
+        self._connect()
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS data_store "
+            + "(key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+        )
+
+    def _connect(self):
+        self._connection = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=10,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+
+    def reconnect(self):
+        with self._lock:
+            self._connect()
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires FROM data_store WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= self.timer():
+            return default
+
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        value = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO data_store VALUES (?, ?, ?)",
+                (key, value, self.timer() + self.ttl),
+            )
+            self._sets += 1
+            if self._sets % self.purge_every == 0:
+                self._connection.execute(
+                    "DELETE FROM data_store WHERE expires <= ?",
+                    (self.timer(),),
+                )
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM data_store")
+
+
+class RedisStore(Store):
+    """Store in Redis (or any server speaking the Redis protocol)
+
+    Values are pickled and expired by Redis.
+
+    Attributes:
+        redis -- redis-py compatible client
+        prefix -- prefix of every key, so other data in Redis is untouched
+    """
+
+    shared = True
+
+    def __init__(self, redis, ttl, prefix="tbj_statsapp:"):
+        Store.__init__(self, ttl)
+        self.redis = redis
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        value = self.redis.get(self.prefix + key)
+        if value is None:
+            return default
+
+        return pickle.loads(value)
+
+    def set(self, key, value):
+        self.redis.set(
+            self.prefix + key,
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+            ex=self.ttl,
+        )
+
+    def clear(self):
+        for redis_key in self.redis.scan_iter(match=self.prefix + "*"):
+            self.redis.delete(redis_key)
+
+
+class TieredStore(Store):
+    """In-process store in front of a shared (SQLite / Redis) store
+
+    Values read from the shared store are kept in process for local.ttl
+    seconds, avoiding a round trip (and unpickling) on every read.
+    """
+
+    shared = True
+
+    def __init__(self, local, shared):
+        Store.__init__(self, shared.ttl)
+        self.local = local
+        self.shared = shared
+
+    def get(self, key, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self.local.set(key, value)
+
+        return value
+
+    def set(self, key, value):
+        self.shared.set(key, value)
+        self.local.set(key, value)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+    def reconnect(self):
+        self.shared.reconnect()
+
+
+def from_url(url, ttl, local_ttl=60, local_maxsize=1024):
+    """Create store from url
+
+    memory:// stores in process only. sqlite:///path/to/db and
+    redis://host:port/db store in a shared backend, fronted by an in-process
+    store. Redis requires the optional redis package.
+    """
+    if url.startswith("memory://"):
+        return MemoryStore(ttl, maxsize=local_maxsize)
+
+    if url.startswith("sqlite://"):
+        shared = SQLiteStore(url.replace("sqlite:///", "", 1), ttl)
+    elif url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError as err:
+            raise ImportError(
+                "The redis package is required for redis:// data stores"
+            ) from err
+        shared = RedisStore(redis.Redis.from_url(url), ttl)
+    else:
+        raise ValueError(f"Unsupported data store url: {url}")
+
+    return TieredStore(MemoryStore(local_ttl, maxsize=local_maxsize), shared)
+
+
+data_store = MemoryStore(ttl=30 * 60)
+
+
+def init_app(app):
+    """Create the shared data store from the app config"""
+    global data_store
+
+    data_store = from_url(
+        app.config["DATA_STORE_URL"],
+        ttl=app.config["DATA_STORE_TTL"],
+        local_ttl=app.config["DATA_STORE_LOCAL_TTL"],
+        local_maxsize=app.config["DATA_STORE_LOCAL_MAXSIZE"],
+    )
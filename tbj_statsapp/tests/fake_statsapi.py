@@ -0,0 +1,804 @@
+"""Offline stand-in for statsapi.mlb.com and the mlb.com news feeds
+
+The payloads mirror the shape (not the values) of the live endpoints used by
+the app. Every request is recorded so tests can count upstream calls.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+SEASON = "2022"
+SEASONS = ["2019", "2020", "2021", "2022"]
+
+FEED_LAST_MODIFIED = "Tue, 18 Oct 2022 14:00:00 GMT"
+
+LEAGUES = {103: "American League", 104: "National League"}
+
+# Division id -> (short name, league id), in statsapi standings order
+DIVISIONS = {
+    201: ("AL East", 103),
+    202: ("AL Central", 103),
+    200: ("AL West", 103),
+    204: ("NL East", 104),
+    205: ("NL Central", 104),
+    203: ("NL West", 104),
+}
+
+# (id, abbreviation, name, teamName, clubName, division, venue id, venue)
+TEAMS = [
+    (
+        147,
+        "NYY",
+        "New York Yankees",
+        "Yankees",
+        "Yankees",
+        201,
+        3313,
+        "Yankee Stadium",
+    ),
+    (
+        141,
+        "TOR",
+        "Toronto Blue Jays",
+        "Blue Jays",
+        "Blue Jays",
+        201,
+        14,
+        "Rogers Centre",
+    ),
+    (139, "TB", "Tampa Bay Rays", "Rays", "Rays", 201, 12, "Tropicana Field"),
+    (
+        110,
+        "BAL",
+        "Baltimore Orioles",
+        "Orioles",
+        "Orioles",
+        201,
+        2,
+        "Oriole Park at Camden Yards",
+    ),
+    (
+        111,
+        "BOS",
+        "Boston Red Sox",
+        "Red Sox",
+        "Red Sox",
+        201,
+        3,
+        "Fenway Park",
+    ),
+    (
+        114,
+        "CLE",
+        "Cleveland Guardians",
+        "Guardians",
+        "Guardians",
+        202,
+        5,
+        "Progressive Field",
+    ),
+    (
+        145,
+        "CWS",
+        "Chicago White Sox",
+        "White Sox",
+        "White Sox",
+        202,
+        4,
+        "Guaranteed Rate Field",
+    ),
+    (
+        142,
+        "MIN",
+        "Minnesota Twins",
+        "Twins",
+        "Twins",
+        202,
+        3312,
+        "Target Field",
+    ),
+    (
+        116,
+        "DET",
+        "Detroit Tigers",
+        "Tigers",
+        "Tigers",
+        202,
+        2394,
+        "Comerica Park",
+    ),
+    (
+        118,
+        "KC",
+        "Kansas City Royals",
+        "Royals",
+        "Royals",
+        202,
+        7,
+        "Kauffman Stadium",
+    ),
+    (
+        117,
+        "HOU",
+        "Houston Astros",
+        "Astros",
+        "Astros",
+        200,
+        2392,
+        "Minute Maid Park",
+    ),
+    (
+        136,
+        "SEA",
+        "Seattle Mariners",
+        "Mariners",
+        "Mariners",
+        200,
+        680,
+        "T-Mobile Park",
+    ),
+    (
+        108,
+        "LAA",
+        "Los Angeles Angels",
+        "Angels",
+        "Angels",
+        200,
+        1,
+        "Angel Stadium",
+    ),
+    (
+        140,
+        "TEX",
+        "Texas Rangers",
+        "Rangers",
+        "Rangers",
+        200,
+        5325,
+        "Globe Life Field",
+    ),
+    (
+        133,
+        "OAK",
+        "Oakland Athletics",
+        "Athletics",
+        "Athletics",
+        200,
+        10,
+        "Oakland Coliseum",
+    ),
+    (
+        144,
+        "ATL",
+        "Atlanta Braves",
+        "Braves",
+        "Braves",
+        204,
+        4705,
+        "Truist Park",
+    ),
+    (121, "NYM", "New York Mets", "Mets", "Mets", 204, 3289, "Citi Field"),
+    (
+        143,
+        "PHI",
+        "Philadelphia Phillies",
+        "Phillies",
+        "Phillies",
+        204,
+        2681,
+        "Citizens Bank Park",
+    ),
+    (
+        146,
+        "MIA",
+        "Miami Marlins",
+        "Marlins",
+        "Marlins",
+        204,
+        4169,
+        "loanDepot park",
+    ),
+    (
+        120,
+        "WSH",
+        "Washington Nationals",
+        "Nationals",
+        "Nationals",
+        204,
+        3309,
+        "Nationals Park",
+    ),
+    (
+        138,
+        "STL",
+        "St. Louis Cardinals",
+        "Cardinals",
+        "Cardinals",
+        205,
+        2889,
+        "Busch Stadium",
+    ),
+    (
+        158,
+        "MIL",
+        "Milwaukee Brewers",
+        "Brewers",
+        "Brewers",
+        205,
+        32,
+        "American Family Field",
+    ),
+    (112, "CHC", "Chicago Cubs", "Cubs", "Cubs", 205, 17, "Wrigley Field"),
+    (
+        113,
+        "CIN",
+        "Cincinnati Reds",
+        "Reds",
+        "Reds",
+        205,
+        2602,
+        "Great American Ball Park",
+    ),
+    (
+        134,
+        "PIT",
+        "Pittsburgh Pirates",
+        "Pirates",
+        "Pirates",
+        205,
+        31,
+        "PNC Park",
+    ),
+    (
+        119,
+        "LAD",
+        "Los Angeles Dodgers",
+        "Dodgers",
+        "Dodgers",
+        203,
+        22,
+        "Dodger Stadium",
+    ),
+    (
+        135,
+        "SD",
+        "San Diego Padres",
+        "Padres",
+        "Padres",
+        203,
+        2680,
+        "Petco Park",
+    ),
+    (
+        137,
+        "SF",
+        "San Francisco Giants",
+        "Giants",
+        "Giants",
+        203,
+        2395,
+        "Oracle Park",
+    ),
+    (
+        109,
+        "ARI",
+        "Arizona Diamondbacks",
+        "D-backs",
+        "Diamondbacks",
+        203,
+        15,
+        "Chase Field",
+    ),
+    (
+        115,
+        "COL",
+        "Colorado Rockies",
+        "Rockies",
+        "Rockies",
+        203,
+        19,
+        "Coors Field",
+    ),
+]
+
+HITTING_CATEGORIES = ["homeRuns", "onBasePlusSlugging", "stolenBases"]
+PITCHING_CATEGORIES = ["earnedRunAverage", "strikeouts", "saves"]
+
+# Notable players
+VLAD_ID = 665489  # Hitter, played every season for TOR
+TRADED_ID = 1411  # Hitter, split 2021 between TOR and NYY
+ROOKIE_ID = 1413  # Pitcher, has not played in the MLB
+
+
+def _team(team):
+    team_id, abbreviation, name, team_name, club_name, division = team[:6]
+    venue_id, venue = team[6:]
+    return {
+        "id": team_id,
+        "name": name,
+        "season": int(SEASON),
+        "venue": {"id": venue_id, "name": venue},
+        "abbreviation": abbreviation,
+        "teamName": team_name,
+        "clubName": club_name,
+        "league": {"id": DIVISIONS[division][1]},
+        "division": {"id": division},
+        "sport": {"id": 1},
+        "active": True,
+    }
+
+
+def _division(division_id):
+    name_short, league_id = DIVISIONS[division_id]
+    league = "American" if league_id == 103 else "National"
+    return {
+        "id": division_id,
+        "name": f"{league} League {name_short.split()[1]}",
+        "nameShort": name_short,
+        "league": {"id": league_id},
+    }
+
+
+def _person(person_id, team_id, pitcher, number):
+    if person_id == VLAD_ID:
+        first_name, last_name = "Vladimir", "Guerrero Jr."
+    else:
+        first_name, last_name = f"Player{number}", f"Team{team_id}"
+    person = {
+        "id": person_id,
+        "fullName": f"{first_name} {last_name}",
+        "firstName": first_name,
+        "lastName": last_name,
+        "primaryNumber": str(number + 10),
+        "currentAge": 22 + number,
+        "height": "6' 2\"",
+        "weight": 200 + number,
+        "active": True,
+        "currentTeam": {"id": team_id},
+        "primaryPosition": (
+            {"code": "1", "abbreviation": "P"}
+            if pitcher
+            else {"code": "3", "abbreviation": "1B"}
+        ),
+        "batSide": {"code": "R"},
+        "pitchHand": {"code": "R"},
+    }
+    if number % 2:
+        person["draftYear"] = 2015 + number
+    return person
+
+
+def _hitting(person_id, season):
+    seed = person_id % 97 + int(season) % 10
+    return {
+        "gamesPlayed": 100 + seed,
+        "plateAppearances": 400 + seed,
+        "atBats": 350 + seed,
+        "avg": f".{250 + seed}",
+        "runs": 50 + seed,
+        "hits": 90 + seed,
+        "doubles": 20 + seed % 10,
+        "triples": seed % 5,
+        "homeRuns": 10 + seed % 30,
+        "rbi": 40 + seed,
+        "stolenBases": seed % 20,
+        "baseOnBalls": 30 + seed % 40,
+        "strikeOuts": 80 + seed,
+        "obp": f".{320 + seed}",
+        "slg": f".{420 + seed}",
+        "ops": f".{740 + seed}",
+    }
+
+
+def _pitching(person_id, season):
+    seed = person_id % 89 + int(season) % 10
+    return {
+        "gamesPlayed": 20 + seed % 40,
+        "inningsPitched": f"{100 + seed}.1",
+        "wins": seed % 15,
+        "losses": seed % 11,
+        "saves": seed % 7,
+        "era": f"{2 + seed % 4}.{seed % 100:02d}",
+        "whip": f"1.{seed % 100:02d}",
+        "hits": 90 + seed,
+        "runs": 40 + seed,
+        "strikeOuts": 100 + seed,
+        "baseOnBalls": 30 + seed % 20,
+        "homeRunsPer9": f"1.{seed % 10}",
+        "ops": f".{650 + seed}",
+        "battersFaced": 450 + seed,
+    }
+
+
+class FakeStatsApi:
+    """Canned statsapi.mlb.com / mlb.com data"""
+
+    def __init__(self):
+        self.teams = {team[0]: _team(team) for team in TEAMS}
+        self.people = {}
+        self.rosters = {}
+        self.stats = {}
+
+        for team_id in self.teams:
+            self.rosters[team_id] = []
+            for number in range(4):
+                pitcher = number >= 2
+                person_id = team_id * 10 + number
+                if team_id == 141 and number == 0:
+                    person_id = VLAD_ID
+                person = _person(person_id, team_id, pitcher, number)
+                self.people[person_id] = person
+                self.rosters[team_id].append(
+                    {
+                        "person": {
+                            "id": person_id,
+                            "fullName": person["fullName"],
+                        },
+                        "jerseyNumber": person["primaryNumber"],
+                        "position": person["primaryPosition"],
+                        "status": {"code": "A", "description": "Active"},
+                    }
+                )
+                if person_id != ROOKIE_ID:
+                    self.stats[person_id] = self._career(
+                        person_id,
+                        team_id,
+                        "pitching" if pitcher else "hitting",
+                    )
+
+    def _career(self, person_id, team_id, group):
+        gen = _pitching if group == "pitching" else _hitting
+        splits = []
+        for season in SEASONS:
+            if person_id == TRADED_ID and season == "2021":
+                for team_idx, split_team in enumerate((147, team_id)):
+                    splits.append(
+                        {
+                            "season": season,
+                            "stat": gen(person_id + team_idx, season),
+                            "team": {"id": split_team},
+                        }
+                    )
+                splits.append(
+                    {
+                        "season": season,
+                        "stat": gen(person_id, season),
+                        "numTeams": 2,
+                    }
+                )
+            else:
+                splits.append(
+                    {
+                        "season": season,
+                        "stat": gen(person_id, season),
+                        "team": {"id": team_id},
+                    }
+                )
+        return {group: splits}
+
+    def _stats_for(self, person_id, groups):
+        career = self.stats.get(person_id, {})
+        return [
+            {
+                "type": {"displayName": "yearByYear"},
+                "group": {"displayName": group},
+                "splits": career[group],
+            }
+            for group in groups
+            if group in career
+        ]
+
+    def _person_with_stats(self, person_id, query):
+        person = dict(self.people[person_id])
+        groups = re.search(r"group=\[([^\]]*)\]", query)
+        if groups:
+            stats = self._stats_for(person_id, groups.group(1).split(","))
+            if stats:
+                person["stats"] = stats
+        return person
+
+    def _standings(self, league_ids, hydrate=""):
+        records = []
+        for division_id, (_, league_id) in DIVISIONS.items():
+            if league_id not in league_ids:
+                continue
+            team_records = []
+            division_teams = [team for team in TEAMS if team[5] == division_id]
+            for rank, team in enumerate(division_teams, start=1):
+                wins = 100 - rank * 6
+                losses = 162 - wins
+                team_records.append(
+                    {
+                        "team": (
+                            self.teams[team[0]]
+                            if "team" in hydrate
+                            else {"id": team[0], "name": team[2]}
+                        ),
+                        "wins": wins,
+                        "losses": losses,
+                        "winningPercentage": f".{wins * 1000 // 162}",
+                        "divisionRank": str(rank),
+                        "divisionGamesBack": "-"
+                        if rank == 1
+                        else str((rank - 1) * 6),
+                        "wildCardGamesBack": "-"
+                        if rank == 1
+                        else str((rank - 1) * 3),
+                        "runsScored": 700 - rank * 20,
+                        "runsAllowed": 600 + rank * 20,
+                        "leagueRecord": {
+                            "wins": wins,
+                            "losses": losses,
+                            "pct": f".{wins * 1000 // 162}",
+                        },
+                        "records": {
+                            "splitRecords": [
+                                {"type": "home", "wins": 50, "losses": 31},
+                                {
+                                    "type": "lastTen",
+                                    "wins": 10 - rank,
+                                    "losses": rank,
+                                },
+                            ]
+                        },
+                    }
+                )
+            records.append(
+                {
+                    "standingsType": "regularSeason",
+                    "league": {"id": league_id},
+                    "division": (
+                        _division(division_id)
+                        if "division" in hydrate
+                        else {"id": division_id}
+                    ),
+                    "teamRecords": team_records,
+                }
+            )
+        return {"records": records}
+
+    def _leaders(self, categories):
+        hitters = sorted(
+            person_id
+            for person_id, career in self.stats.items()
+            if "hitting" in career
+        )
+        pitchers = sorted(
+            person_id
+            for person_id, career in self.stats.items()
+            if "pitching" in career
+        )
+        groups = [
+            (category, "hitting", hitters)
+            for category in categories
+            if category in HITTING_CATEGORIES or category == "strikeouts"
+        ] + [
+            (category, "pitching", pitchers)
+            for category in categories
+            if category in PITCHING_CATEGORIES
+        ]
+        return {
+            "leagueLeaders": [
+                {
+                    "leaderCategory": category,
+                    "statGroup": group,
+                    "leaders": [
+                        {
+                            "rank": rank,
+                            "value": str(60 - rank),
+                            "person": {
+                                "id": person_id,
+                                "fullName": self.people[person_id]["fullName"],
+                            },
+                            "team": self.people[person_id]["currentTeam"],
+                        }
+                        for rank, person_id in enumerate(people[:5], start=1)
+                    ],
+                }
+                for category, group, people in groups
+            ]
+        }
+
+    def _news(self, team=None):
+        prefix = f"{team} " if team else ""
+        items = "".join(
+            f"""
+    <item>
+      <title>{prefix}Story {idx}</title>
+      <link>https://www.mlb.com/news/story-{idx}</link>
+      <dc:creator>Writer {idx}</dc:creator>
+      <pubDate>Tue, {10 + idx:02d} Oct 2022 14:00:00 GMT</pubDate>
+      <image href="https://img.mlbstatic.com/story-{idx}.jpg" />
+      <guid>story-{idx}</guid>
+    </item>"""
+            for idx in range(8)
+        )
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">
+  <channel>
+    <title>MLB News</title>
+    <link>https://www.mlb.com</link>{items}
+  </channel>
+</rss>
+"""
+
+    def route(self, url):
+        """Return (status, body, content type) for a request url"""
+        parts = urlsplit(url)
+        path = re.sub(r"/+", "/", parts.path).strip("/")
+        query = parts.query
+        params = parse_qs(query)
+
+        if path.endswith("feeds/news/rss.xml"):
+            team = path.split("/")[0] if path.count("/") > 2 else None
+            return 200, self._news(team), "application/rss+xml"
+
+        match = re.fullmatch(r"api/v1/(.*)", path)
+        if not match:
+            return 404, "{}", "application/json"
+        path = match.group(1)
+
+        if path == "teams":
+            body = {
+                "teams": [
+                    dict(team, division=_division(team["division"]["id"]))
+                    if "division" in query
+                    else team
+                    for team in self.teams.values()
+                ]
+            }
+        elif match := re.fullmatch(r"teams/(\d+)", path):
+            team = self.teams.get(int(match.group(1)))
+            body = {"teams": [team]} if team else None
+        elif match := re.fullmatch(r"teams/(\d+)/roster", path):
+            roster = self.rosters.get(int(match.group(1)))
+            if "hydrate=person" in query:
+                roster = [
+                    dict(
+                        entry,
+                        person=self._person_with_stats(
+                            entry["person"]["id"], query
+                        ),
+                    )
+                    for entry in roster
+                ]
+            body = {"roster": roster}
+        elif match := re.fullmatch(r"divisions/(\d+)", path):
+            body = {"divisions": [_division(int(match.group(1)))]}
+        elif match := re.fullmatch(r"people/(\d+)", path):
+            person_id = int(match.group(1))
+            body = (
+                {"people": [self._person_with_stats(person_id, query)]}
+                if person_id in self.people
+                else None
+            )
+        elif path == "people":
+            body = {
+                "people": [
+                    self._person_with_stats(int(person_id), query)
+                    for person_id in params["personIds"][0].split(",")
+                    if int(person_id) in self.people
+                ]
+            }
+        elif path == "sports/1/players":
+            body = {"people": list(self.people.values())}
+        elif path == "standings":
+            league_ids = [
+                int(league_id)
+                for league_id in params["leagueId"][0].split(",")
+            ]
+            body = self._standings(league_ids, params.get("hydrate", [""])[0])
+        elif path == "stats/leaders":
+            body = self._leaders(params["leaderCategories"][0].split(","))
+        else:
+            body = None
+
+        if body is None:
+            return (
+                404,
+                json.dumps({"message": "Not found"}),
+                "application/json",
+            )
+        return 200, json.dumps(body), "application/json"
+
+
+def feed_etag(body):
+    """ETag of a news feed"""
+    return f'"{hashlib.md5(body.encode()).hexdigest()}"'
+
+
+class FakeSession:
+    """requests.Session stand-in that serves FakeStatsApi data
+
+    Attributes:
+        api -- canned upstream data
+        requests -- every url requested, in order
+        headers -- request headers of every request, in order
+        not_modified -- number of 304 (not modified) responses
+    """
+
+    def __init__(self, api=None):
+        self.api = api or FakeStatsApi()
+        self.requests = []
+        self.headers = []
+        self.not_modified = 0
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        if params:
+            url = requests.Request("GET", url, params=params).prepare().url
+        self.requests.append(url)
+        self.headers.append(headers or {})
+        status, body, content_type = self.api.route(url)
+
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.headers["Content-Type"] = content_type
+        if content_type == "application/rss+xml":
+            # Feeds support conditional requests
+            etag = feed_etag(body)
+            response.headers["ETag"] = etag
+            response.headers["Last-Modified"] = FEED_LAST_MODIFIED
+            if (headers or {}).get("If-None-Match") == etag:
+                response.status_code = 304
+                self.not_modified += 1
+                body = ""
+        response._content = body.encode()
+        response._content_consumed = True
+        return response
+
+    def statsapi_requests(self):
+        """Requests made to statsapi (i.e. excluding news feeds)"""
+        return [url for url in self.requests if "statsapi" in url]
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    """Serve FakeStatsApi data over HTTP"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        status, body, content_type = self.server.api.route(self.path)
+
+        headers = {"Content-Type": content_type}
+        if content_type == "application/rss+xml":
+            headers["ETag"] = feed_etag(body)
+            headers["Last-Modified"] = FEED_LAST_MODIFIED
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                status, body = 304, ""
+
+        data = body.encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_upstream(host="127.0.0.1", port=0, latency=0, api=None):
+    """Serve FakeStatsApi over HTTP in a background thread
+
+    Stands in for statsapi and the news feeds when benchmarking a running
+    server. Each response is delayed by latency seconds. Returns the server
+    (the url is http://host:server.server_port/), stopped with shutdown().
+    """
+    server = ThreadingHTTPServer((host, port), FakeUpstreamHandler)
+    server.daemon_threads = True
+    server.api = api or FakeStatsApi()
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
@@ -0,0 +1,55 @@
+"""Testing for the benchmarks"""
+
+import unittest
+
+from tbj_statsapp import bench
+
+
+class TestStartup(unittest.TestCase):
+    """Class for testing the startup benchmark"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.result = bench.startup()
+
+    def test_no_heavy_imports(self):
+        """Check pandas / plotly figures are not imported on startup"""
+        self.assertEqual(self.result["heavy_modules"], [])
+
+    def test_measured(self):
+        """Check import time and memory are recorded"""
+        self.assertGreater(self.result["seconds"], 0)
+        self.assertGreater(self.result["max_rss_mb"], 0)
+
+    def test_check_startup(self):
+        """Check regressions are reported against thresholds"""
+        result = {"seconds": 2.0, "max_rss_mb": 100, "heavy_modules": []}
+        self.assertEqual(bench.check_startup(result, 3, 200), [])
+        self.assertEqual(len(bench.check_startup(result, 1, 50)), 2)
+
+        result["heavy_modules"] = ["pandas"]
+        self.assertEqual(
+            bench.check_startup(result), ["pandas imported on startup"]
+        )
+
+
+class TestLoad(unittest.TestCase):
+    """Class for testing the load benchmark checks"""
+
+    def test_check_load(self):
+        """Check regressions are reported against thresholds"""
+        result = {
+            "requests_per_second": 300,
+            "p99_ms": 100,
+            "errors": 0,
+            "exit_code": 0,
+        }
+        self.assertEqual(bench.check_load(result, 200, 150), [])
+        self.assertEqual(len(bench.check_load(result, 400, 50)), 2)
+
+        result.update(errors=2, exit_code=1)
+        self.assertEqual(len(bench.check_load(result)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Testing for the shared response cache"""
+
+import unittest
+
+from tbj_statsapp import cache
+
+
+class FakeTimer:
+    """Manually advanced clock"""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    """Class for testing the bounded TTL cache"""
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.cache = cache.TTLCache(maxsize=2, timer=self.timer)
+
+    def test_expiry(self):
+        """Check entries expire after their ttl"""
+        self.cache.set("a", 1, ttl=10)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.timer.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        """Check least recently used entry is evicted when full"""
+        self.cache.set("a", 1, ttl=10)
+        self.cache.set("b", 2, ttl=10)
+        # Touch "a" so "b" becomes least recently used
+        self.cache.get("a")
+        self.cache.set("c", 3, ttl=10)
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertIn("c", self.cache)
+
+    def test_get_or_set(self):
+        """Check value is only computed once while cached"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "value"
+
+        self.assertEqual(self.cache.get_or_set("a", compute, 10), "value")
+        self.assertEqual(self.cache.get_or_set("a", compute, 10), "value")
+        self.assertEqual(len(calls), 1)
+
+
+class TestCachedDecorator(unittest.TestCase):
+    """Class for testing the api caching decorator"""
+
+    def setUp(self):
+        cache.response_cache.clear()
+
+    def tearDown(self):
+        cache.response_cache.clear()
+
+    def test_client_ignored(self):
+        """Check calls with different clients share one cached result"""
+        calls = []
+
+        @cache.cached(cache.STATIC)
+        def get_thing(thing_id, client):
+            calls.append(thing_id)
+            return {"id": thing_id}
+
+        self.assertEqual(get_thing(1, client="a"), {"id": 1})
+        self.assertEqual(get_thing(1, client="b"), {"id": 1})
+        self.assertEqual(get_thing(thing_id=1, client="c"), {"id": 1})
+        get_thing(2, client="a")
+        self.assertEqual(calls, [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+"""Testing for the pooled statsapi client"""
+
+import os
+import tempfile
+import unittest
+
+import requests
+
+from tbj_statsapp import cache
+from tbj_statsapp.client import StatsApiClient, endpoint_name
+from tbj_statsapp.disk_cache import DiskCache
+from tbj_statsapp.tests.fake_statsapi import FakeSession
+
+
+class FlakySession(FakeSession):
+    """FakeSession failing the first few requests"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = list(failures)
+        self.kwargs = []
+
+    def get(self, url, params=None, **kwargs):
+        self.kwargs.append(kwargs)
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                self.requests.append(url)
+                raise failure
+            response = requests.Response()
+            response.status_code = failure
+            response._content = b""
+            response._content_consumed = True
+            self.requests.append(url)
+            return response
+        return super().get(url, params=params, **kwargs)
+
+
+class TestStatsApiClient(unittest.TestCase):
+    """Class for testing retries, timeouts and latency stats"""
+
+    def client(self, failures=(), **kwargs):
+        self.sleeps = []
+        self.upstream = FlakySession(failures)
+        return StatsApiClient(
+            session=self.upstream, sleep=self.sleeps.append, **kwargs
+        )
+
+    def test_url(self):
+        """Check paths are requested from statsapi and urls as is"""
+        client = self.client()
+        client.get("api/v1/teams/141")
+        client.get("https://www.mlb.com/feeds/news/rss.xml")
+        self.assertEqual(
+            self.upstream.requests,
+            [
+                "https://statsapi.mlb.com/api/v1/teams/141",
+                "https://www.mlb.com/feeds/news/rss.xml",
+            ],
+        )
+
+    def test_timeout(self):
+        """Check (connect, read) timeouts are sent with every request"""
+        client = self.client(connect_timeout=1, read_timeout=5)
+        client.get("api/v1/teams/141")
+        self.assertEqual(self.upstream.kwargs[0]["timeout"], (1, 5))
+
+    def test_retry_backoff(self):
+        """Check failures are retried with jittered exponential backoff"""
+        client = self.client(
+            [requests.ConnectionError(), 503, 502],
+            backoff_factor=1,
+            backoff_max=3,
+        )
+        response = client.get("api/v1/teams/141")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.upstream.requests), 4)
+        # Capped at 1, 2 then 3 seconds
+        for sleep, cap in zip(self.sleeps, [1, 2, 3]):
+            self.assertGreaterEqual(sleep, 0)
+            self.assertLessEqual(sleep, cap)
+
+    def test_retries_exhausted(self):
+        """Check last error / response is returned once retries run out"""
+        client = self.client([503, 503], retries=1)
+        self.assertEqual(client.get("api/v1/teams/141").status_code, 503)
+
+        client = self.client([requests.Timeout()] * 2, retries=1)
+        with self.assertRaises(requests.Timeout):
+            client.get("api/v1/teams/141")
+
+    def test_no_retry(self):
+        """Check client errors are not retried"""
+        client = self.client([404])
+        self.assertEqual(client.get("api/v1/teams/1").status_code, 404)
+        self.assertEqual(self.sleeps, [])
+
+    def test_latency_stats(self):
+        """Check latency is recorded by endpoint"""
+        client = self.client([503])
+        client.get("api/v1/teams/141/roster")
+        client.get("api/v1/teams/147/roster")
+        stats = client.latency_stats()["api/v1/teams/{id}/roster"]
+        self.assertEqual(stats["count"], 3)
+        self.assertEqual(stats["errors"], 1)
+        self.assertGreaterEqual(stats["max"], stats["mean"])
+
+    def test_endpoint_name(self):
+        self.assertEqual(
+            endpoint_name("https://statsapi.mlb.com/api/v1/people/665489"),
+            "api/v1/people/{id}",
+        )
+        self.assertEqual(
+            endpoint_name("https://statsapi.mlb.com/api/v1/sports/1/players"),
+            "api/v1/sports/{id}/players",
+        )
+
+
+class ValidatingSession(FlakySession):
+    """FlakySession sending ETags and answering revalidations with 304"""
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        if (headers or {}).get(
+            "If-None-Match"
+        ) == '"v1"' and not self.failures:
+            self.kwargs.append(kwargs)
+            self.requests.append(url)
+            response = requests.Response()
+            response.status_code = 304
+            response._content = b""
+            response._content_consumed = True
+            return response
+
+        response = super().get(url, params=params, **kwargs)
+        if response.status_code == 200:
+            response.headers["ETag"] = '"v1"'
+        return response
+
+
+class TestDiskCachedClient(unittest.TestCase):
+    """Class for testing statsapi responses served from the disk cache"""
+
+    def setUp(self):
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.now = 0
+        self.disk_cache = DiskCache(
+            os.path.join(tempdir.name, "cache.db"), timer=lambda: self.now
+        )
+        self.addCleanup(self.disk_cache.close)
+
+    def client(self, failures=()):
+        self.upstream = ValidatingSession(failures)
+        return StatsApiClient(
+            session=self.upstream,
+            disk_cache=self.disk_cache,
+            max_age=60,
+            stale_if_error=600,
+            retries=0,
+        )
+
+    def test_warm_restart(self):
+        """Check a new client (e.g. restarted process) serves stored
+        responses"""
+        team = self.client().get("api/v1/teams/141").json()
+        response = self.client().get("api/v1/teams/141")
+        self.assertEqual(response.json(), team)
+        self.assertEqual(self.upstream.requests, [])
+
+    def test_revalidate(self):
+        """Check responses older than max_age are revalidated"""
+        client = self.client()
+        team = client.get("api/v1/teams/141").json()
+        self.now = 60
+        self.assertEqual(client.get("api/v1/teams/141").json(), team)
+        self.assertEqual(len(self.upstream.requests), 2)
+        # Revalidated response is fresh again
+        client.get("api/v1/teams/141")
+        self.assertEqual(len(self.upstream.requests), 2)
+
+    def test_refresh_revalidates(self):
+        """Check background refreshes never use fresh stored responses"""
+        client = self.client()
+        client.get("api/v1/teams/141")
+        with cache.refreshing():
+            client.get("api/v1/teams/141")
+        self.assertEqual(len(self.upstream.requests), 2)
+
+    def test_stale_if_error(self):
+        """Check stale responses are served if statsapi is down"""
+        team = self.client().get("api/v1/teams/141").json()
+        self.now = 60
+        client = self.client([requests.ConnectionError(), 503])
+        self.assertEqual(client.get("api/v1/teams/141").json(), team)
+        self.assertEqual(client.get("api/v1/teams/141").json(), team)
+
+        self.now = 600
+        client = self.client([requests.ConnectionError()])
+        with self.assertRaises(requests.ConnectionError):
+            client.get("api/v1/teams/141")
+
+    def test_uncached_requests(self):
+        """Check news feeds and errors are not stored"""
+        client = self.client([404])
+        client.get("api/v1/teams/1")
+        client.get("https://www.mlb.com/feeds/news/rss.xml", stream=True)
+        self.assertEqual(len(self.disk_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Testing for the persistent statsapi response cache"""
+
+import os
+import tempfile
+import unittest
+
+from tbj_statsapp.disk_cache import DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+    """Class for testing the size capped SQLite response cache"""
+
+    def setUp(self):
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.path = os.path.join(tempdir.name, "cache.db")
+        self.now = 0
+
+    def open(self, **kwargs):
+        disk_cache = DiskCache(self.path, timer=lambda: self.now, **kwargs)
+        self.addCleanup(disk_cache.close)
+        return disk_cache
+
+    def test_persisted(self):
+        """Check responses and validators survive reopening"""
+        self.open().set("teams/141", b"{}", "application/json", etag='"a"')
+        stored = self.open().get("teams/141")
+        self.assertEqual(stored["body"], b"{}")
+        self.assertEqual(stored["content_type"], "application/json")
+        self.assertEqual(stored["etag"], '"a"')
+        self.assertIsNone(stored["last_modified"])
+        self.assertEqual(stored["fetched_at"], 0)
+
+    def test_version(self):
+        """Check changing version drops stored responses"""
+        self.open(version="1").set("teams/141", b"{}")
+        self.assertEqual(len(self.open(version="1")), 1)
+        self.assertEqual(len(self.open(version="2")), 0)
+
+    def test_eviction(self):
+        """Check least recently used responses are evicted when full"""
+        disk_cache = self.open(max_bytes=10)
+        disk_cache.set("a", b"1234")
+        self.now = 1
+        disk_cache.set("b", b"1234")
+        self.now = 2
+        # Use "a" so "b" is least recently used
+        disk_cache.get("a")
+        self.now = 3
+        disk_cache.set("c", b"1234")
+        self.assertIsNone(disk_cache.get("b"))
+        self.assertIsNotNone(disk_cache.get("a"))
+        self.assertEqual(disk_cache.size(), 8)
+
+    def test_touch(self):
+        """Check revalidated responses are marked as fetched"""
+        disk_cache = self.open()
+        disk_cache.set("a", b"{}")
+        self.now = 5
+        disk_cache.touch("a")
+        self.assertEqual(disk_cache.get("a")["fetched_at"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
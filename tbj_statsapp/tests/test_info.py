@@ -1,12 +1,39 @@
 """Testing for static properties (non-exhaustive list)"""
 
+import os
+import threading
+import time
 import unittest
 from datetime import datetime
+from unittest import mock
 
 import pandas
 import requests
 
-from tbj_statsapp import api, info
+from tbj_statsapp import api, cache, directory, info, records, replay
+from tbj_statsapp.client import StatsApiClient
+from tbj_statsapp.tests import fake_statsapi
+
+# Synthetic cassette, recorded from the fake_statsapi stand-in rather than
+# live statsapi / mlb.com, with near-zero latency. Replaying it only checks
+# the assemblers against canned data, not the live API or its timing.
+# UPSTREAM_MODE=record re-records it from the live upstream and
+# UPSTREAM_MODE=live runs these tests against the live upstream directly.
+CASSETTE = os.path.join(os.path.dirname(__file__), "cassettes", "info")
+
+
+def upstream_client():
+    """Client replaying (or recording) upstream responses"""
+    cassette = replay.Cassette(CASSETTE)
+    mode = os.environ.get("UPSTREAM_MODE", replay.REPLAY)
+    if mode == replay.RECORD:
+        session = replay.RecordingSession(cassette)
+    elif mode == replay.LIVE:
+        session = None
+    else:
+        session = replay.ReplaySession(cassette)
+
+    return StatsApiClient(session=session, retries=2)
 
 
 # Test grabbing news
@@ -15,16 +42,13 @@ class TestNewsGrab(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        """Instantiate session for testing, try to reconnect twice if fail"""
+        """Instantiate client for testing, try to reconnect twice if fail"""
         # Request
-        cls.test_session = requests.session()
-        adapter = requests.adapters.HTTPAdapter(max_retries=2)
-        cls.test_session.mount("https://", adapter)
-        cls.test_session.mount("http://", adapter)
+        cls.test_client = upstream_client()
 
     def test_news(self):
         """Test general news, and that only 4 recent articles are grabbed"""
-        news = info.get_recent_news(self.test_session)
+        news = info.get_recent_news(self.test_client)
         # Assert expected articles are grabbed
         self.assertIn("title", news.keys())
         self.assertIn("link", news.keys())
@@ -37,7 +61,7 @@ class TestNewsGrab(unittest.TestCase):
     def test_team_news(self):
         """Test ability to grab team news, and that only 4 recent articles are
         grabbed"""
-        team_news = info.get_recent_news(self.test_session, team="bluejays")
+        team_news = info.get_recent_news(self.test_client, team="bluejays")
         # Assert expected articles are grabbed
         self.assertIn("title", team_news.keys())
         self.assertIn("link", team_news.keys())
@@ -53,11 +77,8 @@ class TestInfoGrab(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        """Instantiate session for testing, try to reconnect twice if fail"""
-        cls.test_session = requests.session()
-        adapter = requests.adapters.HTTPAdapter(max_retries=2)
-        cls.test_session.mount("https://", adapter)
-        cls.test_session.mount("http://", adapter)
+        """Instantiate client for testing, try to reconnect twice if fail"""
+        cls.test_client = upstream_client()
         # Team info
         cls.team_id = 141
         cls.team_name = "Toronto Blue Jays"
@@ -75,7 +96,7 @@ class TestInfoGrab(unittest.TestCase):
 
     def test_team_info(self):
         """Check appropriate team information is grabbed"""
-        team_info = info.get_team_info(self.team_id, self.test_session)
+        team_info = info.get_team_info(self.team_id, self.test_client)
         self.assertEqual(team_info.get("team_id"), self.team_id)
         self.assertEqual(team_info.get("name"), self.team_name)
         self.assertEqual(team_info.get("club_name"), self.club_name)
@@ -86,7 +107,7 @@ class TestInfoGrab(unittest.TestCase):
     def test_get_team_roster(self):
         """Check rosters are grabbed and players exist"""
         team_roster = info.get_team_roster(
-            self.team_id, datetime.now().year, self.test_session
+            self.team_id, datetime.now().year, self.test_client
         )
         # Check if pitchers exist
         self.assertIn("pitchers", team_roster.keys())
@@ -97,7 +118,7 @@ class TestInfoGrab(unittest.TestCase):
 
     def test_get_player(self):
         """Check get_player"""
-        player_info = info.get_player(self.player_id, self.test_session)
+        player_info = info.get_player(self.player_id, self.test_client)
         # Check player info
         self.assertEqual(player_info.get("id"), self.player_id)
         self.assertEqual(player_info.get("name"), self.player_name)
@@ -108,7 +129,7 @@ class TestInfoGrab(unittest.TestCase):
         """Test career stats"""
         # Check career return of the right type
         career_info = info.get_career_stats(
-            self.player_id, self.player_category, self.test_session
+            self.player_id, self.player_category, self.test_client
         )
         self.assertIsInstance(career_info, pandas.core.frame.DataFrame)
         # Check error raised if false category provided
@@ -117,24 +138,30 @@ class TestInfoGrab(unittest.TestCase):
             info.get_career_stats,
             self.player_id,
             "abc",
-            self.test_session,
+            self.test_client,
         )
 
     def test_leaders(self):
         """Test leaders for a single category"""
         leaders = info.get_leaders(
-            self.stat_category, "hitting", self.test_session
+            self.stat_category, "hitting", self.test_client
         )
         # Check for correct number of players
-        self.assertEqual(len(leaders.get("rank")), 5)
+        self.assertEqual(len(leaders), 5)
         # Check for categories
-        self.assertIn("rank", leaders.keys())
-        self.assertIn("value", leaders.keys())
-        self.assertIn("position", leaders.keys())
-        self.assertIn("first_name", leaders.keys())
-        self.assertIn("last_name", leaders.keys())
-        self.assertIn("player_id", leaders.keys())
-        self.assertIn("player_photo", leaders.keys())
+        self.assertEqual(
+            records.LeaderRow._fields,
+            (
+                "rank",
+                "value",
+                "player_id",
+                "position",
+                "first_name",
+                "last_name",
+            ),
+        )
+        self.assertEqual(leaders[0].rank, 1)
+        self.assertIn(str(leaders[0].player_id), leaders[0].player_photo)
 
 
 class TestStandingsGrab(unittest.TestCase):
@@ -142,12 +169,9 @@ class TestStandingsGrab(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        """Instantiate session for testing, try to reconnect twice if fail"""
+        """Instantiate client for testing, try to reconnect twice if fail"""
         # Request
-        cls.test_session = requests.session()
-        adapter = requests.adapters.HTTPAdapter(max_retries=2)
-        cls.test_session.mount("https://", adapter)
-        cls.test_session.mount("http://", adapter)
+        cls.test_client = upstream_client()
         # Info
         cls.standing_id = 103
         cls.division_name = "AL East"
@@ -159,19 +183,392 @@ class TestStandingsGrab(unittest.TestCase):
         """Check to make sure standings are grabbed correctly
         Only check to make sure all 3 divisions are grabbed
         """
-        standings = api.get_standings(self.standing_id, self.test_session)
+        standings = api.get_standings(self.standing_id, self.test_client)
         self.assertEqual(len(standings), 3)
 
     def test_get_division(self):
         division = info.get_divisions(
-            api.get_standings(self.standing_id, self.test_session),
+            api.get_standings(self.standing_id, self.test_client),
             0,
-            self.test_session,
+            self.test_client,
+        )
+        self.assertEqual(division.name, self.division_name)
+        self.assertEqual(
+            [team.team_id for team in division.teams], self.team_ids
+        )
+        self.assertEqual(
+            [team.abbreviation for team in division.teams], self.abbreviations
+        )
+        self.assertEqual(
+            [team.team_name for team in division.teams], self.team_names
+        )
+
+
+class OfflineTestCase(unittest.TestCase):
+    """Base class grabbing data from an offline upstream"""
+
+    def setUp(self):
+        cache.response_cache.clear()
+        api.news_feeds.clear()
+        directory.teams = directory.TeamDirectory()
+        directory.players = directory.PlayerDirectory()
+        self.upstream = fake_statsapi.FakeSession()
+        self.stats_client = StatsApiClient(session=self.upstream)
+
+    def tearDown(self):
+        cache.response_cache.clear()
+
+
+class TestOfflineRoster(OfflineTestCase):
+    """Test roster assembly against an offline upstream"""
+
+    def test_roster_single_request(self):
+        """Check full roster with stats is grabbed in one request"""
+        team_roster = info.get_team_roster(
+            141, fake_statsapi.SEASON, self.stats_client
+        )
+        self.assertEqual(len(self.upstream.requests), 1)
+        self.assertEqual(len(team_roster["hitters"]), 2)
+        self.assertEqual(len(team_roster["pitchers"]), 2)
+        self.assertIn(
+            fake_statsapi.VLAD_ID,
+            [hitter.player_id for hitter in team_roster["hitters"]],
+        )
+        self.assertTrue(
+            all(
+                isinstance(pitcher, records.PitcherRow)
+                for pitcher in team_roster["pitchers"]
+            )
+        )
+
+    def test_roster_season_stats(self):
+        """Check season totals, last played and unplayed seasons"""
+        team_roster = info.get_team_roster(141, "2021", self.stats_client)
+        hitters = {
+            hitter.player_id: hitter for hitter in team_roster["hitters"]
+        }
+        traded = hitters[fake_statsapi.TRADED_ID]
+        self.assertEqual(traded.last_played, "2021")
+        # Season total (rather than a single team's stats) is used
+        stats = fake_statsapi._hitting(fake_statsapi.TRADED_ID, "2021")
+        self.assertEqual(traded.hits, stats["hits"])
+        self.assertEqual(
+            traded.strikeout_pct, stats["strikeOuts"] / stats["atBats"]
+        )
+
+        pitchers = {
+            pitcher.player_id: pitcher for pitcher in team_roster["pitchers"]
+        }
+        rookie = pitchers[fake_statsapi.ROOKIE_ID]
+        self.assertIsNone(rookie.last_played)
+        self.assertIsNone(rookie.era)
+        self.assertIsNone(rookie.strikeout_pct)
+
+
+class TestOfflineCareer(OfflineTestCase):
+    """Test career table assembly against an offline upstream"""
+
+    def test_career_columns(self):
+        """Check career table columns for hitters and pitchers"""
+        hitting = info.get_career_stats(
+            fake_statsapi.VLAD_ID, "hitting", self.stats_client
+        )
+        self.assertEqual(
+            list(hitting.columns[:8]),
+            [
+                "season",
+                "team_idx",
+                "team",
+                "team_logo",
+                "num_teams",
+                "team_name",
+                "games",
+                "plate_appearances",
+            ],
+        )
+        self.assertEqual(list(hitting["season"]), fake_statsapi.SEASONS)
+        self.assertEqual(set(hitting["team_name"]), {"TOR"})
+
+        pitching = info.get_career_stats(1412, "pitching", self.stats_client)
+        self.assertEqual(
+            list(pitching.columns[6:]),
+            [column for column, _ in info.CAREER_STATS["pitching"]],
+        )
+
+    def test_traded_season(self):
+        """Check season total is followed by each team played for"""
+        career = info.get_career_stats(
+            fake_statsapi.TRADED_ID, "hitting", self.stats_client
+        )
+        # Player stats and the team directory, however many teams
+        self.assertEqual(len(self.upstream.requests), 2)
+        season = career[career["season"] == "2021"]
+        self.assertEqual(list(season["team_idx"]), [0, 1, 2])
+        self.assertEqual(list(season["num_teams"]), [2, 2, 2])
+        self.assertEqual(season["team_name"].iloc[0], "2 teams")
+        self.assertEqual(season["team_logo"].iloc[0], "null")
+        self.assertEqual(set(season["team_name"].iloc[1:]), {"TOR", "NYY"})
+        # Other seasons are a single team
+        self.assertEqual(
+            set(career[career["season"] != "2021"]["num_teams"]), {1}
+        )
+
+    def test_never_played(self):
+        """Check players who have never played in MLB have no career"""
+        self.assertIsNone(
+            info.get_career_stats(
+                fake_statsapi.ROOKIE_ID, "pitching", self.stats_client
+            )
+        )
+
+    def test_invalid_category(self):
+        """Check invalid category raises before any request"""
+        with self.assertRaises(ValueError):
+            info.get_career_stats(
+                fake_statsapi.VLAD_ID, "fielding", self.stats_client
+            )
+        self.assertEqual(self.upstream.requests, [])
+
+
+class TestOfflineLeaders(OfflineTestCase):
+    """Test leaderboard assembly against an offline upstream"""
+
+    def test_all_leaders(self):
+        """Check all categories are grabbed in two requests"""
+        categories = [
+            (category, "hitting")
+            for category in fake_statsapi.HITTING_CATEGORIES
+        ] + [
+            (category, "pitching")
+            for category in fake_statsapi.PITCHING_CATEGORIES
+        ]
+        all_leaders = info.get_all_leaders(categories, self.stats_client)
+        self.assertEqual(len(self.upstream.requests), 2)
+        self.assertEqual(len(all_leaders), 6)
+        for leaders in all_leaders:
+            self.assertEqual(
+                [leader.rank for leader in leaders], [1, 2, 3, 4, 5]
+            )
+        # Strikeouts leaders are pitchers, not hitters
+        self.assertEqual({leader.position for leader in all_leaders[4]}, {"P"})
+
+    def test_single_category(self):
+        """Check single category matches batched result"""
+        leaders = info.get_leaders("homeRuns", "hitting", self.stats_client)
+        batched = info.get_all_leaders(
+            [("homeRuns", "hitting"), ("saves", "pitching")], self.stats_client
+        )
+        self.assertEqual(leaders, batched[0])
+
+    def test_missing_person(self):
+        """Check leaders missing from people fall back to their summary"""
+        get_people = api.get_people
+        leaders = info.get_leaders("homeRuns", "hitting", self.stats_client)
+        missing_id = leaders[0].player_id
+        cache.response_cache.clear()
+
+        def get_people_missing(person_ids, client):
+            return [
+                person
+                for person in get_people(person_ids=person_ids, client=client)
+                if person["id"] != missing_id
+            ]
+
+        with mock.patch.object(api, "get_people", get_people_missing):
+            missing = info.get_leaders(
+                "homeRuns", "hitting", self.stats_client
+            )
+        self.assertEqual(len(missing), 5)
+        self.assertEqual(missing[1:], leaders[1:])
+        self.assertEqual(missing[0].player_id, missing_id)
+        self.assertEqual(missing[0].first_name, leaders[0].first_name)
+        self.assertEqual(missing[0].last_name, leaders[0].last_name)
+        self.assertIsNone(missing[0].position)
+
+
+class TestOfflineStandings(OfflineTestCase):
+    """Test standings assembly against an offline upstream"""
+
+    def test_league_divisions(self):
+        """Check both leagues are built from a single request"""
+        leagues = info.get_league_divisions(api.LEAGUE_IDS, self.stats_client)
+        self.assertEqual(len(self.upstream.requests), 1)
+        self.assertEqual(
+            [division.name for division in leagues[0]],
+            ["AL East", "AL Central", "AL West"],
+        )
+        self.assertEqual(len(leagues[1]), 3)
+        al_east = leagues[0][0]
+        self.assertEqual(
+            [team.team_id for team in al_east.teams], [147, 141, 139, 110, 111]
+        )
+        self.assertEqual(
+            [team.abbreviation for team in al_east.teams],
+            ["NYY", "TOR", "TB", "BAL", "BOS"],
+        )
+        self.assertEqual(
+            [team.team_name for team in al_east.teams],
+            ["yankees", "bluejays", "rays", "orioles", "redsox"],
+        )
+
+    def test_team_info(self):
+        """Check team info shares the cached standings"""
+        info.get_league_divisions(api.LEAGUE_IDS, self.stats_client)
+        team_info = info.get_team_info(141, self.stats_client)
+        self.assertEqual(team_info.get("division"), "AL East")
+        self.assertEqual(team_info.get("division_rank"), "2nd")
+        # Only the team itself is requested
+        self.assertEqual(len(self.upstream.requests), 2)
+
+
+class TestOfflineNews(OfflineTestCase):
+    """Test news grabbing against an offline upstream"""
+
+    def test_recent_news(self):
+        """Check only the first 4 stories are parsed, with formatted dates"""
+        news = info.get_recent_news(self.stats_client, team="bluejays")
+        self.assertEqual(len(news["title"]), 4)
+        self.assertEqual(news["title"][0], "bluejays Story 0")
+        self.assertEqual(news["author"][0], "Writer 0")
+        self.assertEqual(
+            news["image"][0], "https://img.mlbstatic.com/story-0.jpg"
+        )
+        self.assertEqual(news["date"][0], "Oct 10 2022")
+
+    def test_parse_limit(self):
+        """Check parsing stops once limit stories are parsed"""
+        chunks = iter([self.upstream.get(api.NEWS_RSS).content, b"<broken"])
+        self.assertEqual(len(api.parse_news(chunks, limit=2)), 2)
+
+    def test_revalidation(self):
+        """Check unchanged feeds are revalidated rather than grabbed again"""
+        news = api.get_news(client=self.stats_client, limit=4)
+        cache.response_cache.clear()
+        self.assertEqual(api.get_news(client=self.stats_client, limit=4), news)
+        self.assertEqual(len(self.upstream.requests), 2)
+        self.assertEqual(self.upstream.not_modified, 1)
+        self.assertEqual(
+            self.upstream.headers[-1]["If-Modified-Since"],
+            fake_statsapi.FEED_LAST_MODIFIED,
+        )
+
+    def test_failed_revalidation(self):
+        """Check failed or redirected feeds keep the last good feed"""
+        client = StatsApiClient(session=self.upstream, retries=0)
+        news = api.get_news(client=client, limit=4)
+        feed = api.news_feeds[(api.NEWS_RSS, 4)]
+        for status in (503, 301):
+            cache.response_cache.clear()
+            with mock.patch.object(
+                self.upstream.api,
+                "route",
+                return_value=(status, "", "text/html"),
+            ):
+                self.assertEqual(api.get_news(client=client, limit=4), news)
+            self.assertIs(api.news_feeds[(api.NEWS_RSS, 4)], feed)
+
+        # Without a previous feed the failure is raised
+        api.news_feeds.clear()
+        cache.response_cache.clear()
+        with mock.patch.object(
+            self.upstream.api, "route", return_value=(503, "", "text/html")
+        ):
+            with self.assertRaises(requests.HTTPError):
+                api.get_news(client=client, limit=4)
+        self.assertEqual(api.news_feeds, {})
+
+
+class TestOfflinePages(OfflineTestCase):
+    """Test page assemblers against an offline upstream"""
+
+    def test_team_page(self):
+        """Check team page matches single assemblers and is stored"""
+        store = {}
+        team_info, team_roster = info.get_team_page(
+            {"id": 141, "season": 2022}, self.stats_client, store
+        )
+        self.assertEqual(team_info, info.get_team_info(141, self.stats_client))
+        self.assertEqual(
+            team_roster,
+            info.get_team_roster(141, fake_statsapi.SEASON, self.stats_client),
+        )
+        self.assertEqual(
+            set(store), {"team:141:2022:info", "team:141:2022:roster"}
+        )
+
+    def test_player_page(self):
+        """Check rookies have no career stats"""
+        player_info, _, career_df = info.get_player_page(
+            fake_statsapi.VLAD_ID, 141, self.stats_client, store={}
+        )
+        self.assertEqual(player_info["name"], "Vladimir Guerrero Jr.")
+        self.assertIn("2022", list(career_df["season"]))
+
+        team_id = fake_statsapi.ROOKIE_ID // 10
+        _, _, career_df = info.get_player_page(
+            fake_statsapi.ROOKIE_ID, team_id, self.stats_client, store={}
+        )
+        self.assertIsNone(career_df)
+
+
+class TestFanOut(unittest.TestCase):
+    """Test concurrent upstream fan out"""
+
+    def test_order(self):
+        """Check results are returned in call order"""
+        results = api.fan_out(
+            lambda delay: time.sleep(delay) or delay,
+            [{"delay": delay} for delay in [0.03, 0.01, 0.02, 0]],
+        )
+        self.assertEqual(results, [0.03, 0.01, 0.02, 0])
+
+    def test_max_workers(self):
+        """Check in-flight calls never exceed MAX_WORKERS, even nested"""
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def call(idx):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return idx
+
+        def nested(idx):
+            return api.fan_out(call, [{"idx": idx}, {"idx": idx}])
+
+        max_workers = api.MAX_WORKERS
+        api.MAX_WORKERS = 3
+        api.reset_executor()
+        try:
+            results = api.fan_out(
+                lambda: api.fan_out(
+                    nested, [{"idx": idx} for idx in range(5)]
+                ),
+                [{}, {}],
+            )
+        finally:
+            api.MAX_WORKERS = max_workers
+            api.reset_executor()
+        self.assertEqual(results, [[[idx, idx] for idx in range(5)]] * 2)
+        self.assertLessEqual(in_flight[1], 3)
+
+    def test_error(self):
+        """Check errors raised by a call are propagated"""
+
+        def call(idx):
+            if idx == 2:
+                raise ValueError("Invalid call")
+            return idx
+
+        self.assertRaises(
+            ValueError,
+            api.fan_out,
+            call,
+            [{"idx": idx} for idx in range(5)],
         )
-        self.assertEqual(division.get("name"), self.division_name)
-        self.assertEqual(division.get("team_ids"), self.team_ids)
-        self.assertEqual(division.get("abbreviations"), self.abbreviations)
-        self.assertEqual(division.get("team_names"), self.team_names)
 
 
 if __name__ == "__main__":
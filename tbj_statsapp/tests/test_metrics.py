@@ -0,0 +1,176 @@
+"""Testing for per-request instrumentation"""
+
+import os
+import tempfile
+import unittest
+
+from tbj_statsapp import api, cache, directory, info, metrics, utils
+from tbj_statsapp.client import StatsApiClient
+from tbj_statsapp.tests.fake_statsapi import FakeSession
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Base class recording into fresh request metrics"""
+
+    def setUp(self):
+        metrics.clear()
+        self.request = metrics.RequestMetrics()
+        self.token = metrics.current.set(self.request)
+
+    def tearDown(self):
+        metrics.current.reset(self.token)
+
+
+class TestHistogram(unittest.TestCase):
+    """Class for testing Prometheus histograms"""
+
+    def test_samples(self):
+        """Check buckets are cumulative, with sum and count"""
+        histogram = metrics.Histogram("test_seconds", "Test", ("route",))
+        metrics.registry.remove(histogram)
+        for value in (0.1, 0.2, 3):
+            histogram.observe(value, "/teams")
+
+        samples = {
+            (name, labels.get("le")): value
+            for name, labels, value in histogram.samples()
+        }
+        self.assertEqual(samples[("test_seconds_bucket", 0.1)], 1)
+        self.assertEqual(samples[("test_seconds_bucket", 0.25)], 2)
+        self.assertEqual(samples[("test_seconds_bucket", 2.5)], 2)
+        self.assertEqual(samples[("test_seconds_bucket", "+Inf")], 3)
+        self.assertAlmostEqual(samples[("test_seconds_sum", None)], 3.3)
+        self.assertEqual(samples[("test_seconds_count", None)], 3)
+
+    def test_exposition(self):
+        """Check text format and escaped label values"""
+        metrics.clear()
+        metrics.CACHE_REQUESTS.inc('a"b', "hit")
+        text = metrics.exposition()
+        self.assertIn("# TYPE tbj_cache_requests_total counter", text)
+        self.assertIn(
+            'tbj_cache_requests_total{cache="a\\"b",result="hit"} 1', text
+        )
+
+
+class TestWorkers(unittest.TestCase):
+    """Class for testing metrics summed across worker processes"""
+
+    def setUp(self):
+        metrics.clear()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        metrics.clear()
+        self.directory.cleanup()
+
+    def test_collect(self):
+        """Check counters and histograms are summed over every process"""
+        metrics.REQUESTS.inc("/teams", "GET", "200")
+        metrics.REQUEST_DURATION.observe(0.1, "/teams", "GET")
+        metrics.dump(self.directory.name)
+        # As written by another worker
+        os.replace(
+            os.path.join(self.directory.name, f"{os.getpid()}.json"),
+            os.path.join(self.directory.name, "1.json"),
+        )
+        metrics.REQUEST_DURATION.observe(3, "/teams", "GET")
+        metrics.dump(self.directory.name)
+
+        values = metrics.collect(self.directory.name)
+        self.assertEqual(
+            values["tbj_requests_total"], {("/teams", "GET", "200"): 2}
+        )
+        text = metrics.exposition(values)
+        self.assertIn(
+            'tbj_request_duration_seconds_bucket{route="/teams",method="GET",'
+            + 'le="+Inf"} 3',
+            text,
+        )
+        self.assertIn(
+            'tbj_request_duration_seconds_bucket{route="/teams",method="GET",'
+            + 'le="0.1"} 2',
+            text,
+        )
+
+    def test_reset_directory(self):
+        """Check metrics of a previous server are removed"""
+        metrics.dump(self.directory.name)
+        metrics.reset_directory(self.directory.name)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+class TestRequestMetrics(MetricsTestCase):
+    """Class for testing metrics recorded for the current request"""
+
+    def test_upstream(self):
+        """Check upstream calls are counted by endpoint"""
+        client = StatsApiClient(session=FakeSession())
+        client.get("api/v1/teams/141")
+        client.get("api/v1/teams/147")
+
+        calls, seconds, nbytes = self.request.upstream["api/v1/teams/{id}"]
+        self.assertEqual(calls, 2)
+        self.assertGreater(nbytes, 0)
+        self.assertEqual(metrics.UPSTREAM_DURATION.get("api/v1/teams/{id}"), 2)
+
+    def test_fan_out(self):
+        """Check calls in fan out threads count towards the request"""
+        client = StatsApiClient(session=FakeSession())
+        api.fan_out(
+            client.get, [{"path": f"api/v1/teams/{id}"} for id in (141, 147)]
+        )
+        self.assertEqual(self.request.upstream["api/v1/teams/{id}"][0], 2)
+
+    def test_page(self):
+        """Check page lookups fanned out count towards the request"""
+        cache.response_cache.clear()
+        directory.teams = directory.TeamDirectory()
+        directory.players = directory.PlayerDirectory()
+        client = StatsApiClient(session=FakeSession())
+        info.get_team_page({"id": 141, "season": 2022}, client, store={})
+        self.assertIn("api/v1/teams/{id}/roster", self.request.upstream)
+        self.assertIn("api/v1/standings", self.request.upstream)
+        self.assertEqual(self.request.caches["store"], [0, 2])
+        cache.response_cache.clear()
+
+    def test_store(self):
+        """Check stored page data hits and misses"""
+        store = {}
+        utils.get_or_set(store, "a", lambda: 1)
+        utils.get_or_set(store, "a", lambda: 1)
+        self.assertEqual(self.request.caches["store"], [1, 1])
+
+    def test_cache(self):
+        """Check named cache hits and misses"""
+        ttl_cache = cache.TTLCache(name="test")
+        ttl_cache.get_or_set("a", lambda: 1, 10)
+        ttl_cache.get_or_set("a", lambda: 1, 10)
+        self.assertEqual(self.request.caches["test"], [1, 1])
+        self.assertEqual(metrics.CACHE_REQUESTS.get("test", "hit"), 1)
+
+    def test_nested_stages(self):
+        """Check nested timings of a stage count once"""
+        with metrics.timed("render"):
+            with metrics.timed("render"):
+                pass
+        self.assertEqual(metrics.STAGE_DURATION.get("render"), 1)
+        self.assertIn("render", self.request.stages)
+
+    def test_server_timing(self):
+        """Check Server-Timing summarizes the request"""
+        self.request.add_upstream("api/v1/teams/{id}", 0.05, 100)
+        self.request.add_upstream("api/v1/teams/{id}", 0.05, 100)
+        self.request.add_cache("render", True)
+        self.request.add_stage("render", 0.002)
+        self.assertEqual(
+            self.request.server_timing(0.25),
+            'upstream;dur=100.0;desc="2 calls, 200 B", '
+            + 'upstream-1;dur=100.0;desc="api/v1/teams/{id} x2, 200 B", '
+            + 'cache-render;desc="1 hits, 0 misses", '
+            + "render;dur=2.0, total;dur=250.0",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Testing for background refreshed snapshots"""
+
+import threading
+import unittest
+
+import requests
+
+from tbj_statsapp import cache, refresh, store
+from tbj_statsapp.tests.test_cache import FakeTimer
+
+
+class TestSnapshot(unittest.TestCase):
+    """Class for testing stale-while-revalidate snapshots"""
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.values = iter(range(100))
+        self.snapshot = refresh.Snapshot(
+            "test", lambda: next(self.values), interval=10, timer=self.timer
+        )
+
+    def test_first_get(self):
+        """Check value is computed once on first use"""
+        self.assertEqual(self.snapshot.get(), 0)
+        self.assertEqual(self.snapshot.get(), 0)
+        self.assertFalse(self.snapshot.is_stale())
+
+    def test_stale_while_revalidate(self):
+        """Check stale value is returned while recomputed in the
+        background"""
+        self.snapshot.get()
+        self.timer.now = 10
+        started, release = threading.Event(), threading.Event()
+
+        def compute():
+            started.set()
+            release.wait(5)
+            return "fresh"
+
+        self.snapshot.compute = compute
+        self.assertEqual(self.snapshot.get(), 0)
+        self.assertTrue(started.wait(5))
+        # Still serving the last good value while recomputing
+        self.assertEqual(self.snapshot.get(), 0)
+        release.set()
+        with self.snapshot._lock:
+            self.assertEqual(self.snapshot.value, "fresh")
+
+    def test_failed_refresh(self):
+        """Check last good value is kept if recomputing fails"""
+        self.snapshot.get()
+        self.timer.now = 10
+
+        def compute():
+            raise requests.ConnectionError("statsapi down")
+
+        self.snapshot.compute = compute
+        with self.assertLogs(refresh.logger, "WARNING"):
+            self.snapshot.refresh()
+        self.assertEqual(self.snapshot.get(), 0)
+        # Not retried until another interval has passed
+        self.assertFalse(self.snapshot.is_stale())
+
+    def test_failed_first_get(self):
+        """Check errors are raised if never computed"""
+
+        def compute():
+            raise requests.ConnectionError("statsapi down")
+
+        self.snapshot.compute = compute
+        with self.assertRaises(requests.ConnectionError):
+            self.snapshot.get()
+
+
+class TestRefresher(unittest.TestCase):
+    """Class for testing the snapshot registry"""
+
+    def setUp(self):
+        cache.response_cache.clear()
+        self.refresher = refresh.Refresher(poll_interval=0.01)
+        self.calls = []
+
+        @cache.cached(cache.VOLATILE)
+        def compute():
+            self.calls.append(1)
+            return len(self.calls)
+
+        self.compute = compute
+
+    def tearDown(self):
+        self.refresher.stop()
+        cache.response_cache.clear()
+
+    def test_register(self):
+        """Check datasets are only registered once"""
+        snapshot = self.refresher.register("test", self.compute, 10)
+        self.assertIs(self.refresher.register("test", None, 20), snapshot)
+        self.assertEqual(self.refresher.get("test"), 1)
+
+    def test_refresh_bypasses_cache(self):
+        """Check refreshes recompute cached upstream responses"""
+        self.assertEqual(self.compute(), 1)
+        snapshot = self.refresher.register("test", self.compute, 10)
+        self.refresher.refresh_stale()
+        self.assertEqual(snapshot.value, 2)
+        # Fresh value is shared with other callers
+        self.assertEqual(self.compute(), 2)
+
+    def test_refresh_names(self):
+        """Check only the given stale snapshots are refreshed"""
+        snapshot = self.refresher.register("test", self.compute, 10)
+        other = self.refresher.register("other", self.compute, 10)
+        self.refresher.refresh_stale(["test"])
+        self.assertEqual(snapshot.value, 1)
+        self.assertIsNone(other.value)
+
+    def test_follow(self):
+        """Check followers serve values published by the refreshing
+        process, refreshing their own only until one is published"""
+        shared = store.MemoryStore(ttl=60)
+        self.refresher.store = shared
+        self.refresher.register("test", self.compute, 10)
+        self.assertEqual(self.refresher.get("test"), 1)
+        self.assertEqual(shared["snapshot:test"], 1)
+
+        follower = refresh.Refresher(store=shared)
+        follower.follow = True
+        follower.register("test", lambda: "local", 10)
+        follower.register("other", lambda: "local", 10)
+        shared["snapshot:test"] = "published"
+        self.assertEqual(follower.get("test"), "published")
+        self.assertEqual(follower.get("other"), "local")
+        self.assertNotIn("snapshot:other", shared)
+
+    def test_background_thread(self):
+        """Check stale snapshots are refreshed in the background"""
+        snapshot = self.refresher.register("test", self.compute, 0)
+        self.refresher.start()
+        self.assertTrue(self.refresher.running)
+        for _ in range(500):
+            if len(self.calls) >= 2:
+                break
+            threading.Event().wait(0.01)
+        self.refresher.stop()
+        self.assertFalse(self.refresher.running)
+        self.assertGreaterEqual(len(self.calls), 2)
+        self.assertIsNotNone(snapshot.value)
+
+
+if __name__ == "__main__":
+    unittest.main()
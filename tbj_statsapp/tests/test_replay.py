@@ -0,0 +1,175 @@
+"""Testing for upstream record / replay"""
+
+import tempfile
+import unittest
+
+import requests
+from flask import Flask
+
+from tbj_statsapp import api, cache, replay
+from tbj_statsapp.client import StatsApiClient
+from tbj_statsapp.config import Config
+from tbj_statsapp.tests.fake_statsapi import FakeSession
+
+
+class TestNormalizeUrl(unittest.TestCase):
+    """Class for testing cassette keys"""
+
+    def test_host_ignored(self):
+        """Check recordings replay against any upstream host"""
+        self.assertEqual(
+            replay.normalize_url("https://statsapi.mlb.com/api/v1/teams/141"),
+            replay.normalize_url("http://127.0.0.1:8080//api/v1/teams/141/"),
+        )
+
+    def test_query_order(self):
+        """Check query parameters are sorted and merged with params"""
+        self.assertEqual(
+            replay.normalize_url(
+                "https://statsapi.mlb.com/api/v1/teams?sportId=1",
+                params={"hydrate": "division"},
+            ),
+            replay.normalize_url(
+                "https://statsapi.mlb.com/api/v1/teams"
+                + "?hydrate=division&sportId=1"
+            ),
+        )
+
+
+class ReplayTestCase(unittest.TestCase):
+    """Base class recording from an offline upstream into a cassette"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cassette = replay.Cassette(self.directory.name)
+        self.upstream = FakeSession()
+        self.recorder = StatsApiClient(
+            session=replay.RecordingSession(self.cassette, self.upstream)
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def replayer(self, **kwargs):
+        self.sleeps = []
+        return StatsApiClient(
+            session=replay.ReplaySession(
+                replay.Cassette(self.directory.name),
+                sleep=self.sleeps.append,
+                **kwargs,
+            ),
+            retries=0,
+        )
+
+
+class TestRecordReplay(ReplayTestCase):
+    """Class for testing recorded responses are replayed offline"""
+
+    def test_replay(self):
+        """Check replayed responses match the recorded ones"""
+        recorded = self.recorder.get("api/v1/teams/141")
+        replayed = self.replayer().get("api/v1/teams/141")
+        self.assertEqual(replayed.status_code, 200)
+        self.assertEqual(replayed.json(), recorded.json())
+        self.assertEqual(replayed.headers["Content-Type"], "application/json")
+
+    def test_news(self):
+        """Check streamed feeds are recorded, replayed and revalidated"""
+        cache.response_cache.clear()
+        api.news_feeds.clear()
+        recorded = api.get_news(self.recorder, limit=2)
+
+        cache.response_cache.clear()
+        api.news_feeds.clear()
+        client = self.replayer()
+        self.assertEqual(api.get_news(client, limit=2), recorded)
+
+        # Revalidated with the recorded ETag
+        cache.response_cache.clear()
+        self.assertEqual(api.get_news(client, limit=2), recorded)
+        cache.response_cache.clear()
+
+    def test_not_recorded(self):
+        """Check unrecorded requests fail rather than going online"""
+        with self.assertRaises(replay.ReplayMiss):
+            self.replayer().get("api/v1/teams/141")
+
+    def test_errors_not_recorded(self):
+        """Check only complete responses are recorded"""
+        self.recorder.get("api/v1/unknown")
+        self.assertEqual(self.cassette.keys(), [])
+
+
+class TestInjection(ReplayTestCase):
+    """Class for testing injected latency and failures"""
+
+    def setUp(self):
+        super().setUp()
+        self.recorder.get("api/v1/teams/141")
+
+    def test_recorded_latency(self):
+        """Check responses are delayed by their (scaled) recorded latency"""
+        client = self.replayer(latency="recorded", latency_scale=2)
+        client.get("api/v1/teams/141")
+        elapsed = self.cassette.get("api/v1/teams/141")["elapsed"]
+        self.assertEqual(self.sleeps, [elapsed * 2])
+
+    def test_fixed_latency(self):
+        """Check responses are delayed by a fixed latency"""
+        client = self.replayer(latency=0.05)
+        client.get("api/v1/teams/141")
+        self.assertEqual(self.sleeps, [0.05])
+
+    def test_failures(self):
+        """Check failures are injected in turn at the failure rate"""
+        client = self.replayer(
+            failure_rate=1, failures=(503, "timeout", "connection")
+        )
+        self.assertEqual(client.get("api/v1/teams/141").status_code, 503)
+        with self.assertRaises(requests.Timeout):
+            client.get("api/v1/teams/141")
+        with self.assertRaises(requests.ConnectionError):
+            client.get("api/v1/teams/141")
+
+    def test_failure_rate(self):
+        """Check roughly failure_rate of requests fail"""
+        client = self.replayer(failure_rate=0.25, seed=1)
+        statuses = [
+            client.get("api/v1/teams/141").status_code for _ in range(400)
+        ]
+        self.assertAlmostEqual(statuses.count(503) / 400, 0.25, delta=0.07)
+
+
+class TestFromApp(unittest.TestCase):
+    """Class for testing sessions created from the app config"""
+
+    def app(self, **config):
+        app = Flask(__name__, instance_path=tempfile.gettempdir())
+        app.config.from_object(Config)
+        app.config.update(config)
+        return app
+
+    def test_modes(self):
+        self.assertIsNone(replay.from_app(self.app(UPSTREAM_MODE="live")))
+        self.assertIsInstance(
+            replay.from_app(self.app(UPSTREAM_MODE="record")),
+            replay.RecordingSession,
+        )
+
+        session = replay.from_app(
+            self.app(
+                UPSTREAM_MODE="replay",
+                UPSTREAM_REPLAY_LATENCY="0.1",
+                UPSTREAM_REPLAY_FAILURE_RATE=0.5,
+            )
+        )
+        self.assertIsInstance(session, replay.ReplaySession)
+        self.assertEqual(session.latency, 0.1)
+        self.assertEqual(session.failure_rate, 0.5)
+
+        with self.assertRaises(ValueError):
+            replay.from_app(self.app(UPSTREAM_MODE="offline"))
+
+
+if __name__ == "__main__":
+    unittest.main()
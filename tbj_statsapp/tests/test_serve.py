@@ -0,0 +1,88 @@
+"""Testing for the production server"""
+
+import threading
+import time
+import unittest
+
+import requests
+
+from tbj_statsapp import bench, serve
+
+
+def slow_app(environ, start_response):
+    """WSGI app answering after 0.2 seconds"""
+    time.sleep(0.2)
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"ok"]
+
+
+class TestPooledWSGIServer(unittest.TestCase):
+    """Class for testing the thread pooled WSGI server"""
+
+    def setUp(self):
+        self.listener = serve.listen("127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.listener.getsockname()[1]}/"
+        self.server = serve.PooledWSGIServer(
+            "127.0.0.1", 0, slow_app, threads=4, fd=self.listener.fileno()
+        )
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join(5)
+        self.server.server_close()
+        self.listener.close()
+
+    def test_concurrent_requests(self):
+        """Check requests are handled concurrently by the pool"""
+        responses = []
+
+        def get():
+            responses.append(requests.get(self.url, timeout=5))
+
+        start = time.perf_counter()
+        clients = [threading.Thread(target=get) for _ in range(4)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join(5)
+
+        self.assertEqual([r.text for r in responses], ["ok"] * 4)
+        self.assertLess(time.perf_counter() - start, 0.6)
+
+    def test_connection_closed(self):
+        """Check connections are not kept alive holding pool threads"""
+        response = requests.get(self.url, timeout=5)
+        self.assertEqual(response.headers.get("Connection"), "close")
+
+    def test_shutdown_waits_for_requests(self):
+        """Check in-flight requests finish on shutdown"""
+        responses = []
+        client = threading.Thread(
+            target=lambda: responses.append(requests.get(self.url, timeout=5))
+        )
+        client.start()
+        time.sleep(0.05)
+        self.server.shutdown()
+        self.server.server_close()
+        client.join(5)
+
+        self.assertEqual(responses[0].text, "ok")
+
+
+class TestServe(unittest.TestCase):
+    """Class for testing preforked workers against a stand-in upstream"""
+
+    def test_workers(self):
+        """Check workers serve warmed pages and exit cleanly on SIGTERM"""
+        result = bench.load(workers=2, threads=4, clients=4, seconds=1)
+
+        self.assertGreater(result["requests"], 0)
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(result["exit_code"], 0)
+        self.assertEqual(bench.check_load(result), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+"""Testing for the shared data store backends"""
+
+import fnmatch
+import os
+import tempfile
+import unittest
+
+import pandas
+
+from tbj_statsapp import store
+from tbj_statsapp.tests.test_cache import FakeTimer
+
+
+class FakeRedis:
+    """Local stand-in for the parts of redis-py used by RedisStore"""
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.values = {}
+
+    def get(self, key):
+        value, expires = self.values.get(key, (None, None))
+        if expires is not None and expires <= self.timer():
+            del self.values[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.values[key] = (value, None if ex is None else self.timer() + ex)
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+    def scan_iter(self, match="*"):
+        return [
+            key for key in list(self.values) if fnmatch.fnmatch(key, match)
+        ]
+
+
+class StoreTestCase:
+    """Tests run against every backend (mixed into unittest.TestCase)"""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.store = self.make_store()
+
+    def test_mapping(self):
+        """Check stores can be used like a dict"""
+        self.assertNotIn("team:141:2022:info", self.store)
+        with self.assertRaises(KeyError):
+            self.store["team:141:2022:info"]
+        self.store["team:141:2022:info"] = {"name": "Toronto Blue Jays"}
+        self.assertIn("team:141:2022:info", self.store)
+        self.assertEqual(
+            self.store["team:141:2022:info"], {"name": "Toronto Blue Jays"}
+        )
+
+    def test_dataframe(self):
+        """Check career stats (DataFrames) can be stored"""
+        career_df = pandas.DataFrame({"season": ["2021", "2022"]})
+        self.store.set("player:1:2022:career", career_df)
+        pandas.testing.assert_frame_equal(
+            self.store.get("player:1:2022:career"), career_df
+        )
+
+    def test_expiry(self):
+        """Check values expire after ttl"""
+        self.store.set("a", 1)
+        self.timer.now = 10
+        self.assertIsNone(self.store.get("a"))
+
+    def test_clear(self):
+        self.store.set("a", 1)
+        self.store.clear()
+        self.assertNotIn("a", self.store)
+
+
+class TestMemoryStore(StoreTestCase, unittest.TestCase):
+    def make_store(self):
+        return store.MemoryStore(ttl=10, timer=self.timer)
+
+
+class TestSQLiteStore(StoreTestCase, unittest.TestCase):
+    def make_store(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.path = os.path.join(self.tempdir.name, "data.db")
+        return store.SQLiteStore(self.path, ttl=10, timer=self.timer)
+
+    def test_shared(self):
+        """Check values are shared between stores (e.g. processes)"""
+        self.store.set("a", 1)
+        other_store = store.SQLiteStore(self.path, ttl=10, timer=self.timer)
+        self.assertEqual(other_store.get("a"), 1)
+
+
+class TestRedisStore(StoreTestCase, unittest.TestCase):
+    def make_store(self):
+        self.redis = FakeRedis(self.timer)
+        return store.RedisStore(self.redis, ttl=10)
+
+    def test_prefix(self):
+        """Check other keys in Redis are left alone"""
+        self.redis.set("other", b"value")
+        self.store.set("a", 1)
+        self.store.clear()
+        self.assertEqual(list(self.redis.values), ["other"])
+
+
+class TestTieredStore(StoreTestCase, unittest.TestCase):
+    def make_store(self):
+        self.shared = store.RedisStore(FakeRedis(self.timer), ttl=10)
+        return store.TieredStore(
+            store.MemoryStore(ttl=5, timer=self.timer), self.shared
+        )
+
+    def test_local_copy(self):
+        """Check shared values are kept in process for the local ttl"""
+        self.shared.set("a", 1)
+        self.assertEqual(self.store.get("a"), 1)
+        self.shared.set("a", 2)
+        self.assertEqual(self.store.get("a"), 1)
+        self.timer.now = 5
+        self.assertEqual(self.store.get("a"), 2)
+
+
+class TestFromUrl(unittest.TestCase):
+    def test_urls(self):
+        self.assertIsInstance(
+            store.from_url("memory://", ttl=10), store.MemoryStore
+        )
+        with tempfile.TemporaryDirectory() as tempdir:
+            data_store = store.from_url(f"sqlite:///{tempdir}/data.db", ttl=10)
+            self.assertIsInstance(data_store.shared, store.SQLiteStore)
+        with self.assertRaises(ValueError):
+            store.from_url("ftp://data", ttl=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
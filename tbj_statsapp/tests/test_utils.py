@@ -0,0 +1,32 @@
+"""Testing for the formatting helpers"""
+
+import unittest
+
+from tbj_statsapp import records, utils
+
+
+class TestFormatting(unittest.TestCase):
+    """Class for testing render time formatting of row records"""
+
+    def test_format_stat(self):
+        """Check unknown stats are shown as a placeholder"""
+        self.assertEqual(utils.format_stat(None), "-")
+        self.assertEqual(utils.format_stat(0), 0)
+        self.assertEqual(utils.format_stat(".301"), ".301")
+
+    def test_format_pct(self):
+        """Check fractions are shown as rounded percentages"""
+        self.assertEqual(utils.format_pct(None), "-")
+        self.assertEqual(utils.format_pct(0.234), "23%")
+        self.assertEqual(utils.format_pct(0), "0%")
+
+    def test_rate(self):
+        """Check rates are unknown without a count or total"""
+        self.assertEqual(records.rate(25, 100), 0.25)
+        self.assertIsNone(records.rate(None, 100))
+        self.assertIsNone(records.rate(25, None))
+        self.assertIsNone(records.rate(25, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
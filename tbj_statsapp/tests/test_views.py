@@ -0,0 +1,540 @@
+"""Testing for page routes against an offline upstream"""
+
+import gzip
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+
+from flask import url_for
+
+from tbj_statsapp import (
+    cache,
+    compress,
+    create_app,
+    directory,
+    metrics,
+    refresh,
+    render,
+    store,
+)
+from tbj_statsapp.client import StatsApiClient
+from tbj_statsapp.tests.fake_statsapi import ROOKIE_ID, VLAD_ID, FakeSession
+
+# Routes are registered once per process, so share a single app
+session_dir = tempfile.TemporaryDirectory()
+app = create_app(
+    {
+        "TESTING": True,
+        "SESSION_FILE_DIR": session_dir.name,
+        "PRELOAD_DIRECTORIES": False,
+        "BACKGROUND_REFRESH": False,
+        "DISK_CACHE": False,
+    }
+)
+
+from tbj_statsapp import views  # noqa: E402
+
+
+class ViewTestCase(unittest.TestCase):
+    """Base class serving views from a fake upstream"""
+
+    def setUp(self):
+        cache.response_cache.clear()
+        store.data_store.clear()
+        render.render_cache.clear()
+        refresh.refresher.reset()
+        directory.teams = directory.TeamDirectory()
+        directory.players = directory.PlayerDirectory()
+        self.upstream = FakeSession()
+        self.stats_client = views.stats_client
+        views.stats_client = StatsApiClient(session=self.upstream)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        views.stats_client = self.stats_client
+        cache.response_cache.clear()
+
+    def reload(self, url):
+        """Load url again with a cold response cache, returning statsapi
+        requests made"""
+        cache.response_cache.clear()
+        self.upstream.requests.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        return self.upstream.statsapi_requests()
+
+
+class TestLazySessionCache(ViewTestCase):
+    """Check pages cached in the data store make no upstream calls"""
+
+    def test_standings(self):
+        """Check standings are only fetched on first load"""
+        self.assertEqual(self.client.get("/teams").status_code, 200)
+        self.assertGreater(len(self.upstream.statsapi_requests()), 0)
+        self.assertEqual(self.reload("/teams"), [])
+
+    def test_leaderboards(self):
+        """Check leaders are only fetched on first load"""
+        self.assertEqual(self.client.get("/leaderboards").status_code, 200)
+        self.assertGreater(len(self.upstream.statsapi_requests()), 0)
+        self.assertEqual(self.reload("/leaderboards"), [])
+
+    def test_team_page(self):
+        """Check team info and roster are only fetched on first load"""
+        response = self.client.get("/teams/bluejays")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Toronto Blue Jays", response.data)
+        self.assertGreater(len(self.upstream.statsapi_requests()), 0)
+        self.assertEqual(self.reload("/teams/bluejays"), [])
+
+    def test_player_page(self):
+        """Check player info, team and career are only fetched on first
+        load"""
+        url = f"/Vladimir-Guerrero-{VLAD_ID}"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Vladimir Guerrero Jr.", response.data)
+        self.assertGreater(len(self.upstream.statsapi_requests()), 0)
+        self.assertEqual(self.reload(url), [])
+
+
+class TestDataStore(ViewTestCase):
+    """Check page data is shared by every user rather than each session"""
+
+    def test_shared_pages(self):
+        """Check team and player pages are only assembled once for all
+        users"""
+        for url in ["/teams/bluejays", f"/Vladimir-Guerrero-{VLAD_ID}"]:
+            self.assertEqual(self.client.get(url).status_code, 200)
+            cache.response_cache.clear()
+            self.upstream.requests.clear()
+            other_client = app.test_client()
+            self.assertEqual(other_client.get(url).status_code, 200)
+            self.assertEqual(self.upstream.statsapi_requests(), [])
+
+    def test_small_session(self):
+        """Check page data is not stored in the user session"""
+        self.client.get("/teams/bluejays")
+        with self.client.session_transaction() as user_session:
+            self.assertFalse([key for key in user_session if "info" in key])
+
+
+class TestSnapshots(ViewTestCase):
+    """Check hot pages are served from background refreshed snapshots"""
+
+    def test_shared_snapshot(self):
+        """Check standings and leaders are shared across user sessions"""
+        for url in ["/teams", "/leaderboards"]:
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.upstream.requests.clear()
+            other_client = app.test_client()
+            self.assertEqual(other_client.get(url).status_code, 200)
+            self.assertEqual(self.upstream.requests, [])
+
+    def test_stale_snapshot(self):
+        """Check stale standings are served while refreshed"""
+        self.client.get("/teams")
+        snapshot = refresh.refresher.snapshots["leagues"]
+        leagues = snapshot.value
+        snapshot.checked_at -= snapshot.interval
+        self.upstream.requests.clear()
+
+        with mock.patch.object(snapshot, "refresh_in_background") as refresh_:
+            self.assertEqual(self.client.get("/teams").status_code, 200)
+            refresh_.assert_called_once()
+        self.assertIs(snapshot.value, leagues)
+        self.assertEqual(self.upstream.statsapi_requests(), [])
+
+
+class TestCareerChart(ViewTestCase):
+    """Check career visualizations are loaded separately from player pages"""
+
+    def test_player_page(self):
+        """Check player pages ship without the figure"""
+        response = self.client.get(f"/Vladimir-Guerrero-{VLAD_ID}")
+        self.assertIn(b"career-chart.json", response.data)
+        self.assertNotIn(b"Season-By-Season", response.data)
+
+    def test_chart(self):
+        """Check figure spec is served with an ETag"""
+        url = f"/api/players/{VLAD_ID}/career-chart.json"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertIn("data", response.json)
+        self.assertIn("layout", response.json)
+
+        etag = response.headers["ETag"]
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_no_chart(self):
+        """Check players without MLB stats have no chart"""
+        for player_id in [ROOKIE_ID, 1]:
+            response = self.client.get(
+                f"/api/players/{player_id}/career-chart.json"
+            )
+            self.assertEqual(response.status_code, 404)
+
+
+class TestJsonApi(ViewTestCase):
+    """Check JSON endpoints serve page data with strong ETags"""
+
+    def get_json(self, url):
+        """Get url, checking it is conditional on its ETag"""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/json")
+        etag = response.headers["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+
+        self.upstream.requests.clear()
+        hits = metrics.CACHE_REQUESTS.get("json", "hit")
+        not_modified = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.data, b"")
+        # Polls are answered from the data store, without serializing again
+        self.assertEqual(self.upstream.statsapi_requests(), [])
+        self.assertEqual(metrics.CACHE_REQUESTS.get("json", "hit"), hits + 1)
+
+        return response.json
+
+    def test_standings(self):
+        """Check standings are grouped by league and division"""
+        leagues = self.get_json("/api/standings")["leagues"]
+        self.assertEqual(len(leagues), 2)
+        al_east = leagues[0][0]
+        self.assertEqual(al_east["name"], "AL East")
+        self.assertEqual(al_east["teams"][1]["abbreviation"], "TOR")
+
+    def test_leaders(self):
+        """Check leaders are keyed by player type and category"""
+        leaders = self.get_json("/api/leaders")
+        self.assertEqual(
+            list(leaders["hitting"]), list(views.HITTER_CATEGORIES)
+        )
+        self.assertEqual(leaders["pitching"]["saves"][0]["rank"], 1)
+
+    def test_team(self):
+        """Check team info and roster"""
+        team_info = self.get_json("/api/teams/141")
+        self.assertEqual(team_info["abbreviation"], "TOR")
+
+        roster = self.get_json("/api/teams/141/roster")
+        self.assertIn(
+            VLAD_ID, [hitter["player_id"] for hitter in roster["hitters"]]
+        )
+        self.assertEqual(self.client.get("/api/teams/1").status_code, 404)
+
+    def test_career(self):
+        """Check career seasons, including players who have never played"""
+        career = self.get_json(f"/api/players/{VLAD_ID}/career")
+        self.assertEqual(career["category"], "hitting")
+        self.assertEqual(career["seasons"][-1]["season"], "2022")
+        self.assertEqual(career["seasons"][-1]["team_name"], "TOR")
+
+        rookie = self.get_json(f"/api/players/{ROOKIE_ID}/career")
+        self.assertEqual(rookie["seasons"], [])
+        self.assertEqual(
+            self.client.get("/api/players/1/career").status_code, 404
+        )
+
+    def test_etag_changes(self):
+        """Check ETag changes when the data does"""
+        etag = self.client.get("/api/standings").headers["ETag"]
+        snapshot = refresh.refresher.snapshots["leagues"]
+        snapshot.set(snapshot.get()[::-1])
+        response = self.client.get(
+            "/api/standings", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+
+class TestRenderCache(ViewTestCase):
+    """Check pages are only rendered when their data changes"""
+
+    def rendered(self, url, **kwargs):
+        """Get url, returning response and templates rendered"""
+        with mock.patch.object(
+            render, "render_template", wraps=render.render_template
+        ) as render_template:
+            response = self.client.get(url, **kwargs)
+
+        return response, [call.args[0] for call in render_template.mock_calls]
+
+    def test_validators(self):
+        """Check pages carry validators and no session cookie"""
+        for url in ["/teams", "/leaderboards", "/teams/bluejays"]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNotNone(response.headers.get("ETag"))
+            self.assertIsNotNone(response.headers.get("Last-Modified"))
+            self.assertIn("no-cache", response.headers["Cache-Control"])
+            self.assertNotIn("Set-Cookie", response.headers)
+
+    def test_not_modified(self):
+        """Check revalidating clients get a 304 without rendering"""
+        response = self.client.get("/teams/bluejays")
+        for headers in [
+            {"If-None-Match": response.headers["ETag"]},
+            {"If-Modified-Since": response.headers["Last-Modified"]},
+        ]:
+            not_modified, rendered = self.rendered(
+                "/teams/bluejays", headers=headers
+            )
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(rendered, [])
+
+    def test_cached_page(self):
+        """Check new clients are served the cached page"""
+        response, rendered = self.rendered("/teams")
+        self.assertEqual(
+            rendered,
+            [
+                "standings.html",
+                "components/standalone/divisions.html",
+                "components/common/news.html",
+            ],
+        )
+        cached, rendered = self.rendered("/teams")
+        self.assertEqual(rendered, [])
+        self.assertEqual(cached.data, response.data)
+
+    def test_changed_data(self):
+        """Check only fragments whose data changed are rendered again"""
+        etag = self.client.get("/teams").headers["ETag"]
+        news = refresh.refresher.snapshots["news"]
+        news.set({key: value[::-1] for key, value in news.get().items()})
+
+        response, rendered = self.rendered(
+            "/teams", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(
+            rendered, ["standings.html", "components/common/news.html"]
+        )
+
+
+class FakeBrotli:
+    """Stand-in for the optional brotli package"""
+
+    @staticmethod
+    def compress(data, quality):
+        return zlib.compress(data)
+
+
+class TestCompression(ViewTestCase):
+    """Check responses are compressed when accepted and worthwhile"""
+
+    def setUp(self):
+        ViewTestCase.setUp(self)
+        compress.compressed_cache.clear()
+
+    def test_gzip(self):
+        """Check pages are gzipped, with a matching ETag"""
+        plain = self.client.get("/teams")
+        response = self.client.get(
+            "/teams", headers={"Accept-Encoding": "gzip, deflate"}
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertLess(len(response.data), len(plain.data) / 3)
+        self.assertEqual(
+            response.headers["ETag"], plain.headers["ETag"][:-1] + '-gzip"'
+        )
+
+        # Compressed ETag is revalidated, and answered with the same ETag
+        not_modified = self.client.get(
+            "/teams",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": response.headers["ETag"],
+            },
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(
+            not_modified.headers["ETag"], response.headers["ETag"]
+        )
+
+    def test_brotli(self):
+        """Check brotli is preferred when available"""
+        with mock.patch.object(compress, "brotli", FakeBrotli):
+            response = self.client.get(
+                "/api/standings", headers={"Accept-Encoding": "gzip, br"}
+            )
+            self.assertEqual(response.headers["Content-Encoding"], "br")
+            response = self.client.get(
+                "/api/standings",
+                headers={"Accept-Encoding": "gzip, br;q=0.5"},
+            )
+            self.assertEqual(response.headers["Content-Encoding"], "gzip")
+
+        # Not available
+        response = self.client.get(
+            "/api/standings", headers={"Accept-Encoding": "br"}
+        )
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_not_compressed(self):
+        """Check small, binary and unaccepted responses are not
+        compressed"""
+        with mock.patch.dict(app.config, {"COMPRESS_MIN_SIZE": 10**9}):
+            response = self.client.get(
+                "/teams", headers={"Accept-Encoding": "gzip"}
+            )
+            self.assertNotIn("Content-Encoding", response.headers)
+
+        response = self.client.get(
+            "/static/images/Logo/homebase-logo.png",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        self.assertNotIn("Content-Encoding", response.headers)
+        response.close()
+
+        response = self.client.get("/teams")
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_compressed_once(self):
+        """Check unchanged pages are only compressed once"""
+        headers = {"Accept-Encoding": "gzip"}
+        with mock.patch.object(
+            compress, "encode", wraps=compress.encode
+        ) as encode:
+            first = self.client.get("/teams", headers=headers)
+            second = self.client.get("/teams", headers=headers)
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(first.data, second.data)
+
+
+class TestStaticAssets(ViewTestCase):
+    """Check static URLs are content hashed and cached forever"""
+
+    def test_versioned_urls(self):
+        """Check pages link to content hashed static files"""
+        response = self.client.get("/teams")
+        self.assertRegex(
+            response.get_data(as_text=True),
+            r"/static/css/statsapp\.css\?v=[0-9a-f]{12}",
+        )
+
+    def test_immutable(self):
+        """Check versioned static files are cached forever"""
+        with app.test_request_context():
+            url = url_for("static", filename="js/common.js")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        cache_control = response.headers["Cache-Control"]
+        self.assertIn("immutable", cache_control)
+        self.assertIn(f"max-age={app.config['STATIC_MAX_AGE']}", cache_control)
+        response.close()
+
+        # Unversioned URLs are revalidated as before
+        response = self.client.get("/static/js/common.js")
+        self.assertNotIn(
+            "immutable", response.headers.get("Cache-Control", "")
+        )
+        response.close()
+
+
+class TestMetrics(ViewTestCase):
+    """Check requests are instrumented"""
+
+    def test_server_timing(self):
+        """Check pages report upstream calls, caches and render time"""
+        server_timing = self.client.get("/teams").headers["Server-Timing"]
+        self.assertIn('desc="api/v1/standings x1', server_timing)
+        self.assertIn("cache-render", server_timing)
+        self.assertIn("render;dur=", server_timing)
+        self.assertIn("total;dur=", server_timing)
+
+        # Served from the render cache without upstream calls
+        server_timing = self.client.get("/teams").headers["Server-Timing"]
+        self.assertNotIn("upstream", server_timing)
+        self.assertIn('cache-render;desc="1 hits', server_timing)
+
+    def test_metrics(self):
+        """Check latency histograms by route and upstream endpoint"""
+        metrics.clear()
+        self.client.get("/teams/bluejays")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.mimetype, "text/plain")
+        text = response.get_data(as_text=True)
+        self.assertIn(
+            "tbj_request_duration_seconds_count"
+            + '{route="/teams/<team_name>",method="GET"} 1',
+            text,
+        )
+        self.assertIn(
+            "tbj_upstream_request_duration_seconds_count"
+            + '{endpoint="api/v1/teams/{id}/roster"} 1',
+            text,
+        )
+        self.assertIn(
+            'tbj_requests_total{route="/teams/<team_name>",method="GET",'
+            + 'status="200"} 1',
+            text,
+        )
+
+
+class TestTeamDirectory(ViewTestCase):
+    """Check team pages are resolved from the team directory"""
+
+    def test_team_slugs(self):
+        """Check team pages load by team or club name without visiting
+        /teams first"""
+        for slug in ["bluejays", "d-backs", "diamondbacks"]:
+            self.assertEqual(
+                self.client.get(f"/teams/{slug}").status_code, 200
+            )
+
+    def test_unknown_team(self):
+        """Check unknown teams are not found"""
+        self.assertEqual(self.client.get("/teams/expos").status_code, 404)
+
+    def test_single_load(self):
+        """Check teams are only grabbed once across pages"""
+        self.client.get("/teams/bluejays")
+        self.client.get("/teams/yankees")
+        teams_requests = [
+            url
+            for url in self.upstream.statsapi_requests()
+            if "/teams?" in url
+        ]
+        self.assertEqual(len(teams_requests), 1)
+
+
+class TestPlayerDirectory(ViewTestCase):
+    """Check player pages are resolved from the player directory"""
+
+    def test_single_load(self):
+        """Check player list is only grabbed once across player pages"""
+        for player_id in [VLAD_ID, 1470, 1412]:
+            response = self.client.get(f"/Player-Name-{player_id}")
+            self.assertEqual(response.status_code, 200)
+        players_requests = [
+            url
+            for url in self.upstream.statsapi_requests()
+            if "sports/1/players" in url
+        ]
+        self.assertEqual(len(players_requests), 1)
+        # Bios are served from the directory
+        self.assertFalse(
+            any(
+                "/people/" in url and "hydrate" not in url
+                for url in self.upstream.statsapi_requests()
+            )
+        )
+
+    def test_unknown_player(self):
+        """Check unknown players are not found"""
+        response = self.client.get("/Player-Name-1")
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Testing for career visualizations"""
+
+import json
+import unittest
+from unittest import mock
+
+import pandas
+
+from tbj_statsapp import directory, info, viz
+from tbj_statsapp.client import StatsApiClient
+from tbj_statsapp.tests import fake_statsapi
+
+
+class TestCareerChart(unittest.TestCase):
+    """Class for testing hover text and rendered figure caching"""
+
+    @classmethod
+    def setUpClass(cls):
+        directory.teams = directory.TeamDirectory()
+        client = StatsApiClient(session=fake_statsapi.FakeSession())
+        cls.career_df = info.get_career_stats(
+            fake_statsapi.TRADED_ID, "hitting", client
+        )
+
+    def setUp(self):
+        viz.figure_cache.clear()
+
+    def test_hover_text(self):
+        """Check hover text is built for every row"""
+        viz_df = pandas.DataFrame(
+            {"season": ["2021", "2022"], "era": [1, 2.5]}
+        )
+        self.assertEqual(
+            viz.hover_text(
+                [
+                    ("Season", viz_df["season"]),
+                    ("ERA", viz_df["era"].map("{:.2f}".format)),
+                ]
+            ),
+            ["Season: 2021<br>ERA: 1.00", "Season: 2022<br>ERA: 2.50"],
+        )
+
+    def test_cached_render(self):
+        """Check repeat views skip serializing"""
+        spec, etag = viz.career_chart(1411, self.career_df)
+        figure = json.loads(spec)
+        self.assertIn("Season: 2022", figure["data"][0]["text"][-1])
+        with mock.patch.object(viz, "simple_hitter_figure") as build:
+            self.assertEqual(
+                viz.career_chart(1411, self.career_df), (spec, etag)
+            )
+            build.assert_not_called()
+
+    def test_changed_data(self):
+        """Check charts are rendered again once career data changes"""
+        viz.career_chart(1411, self.career_df)
+        career_df = self.career_df.copy()
+        career_df.loc[career_df.index[-1], "games"] += 1
+        self.assertNotEqual(
+            viz.data_hash(career_df), viz.data_hash(self.career_df)
+        )
+        with mock.patch.object(viz, "simple_hitter_figure") as build:
+            build.return_value.to_json.return_value = "{}"
+            _, etag = viz.career_chart(1411, career_df)
+            build.assert_called_once()
+        self.assertNotEqual(etag, viz.career_chart(1411, self.career_df)[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
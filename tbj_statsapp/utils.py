@@ -1,3 +1,11 @@
+import hashlib
+import pickle
+from datetime import datetime
+from functools import lru_cache
+
+from tbj_statsapp import metrics
+
+
 def rank_map(rank):
     if rank > 3:
         return f"{rank}th"
@@ -9,3 +17,50 @@ def rank_map(rank):
         return f"{rank}st"
     else:
         raise ValueError("Invalid rank")
+
+
+def get_or_set(store, key, compute, *args, **kwargs):
+    """Return store[key], calling compute(*args, **kwargs) only if missing
+
+    Unlike store.get(key, compute(...)), compute is not evaluated when the
+    value is already stored.
+    """
+    try:
+        value = store[key]
+    except KeyError:
+        metrics.record_cache("store", False)
+        value = store[key] = compute(*args, **kwargs)
+    else:
+        metrics.record_cache("store", True)
+
+    return value
+
+
+def fingerprint(value):
+    """Hash of a (picklable) value, changing whenever its contents do"""
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return hashlib.sha1(data).hexdigest()
+
+
+def team_slug(name):
+    """Convert team name to URL slug (e.g. Blue Jays -> bluejays)"""
+    return "".join(name.split()).lower()
+
+
+@lru_cache(maxsize=1024)
+def format_news_date(pub_date):
+    """Convert RSS publish date to display format (e.g. Oct 18 2022)"""
+    date = datetime.strptime(pub_date, "%a, %d %b %Y %H:%M:%S %Z")
+
+    return date.strftime("%b %d %Y")
+
+
+def format_stat(value, null="-"):
+    """Format a stat for display, with a placeholder if unknown"""
+    return null if value is None else value
+
+
+def format_pct(value, null="-"):
+    """Format a fraction as a rounded percentage (e.g. 0.234 -> 23%)"""
+    return null if value is None else f"{round(value * 100)}%"
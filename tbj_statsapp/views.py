@@ -1,16 +1,156 @@
 """Route requests with Flask"""
-import requests
+from functools import partial
+
+from flask import abort
 from flask import current_app as app
 from flask import redirect, render_template
-from flask import session as flask_session
 
-from tbj_statsapp import api, info, viz
+from tbj_statsapp import (
+    api,
+    directory,
+    disk_cache,
+    info,
+    metrics,
+    refresh,
+    render,
+    replay,
+    store,
+    utils,
+    viz,
+)
+from tbj_statsapp.client import StatsApiClient
+
+# Pooled statsapi client shared by every request (recording / replaying
+# upstream responses if configured)
+stats_client = StatsApiClient.from_config(
+    app.config,
+    session=replay.from_app(app),
+    disk_cache=disk_cache.from_app(app),
+)
+
+# Row records are formatted at render time
+app.add_template_filter(utils.format_stat, "stat")
+app.add_template_filter(utils.format_pct, "pct")
+
+# Leaderboard categories
+HITTER_CATEGORIES = {
+    "homeRuns": "HR",
+    "onBasePlusSlugging": "OPS",
+    "stolenBases": "SB",
+}
+PITCHER_CATEGORIES = {
+    "earnedRunAverage": "ERA",
+    "strikeouts": "SO",
+    "saves": "Saves",
+}
+
+# Table headers (shared, so rendered pages are cached by data versions only)
+STANDINGS_HEADERS = ("W", "L", "Pct", "GB", "L10", "DIFF")
+LEADER_HEADERS = (
+    tuple(HITTER_CATEGORIES.values()),
+    tuple(PITCHER_CATEGORIES.values()),
+)
+ROSTER_PITCHER_HEADERS = (
+    "Age",
+    "T",
+    "IP",
+    "ERA",
+    "SO",
+    "BB",
+    "S0%",
+    "BB%",
+    "HR/9",
+    "OPS",
+)
+ROSTER_HITTER_HEADERS = (
+    "Age",
+    "B",
+    "T",
+    "PA",
+    "H",
+    "2B",
+    "3B",
+    "HR",
+    "SB",
+    "S0%",
+    "BB%",
+    "AVG",
+    "OBP",
+    "OPS",
+)
+
+
+def get_leagues():
+    """Get standings by league and division"""
+    return info.get_league_divisions(
+        league_ids=api.LEAGUE_IDS, client=stats_client
+    )
+
+
+def get_leaderboards():
+    """Get hitting and pitching leaders for every leaderboard category"""
+    leaders = info.get_all_leaders(
+        categories=[(category, "hitting") for category in HITTER_CATEGORIES]
+        + [(category, "pitching") for category in PITCHER_CATEGORIES],
+        client=stats_client,
+    )
+
+    num_hitter_categories = len(HITTER_CATEGORIES)
+
+    return [leaders[:num_hitter_categories], leaders[num_hitter_categories:]]
+
+
+def get_news(team=None):
+    """Get recent league / team news"""
+    return info.get_recent_news(client=stats_client, team=team)
+
+
+def refresh_team_directory():
+    """Reload team directory before it goes stale"""
+    directory.teams.refresh(stats_client, force=True)
+
+
+def get_team_news(team_slug):
+    """Get recent team news from its snapshot (registered on first use)"""
+    name = f"{team_slug}-news"
+    refresh.refresher.register(
+        name,
+        partial(get_news, team=team_slug),
+        app.config["NEWS_REFRESH_INTERVAL"],
+    )
+
+    return refresh.refresher.get(name)
 
-request_session = requests.session()
-# Add retries (max 5 attempts) in case session is closed on remote end
-adapter = requests.adapters.HTTPAdapter(max_retries=5)
-request_session.mount("https://", adapter)
-request_session.mount("http://", adapter)
+
+def register_snapshots():
+    """Register hot datasets with the background refresher
+
+    Team news is registered for every team already in the team directory.
+    """
+    refresher = refresh.refresher
+    refresher.register(
+        "leagues", get_leagues, app.config["STANDINGS_REFRESH_INTERVAL"]
+    )
+    refresher.register(
+        "leaders", get_leaderboards, app.config["LEADERS_REFRESH_INTERVAL"]
+    )
+    refresher.register("news", get_news, app.config["NEWS_REFRESH_INTERVAL"])
+    team_directory = refresher.register(
+        "team-directory",
+        refresh_team_directory,
+        app.config["TEAM_DIRECTORY_REFRESH_INTERVAL"],
+    )
+    # Directory already preloaded
+    if directory.teams.loaded_at is not None:
+        team_directory.set(None)
+
+    for team in directory.teams.indexes.get("by_id", {}).values():
+        team_slug = utils.team_slug(team.get("teamName"))
+        refresher.register(
+            f"{team_slug}-news",
+            partial(get_news, team=team_slug),
+            app.config["NEWS_REFRESH_INTERVAL"],
+        )
 
 
 @app.route("/")
@@ -22,63 +162,16 @@ def index():
 @app.route("/teams")
 def standing():
     """Render teams / standings page"""
-    flask_session["al_divisions"] = flask_session.get("al_divisions", [])
-    flask_session["nl_divisions"] = flask_session.get("nl_divisions", [])
-    table_headers = ["W", "L", "Pct", "GB", "L10", "DIFF"]
-
-    # Sanity check to make sure both leagues have same number of divisions
-    if not flask_session["al_divisions"] or not flask_session["nl_divisions"]:
-        # Get standing info
-        al_standings = api.get_standings(
-            league_id=103, session=request_session
-        )
-        nl_standings = api.get_standings(
-            league_id=104, session=request_session
-        )
-
-        if len(al_standings) == len(nl_standings):
-            for idx in range(len(al_standings)):
-                # Get divisions
-                flask_session["al_divisions"].append(
-                    info.get_divisions(
-                        standing=al_standings,
-                        division_idx=idx,
-                        session=request_session,
-                    )
-                )
-                flask_session["nl_divisions"].append(
-                    info.get_divisions(
-                        standing=nl_standings,
-                        division_idx=idx,
-                        session=request_session,
-                    )
-                )
-                # Get teamids
-                for idx, name in enumerate(
-                    flask_session["al_divisions"][-1]["team_names"]
-                ):
-                    flask_session[name] = flask_session["al_divisions"][-1][
-                        "team_ids"
-                    ][idx]
-                for idx, name in enumerate(
-                    flask_session["nl_divisions"][-1]["team_names"]
-                ):
-                    flask_session[name] = flask_session["nl_divisions"][-1][
-                        "team_ids"
-                    ][idx]
-
-        # TODO: Raise error / alternative computation
+    # Get standing info
+    leagues = refresh.refresher.get("leagues")
 
     # Get league news
-    recent_news = info.get_recent_news(session=request_session)
+    recent_news = refresh.refresher.get("news")
 
-    return render_template(
+    return render.page(
         "standings.html",
-        table_headers=table_headers,
-        leagues=[
-            flask_session.get("al_divisions"),
-            flask_session.get("nl_divisions"),
-        ],
+        table_headers=STANDINGS_HEADERS,
+        leagues=leagues,
         recent_news=recent_news,
     )
 
@@ -89,191 +182,65 @@ def leaderboards():
 
     TODO: Add team stats
     """
-
-    # Get hitting leaders
-    hitter_categories = {
-        "homeRuns": "HR",
-        "onBasePlusSlugging": "OPS",
-        "stolenBases": "SB",
-    }
-
-    flask_session["hitter_leaders"] = flask_session.get(
-        "hitter_leaders",
-        [
-            info.get_leaders(
-                category=category,
-                session=request_session,
-                player_type="hitting",
-            )
-            for category in hitter_categories.keys()
-        ],
-    )
-
-    # Get pitching leaders
-    pitcher_categories = {
-        "earnedRunAverage": "ERA",
-        "strikeouts": "SO",
-        "saves": "Saves",
-    }
-    flask_session["pitcher_leaders"] = flask_session.get(
-        "pitcher_leaders",
-        [
-            info.get_leaders(
-                category=category,
-                player_type="pitching",
-                session=request_session,
-            )
-            for category in pitcher_categories.keys()
-        ],
-    )
+    # Get hitting and pitching leaders
+    leaders = refresh.refresher.get("leaders")
 
     # Get league news
-    recent_news = info.get_recent_news(
-        session=request_session,
-    )
+    recent_news = refresh.refresher.get("news")
 
-    return render_template(
+    return render.page(
         "leaderboards.html",
         recent_news=recent_news,
-        categories=[hitter_categories.values(), pitcher_categories.values()],
-        leaders=[
-            flask_session.get("hitter_leaders"),
-            flask_session.get("pitcher_leaders"),
-        ],
+        categories=LEADER_HEADERS,
+        leaders=leaders,
     )
 
 
 @app.route("/teams/<team_name>")
 def team_page(team_name):
     """Render team specific page"""
-    team_id = flask_session.get(team_name)
-
-    # Get team info
-    flask_session[f"{team_id}-info"] = flask_session.get(
-        f"{team_id}-info",
-        info.get_team_info(
-            team_id=team_id,
-            session=request_session,
-        ),
-    )
+    team = directory.teams.by_slug(team_name, client=stats_client)
+    if team is None:
+        abort(404)
 
-    # Get team roster
-    flask_session[f"{team_id}-roster"] = flask_session.get(
-        f"{team_id}-roster",
-        info.get_team_roster(
-            team_id=int(team_id),
-            season=str(flask_session[f"{team_id}-info"].get("season")),
-            session=request_session,
-        ),
+    # Get team info and roster concurrently
+    team_info, team_roster = info.get_team_page(
+        team, stats_client, store.data_store
     )
 
-    # Save player information in server-side session
-    for player_id in flask_session[f"{team_id}-roster"]["pitchers"].get(
-        "player_id"
-    ):
-        flask_session[str(player_id)] = team_id
-    for player_id in flask_session[f"{team_id}-roster"]["hitters"].get(
-        "player_id"
-    ):
-        flask_session[str(player_id)] = team_id
-
-    pitcher_header = [
-        "Age",
-        "T",
-        "IP",
-        "ERA",
-        "SO",
-        "BB",
-        "S0%",
-        "BB%",
-        "HR/9",
-        "OPS",
-    ]
-    hitter_header = [
-        "Age",
-        "B",
-        "T",
-        "PA",
-        "H",
-        "2B",
-        "3B",
-        "HR",
-        "SB",
-        "S0%",
-        "BB%",
-        "AVG",
-        "OBP",
-        "OPS",
-    ]
-
     # Get team specific news
-    recent_news = info.get_recent_news(session=request_session, team=team_name)
+    recent_news = get_team_news(utils.team_slug(team.get("teamName")))
 
-    return render_template(
+    return render.page(
         "team.html",
-        team_info=flask_session.get(f"{team_id}-info"),
-        team_roster=flask_session.get(f"{team_id}-roster"),
-        pitcher_header=pitcher_header,
-        hitter_header=hitter_header,
+        team_info=team_info,
+        team_roster=team_roster,
+        pitcher_header=ROSTER_PITCHER_HEADERS,
+        hitter_header=ROSTER_HITTER_HEADERS,
         recent_news=recent_news,
     )
 
 
-@app.route("/<player_first_name>-<player_last_name>-<player_id>")
+@app.route("/<player_first_name>-<player_last_name>-<int:player_id>")
 def player_page(player_first_name, player_last_name, player_id):
     """Render team specific page"""
-    # Get player info
-    flask_session[f"{player_id}-info"] = flask_session.get(
-        f"{player_id}-info",
-        info.get_player(
-            player_id=player_id,
-            session=request_session,
-        ),
-    )
-    position = flask_session.get(f"{player_id}-info").get("position")
-
-    # Get team id, or search for player if not already cached
-    team_id = flask_session.get(
-        str(player_id),
-        api.search_players(
-            player_id=int(player_id),
-            session=request_session,
-        ),
+    # Get current team id
+    team_id = directory.players.team_id(
+        player_id=player_id, client=stats_client
     )
+    if team_id is None:
+        abort(404)
 
-    # Get team info
-    flask_session[f"{team_id}-info"] = flask_session.get(
-        f"{team_id}-info",
-        info.get_team_info(
-            team_id=team_id,
-            session=request_session,
-        ),
+    # Get player info, team info and career stats concurrently
+    player_info, team_info, career_df = info.get_player_page(
+        player_id, team_id, stats_client, store.data_store
     )
+    position = player_info.get("position")
 
-    player_viz = None
-    try:
-        # Get career stats
-        flask_session[f"{player_id}-career"] = flask_session.get(
-            f"{player_id}-stats",
-            info.get_career_stats(
-                player_id=player_id,
-                category="pitching" if position == "P" else "hitting",
-                session=request_session,
-            ),
-        )
-
-        # Generate visualization
-        player_viz = (
-            viz.gen_simple_pitcher(flask_session[f"{player_id}-career"])
-            if position == "P"
-            else viz.gen_simple_hitter(flask_session[f"{player_id}-career"])
-        )
-
-        flask_session[f"{player_id}-career"] = flask_session.get(
-            f"{player_id}-career"
-        ).to_dict(orient="list")
-    except AttributeError:
-        flask_session[f"{player_id}-career"] = None
+    player_career = None
+    # Player has played in MLB (visualization is loaded client side)
+    if career_df is not None:
+        player_career = career_df.to_dict(orient="list")
 
     pitcher_headers = [
         "G",
@@ -311,14 +278,17 @@ def player_page(player_first_name, player_last_name, player_id):
     # Generate visualization
     # Add check for data
 
-    return render_template(
-        "player.html",
-        player_info=flask_session.get(f"{player_id}-info"),
-        player_career=flask_session.get(f"{player_id}-career"),
-        player_viz=player_viz,
-        team_info=flask_session.get(f"{team_id}-info"),
-        table_header=pitcher_headers if position == "P" else hitter_headers,
-    )
+    with metrics.timed("render"):
+        return render_template(
+            "player.html",
+            player_info=player_info,
+            player_career=player_career,
+            plotlyjs_url=viz.PLOTLYJS_URL,
+            team_info=team_info,
+            table_header=(
+                pitcher_headers if position == "P" else hitter_headers
+            ),
+        )
 
 
 @app.errorhandler(404)
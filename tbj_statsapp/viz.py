@@ -1,10 +1,69 @@
-from plotly import graph_objects as go
+"""Career visualizations
+
+pandas and plotly.graph_objects are slow to import and only needed for the
+player page, so they are imported on first use.
+"""
+import hashlib
+
+from plotly.offline import get_plotlyjs_version
+
+from tbj_statsapp import metrics
+from tbj_statsapp.cache import TTLCache
 
 PRIMARY_COLOUR = "#244D87"
 
+# plotly.js matching the figure specs generated
+PLOTLYJS_URL = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+
+# Figure specs by player id, chart type and hash of the career data
+figure_cache = TTLCache(maxsize=256, name="figure")
+FIGURE_TTL = 24 * 60 * 60
+
+
+def hover_text(labels):
+    """Build hover text for every row from (label, column) pairs"""
+    text = None
+    for label, column in labels:
+        line = f"{label}: " + column.astype(str)
+        text = line if text is None else text + "<br>" + line
+
+    return text.tolist()
+
+
+def data_hash(career_df):
+    """Hash of career data, changing whenever any value changes"""
+    from pandas.util import hash_pandas_object
+
+    row_hashes = hash_pandas_object(career_df, index=False)
 
-def gen_simple_hitter(career_df, primary_colour=PRIMARY_COLOUR):
-    """Function to generate a simple plotly visualization"""
+    return hashlib.sha1(row_hashes.values.tobytes()).hexdigest()
+
+
+def career_chart(player_id, career_df, pitcher=False):
+    """Get (possibly already serialized) career visualization of a player
+
+    Returns the JSON figure spec (rendered client side by plotly.js) and an
+    ETag identifying it.
+    """
+    chart_type = "pitcher" if pitcher else "hitter"
+    etag = f"{chart_type}-{data_hash(career_df)}"
+
+    def serialize():
+        with metrics.timed("viz"):
+            fig = (
+                simple_pitcher_figure(career_df)
+                if pitcher
+                else simple_hitter_figure(career_df)
+            )
+            return fig.to_json()
+
+    spec = figure_cache.get_or_set((player_id, etag), serialize, FIGURE_TTL)
+
+    return spec, etag
+
+
+def simple_hitter_figure(career_df, primary_colour=PRIMARY_COLOUR):
+    """Build simple plotly figure of season by season stats"""
 
     # Grab season total / average
     viz_df = career_df[
@@ -13,6 +72,8 @@ def gen_simple_hitter(career_df, primary_colour=PRIMARY_COLOUR):
     viz_df["avg"] = viz_df["avg"].astype(float)
 
     # Create figure
+    from plotly import graph_objects as go
+
     fig = go.Figure()
 
     # Add data to figure
@@ -23,18 +84,19 @@ def gen_simple_hitter(career_df, primary_colour=PRIMARY_COLOUR):
             marker={"color": primary_colour, "size": 10},
             line={"color": primary_colour, "dash": "dash"},
             hovertemplate="%{text}<extra></extra>",
-            text=[
-                f"Season: {viz_df.loc[idx, 'season']}<br>"
-                f"Team: {viz_df.loc[idx, 'team_name']}<br>"
-                f"Games Played: {viz_df.loc[idx, 'games']}<br>"
-                f"Avg: {viz_df.loc[idx, 'avg']:.3f}<br>"
-                f"RBI: {viz_df.loc[idx, 'rbi']}<br>"
-                f"SB: {viz_df.loc[idx, 'stolen_bases']}<br>"
-                f"BB: {viz_df.loc[idx, 'bb']}<br>"
-                f"SO: {viz_df.loc[idx, 'strikeouts']}<br>"
-                f"OPS: {viz_df.loc[idx, 'ops']}"
-                for idx in range(viz_df["season"].count())
-            ],
+            text=hover_text(
+                [
+                    ("Season", viz_df["season"]),
+                    ("Team", viz_df["team_name"]),
+                    ("Games Played", viz_df["games"]),
+                    ("Avg", viz_df["avg"].map("{:.3f}".format)),
+                    ("RBI", viz_df["rbi"]),
+                    ("SB", viz_df["stolen_bases"]),
+                    ("BB", viz_df["bb"]),
+                    ("SO", viz_df["strikeouts"]),
+                    ("OPS", viz_df["ops"]),
+                ]
+            ),
         )
     )
 
@@ -54,11 +116,11 @@ def gen_simple_hitter(career_df, primary_colour=PRIMARY_COLOUR):
         },
     )
 
-    return fig.to_html(include_plotlyjs="cdn", full_html=False)
+    return fig
 
 
-def gen_simple_pitcher(career_df, primary_colour=PRIMARY_COLOUR):
-    """Function to generate a simple plotly visualization"""
+def simple_pitcher_figure(career_df, primary_colour=PRIMARY_COLOUR):
+    """Build simple plotly figure of season by season stats"""
 
     # Grab season total / average
     viz_df = career_df[
@@ -67,6 +129,8 @@ def gen_simple_pitcher(career_df, primary_colour=PRIMARY_COLOUR):
     viz_df["era"] = viz_df["era"].astype(float)
 
     # Create figure
+    from plotly import graph_objects as go
+
     fig = go.Figure()
 
     # Add data to figure
@@ -77,20 +141,26 @@ def gen_simple_pitcher(career_df, primary_colour=PRIMARY_COLOUR):
             marker={"color": primary_colour, "size": 10},
             line={"color": primary_colour, "dash": "dash"},
             hovertemplate="%{text}<extra></extra>",
-            text=[
-                f"Season: {viz_df.loc[idx, 'season']}<br>"
-                f"Team: {viz_df.loc[idx, 'team_name']}<br>"
-                f"Games Played: {viz_df.loc[idx, 'games']}<br>"
-                f"Innings Pitched: {viz_df.loc[idx, 'ip']}<br>"
-                f"Record (W-L): {viz_df.loc[idx, 'wins']}-{viz_df.loc[idx, 'losses']}<br>"
-                f"Saves: {viz_df.loc[idx, 'saves']}<br>"
-                f"ERA: {viz_df.loc[idx, 'era']:.2f}<br>"
-                f"WHIP: {viz_df.loc[idx, 'whip']}<br>"
-                f"SO: {viz_df.loc[idx, 'strikeouts']}<br>"
-                f"BB: {viz_df.loc[idx, 'bb']}<br>"
-                f"HR/9: {viz_df.loc[idx, 'hr_per_9']}"
-                for idx in range(viz_df["season"].count())
-            ],
+            text=hover_text(
+                [
+                    ("Season", viz_df["season"]),
+                    ("Team", viz_df["team_name"]),
+                    ("Games Played", viz_df["games"]),
+                    ("Innings Pitched", viz_df["ip"]),
+                    (
+                        "Record (W-L)",
+                        viz_df["wins"].astype(str)
+                        + "-"
+                        + viz_df["losses"].astype(str),
+                    ),
+                    ("Saves", viz_df["saves"]),
+                    ("ERA", viz_df["era"].map("{:.2f}".format)),
+                    ("WHIP", viz_df["whip"]),
+                    ("SO", viz_df["strikeouts"]),
+                    ("BB", viz_df["bb"]),
+                    ("HR/9", viz_df["hr_per_9"]),
+                ]
+            ),
         )
     )
 
@@ -110,4 +180,4 @@ def gen_simple_pitcher(career_df, primary_colour=PRIMARY_COLOUR):
         },
     )
 
-    return fig.to_html(include_plotlyjs="cdn", full_html=False)
+    return fig